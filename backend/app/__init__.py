@@ -54,7 +54,8 @@ def create_app(config_class=Config):
         recipe_ingredient_model,
         pet_allergen_model,
         recipe_favorite_model,
-        recipe_like_model
+        recipe_like_model,
+        recipe_similarity_model
     )
 
     # 创建数据库表
@@ -67,6 +68,10 @@ def create_app(config_class=Config):
 
         db.create_all()
 
+        # 社区食谱全文索引（FTS5 表和同步触发器，不可用时搜索回退到 LIKE）
+        from .utils import recipe_search
+        recipe_search.ensure_index()
+
         # 显示用户数量
         try:
             from .models.user_model import User
@@ -212,16 +212,18 @@ class NutritionRequirement(db.Model):
     
     @classmethod
     def get_requirement_for_pet(cls, session, pet_type, life_stage, activity_level, weight_kg):
-        """获取特定宠物的营养需求"""
-        requirement = session.query(cls).filter(
-            cls.pet_type == pet_type,
-            cls.life_stage == life_stage,
-            cls.activity_level == activity_level,
-            cls.min_weight <= weight_kg,
-            cls.max_weight >= weight_kg,
-            cls.is_active == True
-        ).first()
+        """获取特定宠物的营养需求（查内存中的体重区间索引，不再逐次查询）"""
+        from app.utils.nutrition_requirement_index import get_requirement_index
         
-        if requirement:
-            return requirement.calculate_daily_requirements(weight_kg)
-        return None
\ No newline at end of file
+        index = get_requirement_index(session)
+        row = index.find_row(pet_type, life_stage, activity_level, weight_kg)
+        if row is None:
+            return None
+        return index.calculate_daily_requirements([row], [weight_kg])[0]
+    
+    @classmethod
+    def get_requirements_for_pets(cls, pets):
+        """批量获取多只宠物的每日营养需求 {宠物ID: 需求或 None}（生命阶段按年龄确定，活动量优先匹配中等）"""
+        from app.utils.nutrition_requirement_index import get_requirement_index
+        
+        return get_requirement_index().requirements_for_pets(pets)
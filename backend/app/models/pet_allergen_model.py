@@ -2,17 +2,23 @@
 宠物过敏食材管理模型
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum, cast
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 from ..extensions import db
+from .ingredient_model import Ingredient
 
 class AllergySeverity(enum.Enum):
     MILD = "mild"           # 轻微
     MODERATE = "moderate"   # 中度
     SEVERE = "severe"       # 严重
 
+def severity_value(raw):
+    """严重程度的枚举值；兼容以枚举名（MILD）或枚举值（mild）保存的旧数据"""
+    value = (raw or '').lower()
+    return value if value in {severity.value for severity in AllergySeverity} else AllergySeverity.MILD.value
+
 class PetAllergen(db.Model):
     """宠物过敏食材记录模型"""
     __tablename__ = 'pet_allergens'
@@ -57,28 +63,35 @@ class PetAllergen(db.Model):
     @classmethod
     def get_pet_allergen_ids(cls, pet_id):
         """获取宠物的所有过敏食材ID"""
-        allergens = cls.query.filter_by(pet_id=pet_id, is_active=True).all()
-        return [allergen.ingredient_id for allergen in allergens]
+        rows = db.session.query(cls.ingredient_id).filter_by(pet_id=pet_id, is_active=True).all()
+        return [row.ingredient_id for row in rows]
     
     @classmethod
     def check_allergen_conflict(cls, pet_id, ingredient_ids):
-        """检查食材列表是否与宠物过敏食材冲突"""
-        allergen_ids = cls.get_pet_allergen_ids(pet_id)
-        conflicts = []
+        """检查食材列表是否与宠物过敏食材冲突（一次关联查询返回冲突的过敏记录、食材名称和严重程度）"""
+        ingredient_ids = list(set(ingredient_ids or []))
+        if not ingredient_ids:
+            return []
         
-        for ingredient_id in ingredient_ids:
-            if ingredient_id in allergen_ids:
-                allergen = cls.query.filter_by(
-                    pet_id=pet_id, 
-                    ingredient_id=ingredient_id,
-                    is_active=True
-                ).first()
-                if allergen:
-                    conflicts.append({
-                        'ingredient_id': ingredient_id,
-                        'ingredient_name': allergen.ingredient.name,
-                        'severity': allergen.severity.value,
-                        'notes': allergen.notes
-                    })
+        rows = db.session.query(
+            cls.ingredient_id,
+            Ingredient.name,
+            cast(cls.severity, String).label('severity'),
+            cls.notes
+        ).join(
+            Ingredient, Ingredient.id == cls.ingredient_id
+        ).filter(
+            cls.pet_id == pet_id,
+            cls.is_active == True,
+            cls.ingredient_id.in_(ingredient_ids)
+        ).order_by(cls.ingredient_id).all()
         
-        return conflicts
\ No newline at end of file
+        return [
+            {
+                'ingredient_id': row.ingredient_id,
+                'ingredient_name': row.name,
+                'severity': severity_value(row.severity),
+                'notes': row.notes
+            }
+            for row in rows
+        ]
\ No newline at end of file
@@ -49,19 +49,11 @@ class RecipeIngredient(db.Model):  # 修复：继承 db.Model 而不是 Base
     
     def calculate_nutrition_contribution(self):
         """计算该食材在食谱中的营养贡献"""
-        if not self.ingredient:
+        if not self.ingredient_id:
             return
         
-        # 计算每克的营养成分
-        weight_ratio = self.weight / 100  # 转换为每100g的比例
-        
-        # 计算营养贡献
-        self.contributed_calories = self.ingredient.calories * weight_ratio
-        self.contributed_protein = self.ingredient.protein * weight_ratio
-        self.contributed_fat = self.ingredient.fat * weight_ratio
-        self.contributed_carbohydrate = self.ingredient.carbohydrate * weight_ratio
-        self.contributed_calcium = self.ingredient.calcium * weight_ratio
-        self.contributed_phosphorus = self.ingredient.phosphorus * weight_ratio
+        from ..utils.nutrient_aggregation import apply_contribution
+        apply_contribution(self)
     
     def get_detailed_nutrition_contribution(self):
         """获取详细的营养贡献信息"""
@@ -1,10 +1,18 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, Boolean, Text, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 from ..extensions import db  # 使用相对导入
 
+# 热度评分 = 点赞数 * 2 + 收藏数 * 1.5 + 使用次数 * 1 + 新鲜度 * 10
+# 新鲜度在创建后 30 天内从 1 线性衰减到 0（由定时任务刷新）
+HOT_SCORE_LIKE_WEIGHT = 2.0
+HOT_SCORE_FAVORITE_WEIGHT = 1.5
+HOT_SCORE_USAGE_WEIGHT = 1.0
+HOT_SCORE_FRESHNESS_WEIGHT = 10.0
+HOT_SCORE_DECAY_DAYS = 30
+
 class RecipeStatus(enum.Enum):
     DRAFT = "draft"           # 草稿
     PUBLISHED = "published"   # 已发布
@@ -12,6 +20,12 @@ class RecipeStatus(enum.Enum):
 
 class Recipe(db.Model):  # 修复：继承 db.Model 而不是 Base
     __tablename__ = 'recipes'
+    __table_args__ = (
+        # 社区列表按时间的游标分页 (created_at, id)
+        Index('idx_recipes_created_at_id', 'created_at', 'id'),
+        # 按点赞数的游标分页 (likes_count, created_at, id)
+        Index('idx_recipes_likes_created_at_id', 'likes_count', 'created_at', 'id'),
+    )
     
     # 基础信息
     id = Column(Integer, primary_key=True)
@@ -78,6 +92,8 @@ class Recipe(db.Model):  # 修复：继承 db.Model 而不是 Base
     # 使用统计和社区功能
     usage_count = Column(Integer, nullable=False, default=0)    # 使用次数
     likes_count = Column(Integer, nullable=False, default=0)    # 点赞数量（新增）
+    favorites_count = Column(Integer, nullable=False, default=0)    # 收藏数量（原子增减维护）
+    hot_score = Column(Float, nullable=False, default=HOT_SCORE_FRESHNESS_WEIGHT, index=True)  # 热度评分（增量维护）
     rating_avg = Column(Float, nullable=True)                  # 平均评分
     rating_count = Column(Integer, nullable=False, default=0)  # 评分次数
     
@@ -94,96 +110,29 @@ class Recipe(db.Model):  # 修复：继承 db.Model 而不是 Base
     def __repr__(self):
         return f"<Recipe(id={self.id}, name='{self.name}', user_id={self.user_id})>"
     
-    def calculate_nutrition(self):
-        """根据食材重量计算总营养成分"""
-        # 重置所有营养成分
-        self.total_weight = 0.0
-        self.total_calories = 0.0
-        self.total_protein = 0.0
-        self.total_fat = 0.0
-        self.total_carbohydrate = 0.0
-        self.total_fiber = 0.0
-        
-        # 矿物质
-        self.total_calcium = 0.0
-        self.total_phosphorus = 0.0
-        self.total_potassium = 0.0
-        self.total_sodium = 0.0
-        self.total_magnesium = 0.0
-        self.total_iron = 0.0
-        self.total_zinc = 0.0
-        
-        # 维生素
-        self.total_vitamin_a = 0.0
-        self.total_vitamin_d = 0.0
-        self.total_vitamin_e = 0.0
-        self.total_thiamine = 0.0
-        self.total_riboflavin = 0.0
-        self.total_niacin = 0.0
-        self.total_vitamin_b12 = 0.0
-        self.total_choline = 0.0
+    def calculate_nutrition(self, ingredient_weights=None):
+        """
+        根据食材重量计算总营养成分
+        ingredient_weights: 可选的 (食材ID, 重量g) 列表；未提供时从 self.ingredients 读取
+        """
+        from ..utils.nutrient_aggregation import apply_recipe_totals
         
-        # 氨基酸
-        self.total_arginine = 0.0
-        self.total_lysine = 0.0
-        self.total_methionine = 0.0
-        self.total_taurine = 0.0
+        if ingredient_weights is None:
+            ingredient_weights = [(ri.ingredient_id, ri.weight) for ri in self.ingredients]
         
-        # 脂肪酸
-        self.total_omega_3 = 0.0
-        self.total_omega_6 = 0.0
-        
-        # 遍历所有食材计算营养成分
-        for recipe_ingredient in self.ingredients:
-            ingredient = recipe_ingredient.ingredient
-            weight_ratio = recipe_ingredient.weight / 100  # 转换为每100g的比例
-            
-            # 累加基础营养
-            self.total_weight += recipe_ingredient.weight
-            self.total_calories += ingredient.calories * weight_ratio
-            self.total_protein += ingredient.protein * weight_ratio
-            self.total_fat += ingredient.fat * weight_ratio
-            self.total_carbohydrate += ingredient.carbohydrate * weight_ratio
-            self.total_fiber += ingredient.fiber * weight_ratio
-            
-            # 累加矿物质
-            self.total_calcium += ingredient.calcium * weight_ratio
-            self.total_phosphorus += ingredient.phosphorus * weight_ratio
-            self.total_potassium += ingredient.potassium * weight_ratio
-            self.total_sodium += ingredient.sodium * weight_ratio
-            self.total_magnesium += ingredient.magnesium * weight_ratio
-            self.total_iron += ingredient.iron * weight_ratio
-            self.total_zinc += ingredient.zinc * weight_ratio
-            
-            # 累加维生素
-            self.total_vitamin_a += ingredient.vitamin_a * weight_ratio
-            self.total_vitamin_d += ingredient.vitamin_d * weight_ratio
-            self.total_vitamin_e += ingredient.vitamin_e * weight_ratio
-            self.total_thiamine += ingredient.thiamine * weight_ratio
-            self.total_riboflavin += ingredient.riboflavin * weight_ratio
-            self.total_niacin += ingredient.niacin * weight_ratio
-            self.total_vitamin_b12 += ingredient.vitamin_b12 * weight_ratio
-            self.total_choline += ingredient.choline * weight_ratio
-            
-            # 累加氨基酸
-            self.total_arginine += ingredient.arginine * weight_ratio
-            self.total_lysine += ingredient.lysine * weight_ratio
-            self.total_methionine += ingredient.methionine * weight_ratio
-            self.total_taurine += ingredient.taurine * weight_ratio
-            
-            # 累加脂肪酸
-            self.total_omega_3 += ingredient.omega_3_fatty_acids * weight_ratio
-            self.total_omega_6 += ingredient.omega_6_fatty_acids * weight_ratio
+        apply_recipe_totals(self, ingredient_weights)
     
     def check_suitability(self):
         """检查食谱对不同宠物的适用性"""
-        # 检查所有食材是否对特定宠物安全
-        for recipe_ingredient in self.ingredients:
-            ingredient = recipe_ingredient.ingredient
-            if not ingredient.is_safe_for_dogs:
-                self.suitable_for_dogs = False
-            if not ingredient.is_safe_for_cats:
-                self.suitable_for_cats = False
+        from app.utils.ingredient_bitset import ids_to_mask, unsafe_ingredient_masks  # 避免循环导入
+        
+        # 检查所有食材是否对特定宠物安全（食材位集与不安全食材位集按位与）
+        ingredient_mask = ids_to_mask(recipe_ingredient.ingredient_id for recipe_ingredient in self.ingredients)
+        unsafe_for_dogs, unsafe_for_cats = unsafe_ingredient_masks(ingredient_mask)
+        if ingredient_mask & unsafe_for_dogs:
+            self.suitable_for_dogs = False
+        if ingredient_mask & unsafe_for_cats:
+            self.suitable_for_cats = False
     
     def get_nutrition_per_100g(self):
         """获取每100g的营养成分"""
@@ -240,6 +189,7 @@ class Recipe(db.Model):  # 修复：继承 db.Model 而不是 Base
             'balance_score': self.balance_score,
             'usage_count': self.usage_count,
             'likes_count': self.likes_count,
+            'favorites_count': self.favorites_count,
             'rating_avg': self.rating_avg,
             'rating_count': self.rating_count,
             'created_at': self.created_at.isoformat(),
@@ -253,33 +203,16 @@ class Recipe(db.Model):  # 修复：继承 db.Model 而不是 Base
         self.likes_count = RecipeLike.query.filter_by(recipe_id=self.id).count()
     
     def get_hot_score(self):
-        """计算热度评分（用于排序）"""
-        # 热度评分 = 点赞数 * 2 + 收藏数 * 1.5 + 使用次数 * 1 + 时间衰减
-        from .recipe_favorite_model import RecipeFavorite
-        
-        favorites_count = RecipeFavorite.query.filter_by(recipe_id=self.id).count()
-        
-        # 时间衰减：最近创建的食谱获得加成
-        days_old = (datetime.utcnow() - self.created_at).days
-        time_decay = max(0, 1 - (days_old / 30))  # 30天内的食谱有时间加成
-        
-        hot_score = (
-            (self.likes_count or 0) * 2 + 
-            favorites_count * 1.5 + 
-            (self.usage_count or 0) * 1 +
-            time_decay * 10
-        )
-        
-        return hot_score
+        """获取热度评分（用于排序），由 RecipeStatsService 增量维护并定时刷新时间衰减"""
+        return self.hot_score or 0.0
     
     def get_community_data(self):
         """获取社区展示用的数据"""
-        from .recipe_favorite_model import RecipeFavorite
         from .recipe_like_model import RecipeLike
         
-        # 获取实时统计数据
+        # 获取实时统计数据（收藏数使用缓存字段）
         likes_count = RecipeLike.query.filter_by(recipe_id=self.id).count()
-        favorites_count = RecipeFavorite.query.filter_by(recipe_id=self.id).count()
+        favorites_count = self.favorites_count or 0
         
         return {
             'id': self.id,
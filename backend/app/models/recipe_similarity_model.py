@@ -0,0 +1,34 @@
+# backend/app/models/recipe_similarity_model.py
+from ..extensions import db
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, Index, UniqueConstraint
+from datetime import datetime
+
+class RecipeSimilarity(db.Model):
+    """食谱相似度表模型（离线任务预计算的 Top-K 相似食谱）"""
+    __tablename__ = 'recipe_similarities'
+    
+    id = Column(Integer, primary_key=True)
+    recipe_id = Column(Integer, ForeignKey('recipes.id'), nullable=False)
+    similar_recipe_id = Column(Integer, ForeignKey('recipes.id'), nullable=False)
+    rank = Column(Integer, nullable=False)              # 相似度排名（从1开始，0 为无相似食谱时的计算标记）
+    similarity = Column(Float, nullable=False)          # 加权余弦相似度
+    computed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('recipe_id', 'similar_recipe_id', name='unique_recipe_similarity'),
+        # 按食谱读取相似食谱列表 (recipe_id, rank)
+        Index('idx_recipe_similarities_recipe_rank', 'recipe_id', 'rank'),
+    )
+    
+    def __repr__(self):
+        return f'<RecipeSimilarity {self.recipe_id} -> {self.similar_recipe_id} ({self.similarity:.3f})>'
+    
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'recipe_id': self.recipe_id,
+            'similar_recipe_id': self.similar_recipe_id,
+            'rank': self.rank,
+            'similarity': self.similarity,
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        }
@@ -5,7 +5,11 @@
 from flask import Blueprint, request, jsonify, session
 from app.models.pet_model import Pet
 from app.models.ingredient_model import Ingredient
+from app.models.recipe_model import Recipe
 from app.utils.allergen_service import AllergenService
+from app.utils.pet_nutrition_profile import get_pet_profile
+from app.extensions import db
+from sqlalchemy import or_
 from datetime import datetime
 
 allergen_api_bp = Blueprint('allergen_api', __name__)
@@ -162,4 +166,49 @@ def check_recipe_safety():
         
     except Exception as e:
         print(f"检查食谱安全性失败: {e}")
-        return jsonify({'error': '检查安全性失败'}), 500
\ No newline at end of file
+        return jsonify({'error': '检查安全性失败'}), 500
+
+# 批量检查的食谱数量上限
+MAX_SAFETY_CHECK_RECIPES = 200
+
+@allergen_api_bp.route('/api/pet/<int:pet_id>/recipe-safety', methods=['POST'])
+def check_recipes_safety(pet_id):
+    """批量检查多个食谱对宠物的安全性（推荐页、我的食谱列表使用）"""
+    try:
+        if 'user_id' not in session:
+            return jsonify({'error': '请先登录'}), 401
+        
+        if not get_pet_profile(pet_id, session['user_id']):
+            return jsonify({'error': '宠物信息不存在'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        try:
+            recipe_ids = list(dict.fromkeys(int(recipe_id) for recipe_id in data.get('recipe_ids') or []))
+        except (TypeError, ValueError):
+            return jsonify({'error': '食谱ID格式错误'}), 400
+        
+        if not recipe_ids:
+            return jsonify({'error': '请提供食谱列表'}), 400
+        if len(recipe_ids) > MAX_SAFETY_CHECK_RECIPES:
+            return jsonify({'error': f'一次最多检查 {MAX_SAFETY_CHECK_RECIPES} 个食谱'}), 400
+        
+        # 只检查公开的或当前用户自己的食谱
+        visible_ids = [
+            row.id for row in db.session.query(Recipe.id).filter(
+                Recipe.id.in_(recipe_ids),
+                or_(Recipe.is_public == True, Recipe.user_id == session['user_id'])
+            ).all()
+        ]
+        
+        results = AllergenService.check_recipes_safety(visible_ids, pet_id)
+        
+        return jsonify({
+            'success': True,
+            'pet_id': pet_id,
+            'results': {str(recipe_id): results[recipe_id] for recipe_id in recipe_ids if recipe_id in results},
+            'not_found': [recipe_id for recipe_id in recipe_ids if recipe_id not in results]
+        })
+        
+    except Exception as e:
+        print(f"批量检查食谱安全性失败: {e}")
+        return jsonify({'error': '检查安全性失败'}), 500
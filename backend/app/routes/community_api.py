@@ -6,10 +6,17 @@ from app.models.recipe_like_model import RecipeLike
 from app.models.recipe_favorite_model import RecipeFavorite
 from app.models.user_model import User
 from app.models.pet_model import Pet
-from sqlalchemy import func, desc, asc, or_, text
+from app.utils import recipe_search
+from app.utils.recipe_stats_service import RecipeStatsService
+from app.utils.recipe_feature_matrix import get_recipe_features
+from sqlalchemy import func, desc, asc, or_, text, tuple_, literal, DateTime
 from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+import base64
+import json
 import math
 import logging
+import numpy as np
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
@@ -17,6 +24,9 @@ logger = logging.getLogger(__name__)
 
 community_api = Blueprint('community_api', __name__)
 
+MAX_ID_FILTER_SIZE = 500      # 直接拼入 SQL 的ID列表上限（低于 SQLite 变量上限）
+ID_FETCH_BATCH_SIZE = 1000    # 食材过滤时流式读取ID的批大小
+
 @community_api.route('/api/community/recipes', methods=['GET'])
 def get_community_recipes():
     """获取社区公开食谱列表"""
@@ -29,9 +39,11 @@ def get_community_recipes():
         search = request.args.get('search', '').strip()[:100]  # 限制搜索长度
         sort_by = request.args.get('sort', 'hot')
         author = request.args.get('author', '').strip()[:50]   # 限制作者搜索长度
+        include_ingredients = parse_id_list(request.args.get('ingredients', ''))
+        exclude_ingredients = parse_id_list(request.args.get('exclude_ingredients', ''))
 
-        # 验证排序参数
-        valid_sorts = ['hot', 'newest', 'oldest', 'likes', 'name']
+        # 验证排序参数（relevance 仅在有搜索词时有效）
+        valid_sorts = ['hot', 'newest', 'oldest', 'likes', 'name', 'relevance']
         if sort_by not in valid_sorts:
             sort_by = 'hot'
 
@@ -42,8 +54,13 @@ def get_community_recipes():
             Recipe.is_active == True
         )
         
-        # 搜索过滤
-        if search:
+        # 搜索过滤：优先使用 FTS5 全文索引（BM25 排序），不可用时回退到 LIKE
+        fts_match = None
+        match_expression = recipe_search.build_match_expression(search) if search else ''
+        if search and recipe_search.FTS_AVAILABLE and match_expression:
+            fts_match = recipe_search.match_subquery(match_expression)
+            query = query.join(fts_match, fts_match.c.recipe_id == Recipe.id)
+        elif search:
             search_pattern = f'%{search}%'
             query = query.filter(
                 or_(
@@ -52,6 +69,9 @@ def get_community_recipes():
                 )
             )
         
+        if sort_by == 'relevance' and fts_match is None:
+            sort_by = 'hot'
+        
         # 作者过滤
         if author:
             author_pattern = f'%{author}%'
@@ -62,34 +82,133 @@ def get_community_recipes():
                 )
             )
         
-        # 排序处理
-        if sort_by == 'hot':
-            # 使用预计算的hot_score或简化的热度算法
-            query = query.order_by(
-                desc(func.coalesce(Recipe.likes_count, 0) +
-                     func.coalesce(Recipe.usage_count, 0)),
-                desc(Recipe.created_at)
-            )
-        elif sort_by == 'newest':
-            query = query.order_by(desc(Recipe.created_at))
-        elif sort_by == 'oldest':
-            query = query.order_by(asc(Recipe.created_at))
-        elif sort_by == 'likes':
-            query = query.order_by(
-                desc(func.coalesce(Recipe.likes_count, 0)),
-                desc(Recipe.created_at)
-            )
-        elif sort_by == 'name':
-            query = query.order_by(asc(Recipe.name))
-        
-        # 分页处理
-        total = query.count()
-        total_pages = math.ceil(total / per_page) if total > 0 else 1
-        
-        # 确保页码在有效范围内
-        page = min(page, total_pages)
-        
-        recipes = query.offset((page - 1) * per_page).limit(per_page).all()
+        # 食材过滤：在食谱特征矩阵的食材位集上按位与，不再扫描食谱-食材关联表
+        # （特征矩阵只包含有实际内容的公开食谱，不含食材的食谱本来也不会命中包含条件）
+        # 命中的食谱可能占大部分语料，不拼成 IN 列表：先按排序只取ID，再用位集掩码过滤
+        features = None
+        ingredient_matched = None
+        if include_ingredients or exclude_ingredients:
+            features = get_recipe_features()
+            excluded_rows = features.rows_containing(exclude_ingredients) if exclude_ingredients else None
+            if include_ingredients:
+                ingredient_matched = features.rows_containing_all(include_ingredients)
+                if excluded_rows is not None:
+                    ingredient_matched &= ~excluded_rows
+            else:
+                excluded_ids = features.recipe_ids[excluded_rows].tolist()
+                if len(excluded_ids) <= MAX_ID_FILTER_SIZE:
+                    # 只有排除条件且命中不多时直接 NOT IN（不在特征矩阵中的食谱不受影响）
+                    if excluded_ids:
+                        query = query.filter(~Recipe.id.in_(excluded_ids))
+                else:
+                    ingredient_matched = ~excluded_rows
+        keep_unindexed = not include_ingredients   # 不在特征矩阵中的食谱是否保留
+        
+        cursor = request.args.get('cursor')
+        
+        if cursor is not None:
+            # 游标分页：按 (排序键..., id) 做键集过滤，不再 offset 和 count，深度翻页耗时恒定
+            keyset = get_keyset_order(sort_by)
+            if keyset is None:
+                return jsonify({
+                    'success': False,
+                    'message': 'Cursor pagination is only available for hot, newest, oldest and likes sorts.'
+                }), 400
+            key_columns, descending = keyset
+            
+            if cursor:
+                try:
+                    last_values = decode_cursor(cursor, sort_by, key_columns)
+                except ValueError:
+                    return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+                
+                boundary = tuple_(*[literal(value, type_=column.type)
+                                    for column, value in zip(key_columns, last_values)])
+                keys = tuple_(*key_columns)
+                query = query.filter(keys < boundary if descending else keys > boundary)
+            
+            direction = desc if descending else asc
+            ordering = [direction(column) for column in key_columns]
+            if ingredient_matched is None:
+                rows = query.add_columns(*key_columns).order_by(*ordering).limit(per_page + 1).all()
+            else:
+                # 按排序流式读取 (id, 排序键)，凑满一页即停止
+                result = db.session.execute(
+                    query.with_entities(Recipe.id, *key_columns).order_by(*ordering)
+                    .statement.execution_options(yield_per=ID_FETCH_BATCH_SIZE)
+                )
+                rows = []
+                try:
+                    for batch in result.partitions():
+                        ids = [row[0] for row in batch]
+                        keep = filter_by_ingredient_mask(features, ingredient_matched, ids, keep_unindexed)
+                        rows.extend(row for row, kept in zip(batch, keep) if kept)
+                        if len(rows) > per_page:
+                            break
+                finally:
+                    result.close()
+                rows = rows[:per_page + 1]
+            
+            has_next = len(rows) > per_page
+            rows = rows[:per_page]
+            if ingredient_matched is None:
+                recipes = [row[0] for row in rows]
+            else:
+                recipes = load_recipes_in_order([row[0] for row in rows])
+            
+            pagination = {
+                'mode': 'cursor',
+                'per_page': per_page,
+                'cursor': cursor or None,
+                'next_cursor': encode_cursor(sort_by, rows[-1][1:]) if has_next else None,
+                'has_prev': bool(cursor),
+                'has_next': has_next
+            }
+        else:
+            # 排序处理
+            if sort_by == 'relevance':
+                query = query.order_by(asc(fts_match.c.rank), desc(Recipe.created_at))
+            elif sort_by == 'hot':
+                # 使用预计算的热度评分（索引扫描）
+                query = query.order_by(desc(Recipe.hot_score), desc(Recipe.id))
+            elif sort_by == 'newest':
+                query = query.order_by(desc(Recipe.created_at))
+            elif sort_by == 'oldest':
+                query = query.order_by(asc(Recipe.created_at))
+            elif sort_by == 'likes':
+                query = query.order_by(desc(Recipe.likes_count), desc(Recipe.created_at), desc(Recipe.id))
+            elif sort_by == 'name':
+                query = query.order_by(asc(Recipe.name))
+        
+            # 分页处理（全文检索且无作者、食材过滤时，总数直接从 FTS 索引统计）
+            if ingredient_matched is not None:
+                # 按排序只取ID，位集过滤后再分页
+                ids = [row.id for row in query.with_entities(Recipe.id).all()]
+                keep = filter_by_ingredient_mask(features, ingredient_matched, ids, keep_unindexed)
+                matched_ids = [recipe_id for recipe_id, kept in zip(ids, keep) if kept]
+                total = len(matched_ids)
+            elif fts_match is not None and not author and not include_ingredients and not exclude_ingredients:
+                total = recipe_search.count_matches(match_expression)
+            else:
+                total = query.count()
+            total_pages = math.ceil(total / per_page) if total > 0 else 1
+        
+            # 确保页码在有效范围内
+            page = min(page, total_pages)
+        
+            if ingredient_matched is not None:
+                recipes = load_recipes_in_order(matched_ids[(page - 1) * per_page:page * per_page])
+            else:
+                recipes = query.offset((page - 1) * per_page).limit(per_page).all()
+            
+            pagination = {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'total_pages': total_pages,
+                'has_prev': page > 1,
+                'has_next': page < total_pages
+            }
 
         # 获取当前用户ID（用于判断点赞和收藏状态）
         current_user_id = session.get('user_id')
@@ -97,9 +216,8 @@ def get_community_recipes():
         # 预加载所有需要的数据以减少数据库查询
         recipe_ids = [recipe.id for recipe in recipes]
 
-        # 批量获取点赞和收藏数据
+        # 批量获取点赞和收藏状态（收藏数直接使用食谱的缓存字段）
         likes_data = {}
-        favorites_data = {}
         user_likes = set()
         user_favorites = set()
         
@@ -111,14 +229,7 @@ def get_community_recipes():
             ).filter(RecipeLike.recipe_id.in_(recipe_ids)).group_by(RecipeLike.recipe_id).all()
             
             likes_data = {row.recipe_id: row.count for row in likes_count_query}
-            
-            # 获取收藏数据
-            favorites_count_query = db.session.query(
-                RecipeFavorite.recipe_id,
-                func.count(RecipeFavorite.id).label('count')
-            ).filter(RecipeFavorite.recipe_id.in_(recipe_ids)).group_by(RecipeFavorite.recipe_id).all()
-            
-            favorites_data = {row.recipe_id: row.count for row in favorites_count_query}
+
             
             # 获取当前用户的点赞和收藏状态
             if current_user_id:
@@ -158,7 +269,7 @@ def get_community_recipes():
                 },
                 'stats': {
                     'likes_count': likes_data.get(recipe.id, 0),
-                    'favorites_count': favorites_data.get(recipe.id, 0),
+                    'favorites_count': recipe.favorites_count or 0,
                     'usage_count': recipe.usage_count or 0,
                     'is_loved': recipe.id in user_likes,
                     'is_favorited': recipe.id in user_favorites
@@ -188,14 +299,7 @@ def get_community_recipes():
             'success': True,
             'data': {
                 'recipes': recipes_data,
-                'pagination': {
-                    'page': page,
-                    'per_page': per_page,
-                    'total': total,
-                    'total_pages': total_pages,
-                    'has_prev': page > 1,
-                    'has_next': page < total_pages
-                },
+                'pagination': pagination,
                 'filters': {
                     'search': search,
                     'sort': sort_by,
@@ -265,8 +369,9 @@ def like_recipe(recipe_id):
                 
                 db.session.add(like)
                 
-                # 更新食谱的点赞计数缓存
-                recipe.likes_count = RecipeLike.query.filter_by(recipe_id=recipe_id).count() + 1
+                # 原子地更新食谱的点赞计数和热度
+                RecipeStatsService.record_like(recipe_id, 1)
+                likes_count = RecipeStatsService.get_likes_count(recipe_id)
         
         except IntegrityError:
             db.session.rollback()
@@ -280,7 +385,7 @@ def like_recipe(recipe_id):
             'message': 'Recipe liked successfully',
             'data': {
                 'is_loved': True,
-                'likes_count': recipe.likes_count
+                'likes_count': likes_count
             }
         })
         
@@ -329,17 +434,16 @@ def unlike_recipe(recipe_id):
             # 删除点赞记录
             db.session.delete(like)
             
-            # 更新食谱的点赞计数缓存
-            recipe = Recipe.query.get(recipe_id)
-            if recipe:
-                recipe.likes_count = max(0, RecipeLike.query.filter_by(recipe_id=recipe_id).count() - 1)
+            # 原子地更新食谱的点赞计数和热度（食谱不存在时不更新任何行）
+            RecipeStatsService.record_like(recipe_id, -1)
+            likes_count = RecipeStatsService.get_likes_count(recipe_id)
         
         return jsonify({
             'success': True,
             'message': 'Recipe unliked successfully',
             'data': {
                 'is_loved': False,
-                'likes_count': recipe.likes_count if recipe else 0
+                'likes_count': likes_count
             }
         })
         
@@ -393,18 +497,14 @@ def get_trending_recipes():
     try:
         limit = min(20, max(1, int(request.args.get('limit', 6))))  # 限制范围1-20
         
-        # 简化热度计算，提高性能
+        # 按预计算的热度评分排序
         trending_recipes = db.session.query(Recipe)\
             .filter(
                 Recipe.is_public == True,
                 Recipe.status == RecipeStatus.PUBLISHED,
                 Recipe.is_active == True
             )\
-            .order_by(
-                desc(func.coalesce(Recipe.likes_count, 0) + 
-                     func.coalesce(Recipe.usage_count, 0)),
-                desc(Recipe.created_at)
-            )\
+            .order_by(desc(Recipe.hot_score), desc(Recipe.id))\
             .limit(limit).all()
         
         # 获取作者信息
@@ -415,7 +515,6 @@ def get_trending_recipes():
         # 获取统计数据
         recipe_ids = [recipe.id for recipe in trending_recipes]
         likes_data = {}
-        favorites_data = {}
         
         if recipe_ids:
             likes_count_query = db.session.query(
@@ -423,12 +522,7 @@ def get_trending_recipes():
                 func.count(RecipeLike.id).label('count')
             ).filter(RecipeLike.recipe_id.in_(recipe_ids)).group_by(RecipeLike.recipe_id).all()
             likes_data = {row.recipe_id: row.count for row in likes_count_query}
-            
-            favorites_count_query = db.session.query(
-                RecipeFavorite.recipe_id,
-                func.count(RecipeFavorite.id).label('count')
-            ).filter(RecipeFavorite.recipe_id.in_(recipe_ids)).group_by(RecipeFavorite.recipe_id).all()
-            favorites_data = {row.recipe_id: row.count for row in favorites_count_query}
+
         
         # 构建返回数据
         trending_data = []
@@ -445,7 +539,7 @@ def get_trending_recipes():
                 },
                 'stats': {
                     'likes_count': likes_data.get(recipe.id, 0),
-                    'favorites_count': favorites_data.get(recipe.id, 0),
+                    'favorites_count': recipe.favorites_count or 0,
                     'usage_count': recipe.usage_count or 0
                 },
                 'nutrition': {
@@ -471,4 +565,78 @@ def get_trending_recipes():
             'data': {
                 'trending_recipes': []
             }
-        })
\ No newline at end of file
+        })
+
+# ------------ 查询参数辅助函数 ------------
+
+def parse_id_list(value, max_count=20):
+    """解析逗号分隔的ID列表，忽略无效值"""
+    ids = []
+    for part in value.split(',')[:max_count]:
+        try:
+            ids.append(int(part))
+        except ValueError:
+            continue
+    return ids
+
+# ------------ 游标分页辅助函数 ------------
+
+def filter_by_ingredient_mask(features, matched, recipe_ids, keep_unindexed):
+    """按食材位集的匹配结果过滤食谱ID，返回与 recipe_ids 对齐的 bool 数组"""
+    rows = np.array([features.row_index.get(recipe_id, -1) for recipe_id in recipe_ids], dtype=np.int64)
+    keep = np.full(len(rows), keep_unindexed, dtype=bool)
+    indexed = rows >= 0
+    keep[indexed] = matched[rows[indexed]]
+    return keep
+
+def load_recipes_in_order(recipe_ids):
+    """按给定ID顺序加载一页食谱"""
+    if not recipe_ids:
+        return []
+    recipes = {recipe.id: recipe for recipe in Recipe.query.filter(Recipe.id.in_(recipe_ids)).all()}
+    return [recipes[recipe_id] for recipe_id in recipe_ids if recipe_id in recipes]
+
+def get_keyset_order(sort_by):
+    """
+    返回游标分页使用的排序键 (列表达式列表, 是否降序)，最后一个键总是 Recipe.id 以保证唯一
+    不支持游标分页的排序返回 None
+    """
+    if sort_by == 'hot':
+        return [Recipe.hot_score, Recipe.id], True
+    if sort_by == 'newest':
+        return [Recipe.created_at, Recipe.id], True
+    if sort_by == 'oldest':
+        return [Recipe.created_at, Recipe.id], False
+    if sort_by == 'likes':
+        return [Recipe.likes_count, Recipe.created_at, Recipe.id], True
+    return None
+
+def encode_cursor(sort_by, values):
+    """将最后一条记录的排序键编码为不透明的游标字符串"""
+    encoded_values = [
+        {'dt': value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    payload = json.dumps({'s': sort_by, 'v': encoded_values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, sort_by, key_columns):
+    """解析游标并按排序键的列类型校验每个值，格式不正确或与当前排序不匹配时抛出 ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = payload['v']
+        if payload.get('s') != sort_by or not isinstance(values, list) or len(values) != len(key_columns):
+            raise ValueError('Cursor does not match the requested sort')
+        
+        decoded = []
+        for column, value in zip(key_columns, values):
+            if isinstance(column.type, DateTime):
+                # 时间列编码为 {'dt': ISO 字符串}
+                value = datetime.fromisoformat(value['dt'])
+            elif isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f'Invalid cursor value for {column.key}')
+            decoded.append(value)
+        return decoded
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f'Invalid cursor: {e}')
@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify, session
 from app.extensions import db
 from app.models.recipe_favorite_model import RecipeFavorite
 from app.models.recipe_model import Recipe
+from app.utils.recipe_stats_service import RecipeStatsService
 from app.models.user_model import User
 from sqlalchemy.exc import IntegrityError
 
@@ -57,10 +58,11 @@ def add_favorite():
         )
         
         db.session.add(favorite)
+        RecipeStatsService.record_favorite(recipe_id, 1)
         db.session.commit()
         
         # 获取该食谱的总收藏数
-        favorite_count = RecipeFavorite.query.filter_by(recipe_id=recipe_id).count()
+        favorite_count = RecipeStatsService.get_favorites_count(recipe_id)
         
         return jsonify({
             'success': True,
@@ -111,10 +113,11 @@ def remove_favorite(recipe_id):
         
         # 删除收藏记录
         db.session.delete(favorite)
+        RecipeStatsService.record_favorite(recipe_id, -1)
         db.session.commit()
         
         # 获取该食谱的总收藏数
-        favorite_count = RecipeFavorite.query.filter_by(recipe_id=recipe_id).count()
+        favorite_count = RecipeStatsService.get_favorites_count(recipe_id)
         
         return jsonify({
             'success': True,
@@ -200,7 +203,7 @@ def get_favorite_status(recipe_id):
                 'success': True,
                 'data': {
                     'is_favorited': False,
-                    'favorite_count': RecipeFavorite.query.filter_by(recipe_id=recipe_id).count()
+                    'favorite_count': RecipeStatsService.get_favorites_count(recipe_id)
                 }
             })
         
@@ -213,7 +216,7 @@ def get_favorite_status(recipe_id):
         ).first() is not None
         
         # 获取总收藏数
-        favorite_count = RecipeFavorite.query.filter_by(recipe_id=recipe_id).count()
+        favorite_count = RecipeStatsService.get_favorites_count(recipe_id)
         
         return jsonify({
             'success': True,
@@ -6,6 +6,8 @@
 from flask import Blueprint, request, jsonify, session
 from app.models.ingredient_model import Ingredient, IngredientCategory
 from app.extensions import db
+from app.utils.ingredient_catalog import IngredientCatalog
+from app.utils.ingredient_search_index import get_search_index
 from sqlalchemy import or_, and_, func
 import traceback
 
@@ -39,12 +41,12 @@ def get_ingredients():
         safe_for = request.args.get('safe_for', 'all')  # all, dogs, cats
         exclude_dangerous = request.args.get('exclude_dangerous', 'false').lower() == 'true'
         
-        # 构建基础查询
-        query = Ingredient.query.filter_by(is_active=True)
+        # 从食材目录缓存读取（已按名称排序）
+        ingredients = IngredientCatalog.all()
 
         # 排除危险食材（用于创建食谱）
         if exclude_dangerous:
-            query = query.filter(Ingredient.category != IngredientCategory.DANGEROUS)
+            ingredients = [ing for ing in ingredients if ing.category != IngredientCategory.DANGEROUS]
         
         # 分类筛选 - 修复分类名称映射
         if category != 'all':
@@ -72,7 +74,7 @@ def get_ingredients():
             
             try:
                 category_enum = IngredientCategory(category_value)
-                query = query.filter_by(category=category_enum)
+                ingredients = [ing for ing in ingredients if ing.category == category_enum]
                 print(f"成功设置分类筛选: {category_enum}")  # 调试日志
             except ValueError as ve:
                 print(f"无效的分类值: {category_value}, 错误: {ve}")
@@ -80,38 +82,24 @@ def get_ingredients():
         
         # 安全性筛选
         if safe_for == 'dogs':
-            query = query.filter_by(is_safe_for_dogs=True)
+            ingredients = [ing for ing in ingredients if ing.is_safe_for_dogs]
         elif safe_for == 'cats':
-            query = query.filter_by(is_safe_for_cats=True)
+            ingredients = [ing for ing in ingredients if ing.is_safe_for_cats]
         
-        # 搜索筛选
+        # 搜索筛选（倒排索引，按匹配等级排序：名称前缀 > 名称子串 > 描述）
         if search:
-            search_term = f'%{search}%'
-            query = query.filter(
-                or_(
-                    Ingredient.name.ilike(search_term),
-                    Ingredient.name_en.ilike(search_term),
-                    Ingredient.description.ilike(search_term)
-                )
-            )
-        
-        # 排序
-        query = query.order_by(Ingredient.name)
+            allowed_ids = {ing.id for ing in ingredients}
+            ingredients = [ing for ing in get_search_index().search(search) if ing.id in allowed_ids]
         
         # 分页
+        total = len(ingredients)
         if per_page > 0:
-            pagination = query.paginate(
-                page=page,
-                per_page=per_page,
-                error_out=False
-            )
-            ingredients = pagination.items
-            total = pagination.total
-            has_next = pagination.has_next
-            has_prev = pagination.has_prev
+            page = max(page, 1)
+            start = (page - 1) * per_page
+            ingredients = ingredients[start:start + per_page]
+            has_next = start + per_page < total
+            has_prev = page > 1
         else:
-            ingredients = query.all()
-            total = len(ingredients)
             has_next = False
             has_prev = False
         
@@ -185,7 +173,7 @@ def get_ingredients():
 def get_ingredient_detail(ingredient_id):
     """获取食材详细信息"""
     try:
-        ingredient = Ingredient.query.filter_by(id=ingredient_id, is_active=True).first()
+        ingredient = IngredientCatalog.get(ingredient_id)
         
         if not ingredient:
             return jsonify({'error': 'Ingredient not found'}), 404
@@ -257,13 +245,10 @@ def get_ingredient_detail(ingredient_id):
         }
         
         # 获取推荐搭配（相同分类的其他食材）
-        recommended_ingredients = Ingredient.query.filter(
-            and_(
-                Ingredient.category == ingredient.category,
-                Ingredient.id != ingredient.id,
-                Ingredient.is_active == True
-            )
-        ).limit(6).all()
+        recommended_ingredients = [
+            rec for rec in IngredientCatalog.by_category(ingredient.category)
+            if rec.id != ingredient.id
+        ][:6]
         
         recommended_data = []
         for rec_ingredient in recommended_ingredients:
@@ -323,24 +308,16 @@ def get_categories():
                 'supplements', 'dangerous'
             ]
         
-        # 构建查询条件
-        if exclude_dangerous:
-            # 排除危险食材分类
-            category_counts = db.session.query(
-                Ingredient.category,
-                func.count(Ingredient.id).label('count')
-            ).filter(
-                and_(
-                    Ingredient.is_active == True,
-                    Ingredient.category != IngredientCategory.DANGEROUS
-                )
-            ).group_by(Ingredient.category).all()
-        else:
-            # 包含所有分类
-            category_counts = db.session.query(
-                Ingredient.category,
-                func.count(Ingredient.id).label('count')
-            ).filter_by(is_active=True).group_by(Ingredient.category).all()
+        # 统计各分类的食材数量（来自食材目录缓存）
+        all_counts = {
+            category: len(IngredientCatalog.by_category(category))
+            for category in IngredientCategory
+            if IngredientCatalog.by_category(category)
+        }
+        category_counts = [
+            (category, count) for category, count in all_counts.items()
+            if not (exclude_dangerous and category == IngredientCategory.DANGEROUS)
+        ]
         
         # 转换为字典以便查找
         count_dict = {category.value: count for category, count in category_counts}
@@ -357,14 +334,8 @@ def get_categories():
                     'icon': get_category_icon(category_id)
                 })
         
-        # 统计各分类的食材数量
-        category_counts = db.session.query(
-            Ingredient.category,
-            func.count(Ingredient.id).label('count')
-        ).filter_by(is_active=True).group_by(Ingredient.category).all()
-        
         # 添加任何不在自定义顺序中但存在于数据库中的分类
-        for category, count in category_counts:
+        for category, count in all_counts.items():
             if category.value not in custom_order:
                 categories_data.append({
                     'id': category.value,
@@ -394,16 +365,8 @@ def get_search_suggestions():
         if len(query_term) < 2:
             return jsonify({'suggestions': []})
         
-        # 搜索食材名称
-        suggestions = Ingredient.query.filter(
-            and_(
-                or_(
-                    Ingredient.name.ilike(f'%{query_term}%'),
-                    Ingredient.name_en.ilike(f'%{query_term}%')
-                ),
-                Ingredient.is_active == True
-            )
-        ).limit(10).all()
+        # 搜索食材名称（倒排索引，名称前缀匹配优先）
+        suggestions = get_search_index().search(query_term, include_description=False, limit=10)
         
         suggestions_data = []
         for ingredient in suggestions:
@@ -430,21 +393,16 @@ def get_ingredient_stats():
     """获取食材统计信息"""
     try:
         # 总体统计
-        total_ingredients = Ingredient.query.filter_by(is_active=True).count()
-        safe_for_dogs = Ingredient.query.filter_by(is_active=True, is_safe_for_dogs=True).count()
-        safe_for_cats = Ingredient.query.filter_by(is_active=True, is_safe_for_cats=True).count()
-        common_allergens = Ingredient.query.filter_by(is_active=True, is_common_allergen=True).count()
+        ingredients = IngredientCatalog.all()
+        total_ingredients = len(ingredients)
+        safe_for_dogs = sum(1 for ing in ingredients if ing.is_safe_for_dogs)
+        safe_for_cats = sum(1 for ing in ingredients if ing.is_safe_for_cats)
+        common_allergens = sum(1 for ing in ingredients if ing.is_common_allergen)
         
         # 按季节统计 - 保持中文季节名称，因为这是数据库中的值
         seasonal_stats = {}
         for season in ['春季', '夏季', '秋季', '冬季', '全年']:
-            count = Ingredient.query.filter(
-                and_(
-                    Ingredient.is_active == True,
-                    Ingredient.seasonality.like(f'%{season}%')
-                )
-            ).count()
-            seasonal_stats[season] = count
+            seasonal_stats[season] = sum(1 for ing in ingredients if season in (ing.seasonality or ''))
         
         return jsonify({
             'success': True,
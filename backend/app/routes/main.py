@@ -3,9 +3,11 @@ from flask import Blueprint, render_template, session, redirect, url_for, flash,
 from app.models.pet_model import Pet
 from app.models.user_model import User
 from app.models.recipe_model import Recipe, RecipeStatus
+from app.models.nutrition_requirements_model import NutritionRequirement
 from app.extensions import db
 from app.models.recipe_favorite_model import RecipeFavorite
 from app.models.recipe_like_model import RecipeLike
+from app.utils.allergen_service import AllergenService
 from werkzeug.security import check_password_hash, generate_password_hash
 import re
 from datetime import datetime
@@ -66,8 +68,16 @@ def user_center():
         except:
             recipes_count = 0
 
+        # 一次计算全部宠物的每日营养需求
+        try:
+            pet_requirements = NutritionRequirement.get_requirements_for_pets(pets)
+        except Exception as req_error:
+            print(f"⚠️ 计算宠物营养需求出错: {req_error}")
+            pet_requirements = {}
+
         return render_template('user_center.html',
                                 pets=pets,
+                                pet_requirements=pet_requirements,
                                 favorites_count=favorites_count,
                                 recipes_count=recipes_count)
     
@@ -342,6 +352,15 @@ def get_user_recipes():
         recipe_pets = recipes_query.all()
         print(f"📊 找到 {len(recipe_pets)} 个食谱")  # 调试日志
         
+        # 按宠物批量检查过敏安全性（每只宠物一次查询）
+        safety_checks = {}
+        recipes_by_pet = {}
+        for recipe, pet in recipe_pets:
+            if pet is not None and pet.user_id == user_id:
+                recipes_by_pet.setdefault(pet.id, []).append(recipe.id)
+        for pet_id, recipe_ids in recipes_by_pet.items():
+            safety_checks.update(AllergenService.check_recipes_safety(recipe_ids, pet_id))
+        
         recipes_data = []
         for recipe, pet in recipe_pets:
             try:
@@ -371,7 +390,8 @@ def get_user_recipes():
                     'updated_at': recipe.updated_at.isoformat() if recipe.updated_at else None,
                     'is_favorited': is_favorited,
                     'status': recipe.status.value if hasattr(recipe.status, 'value') else 'draft',
-                    'is_public': getattr(recipe, 'is_public', False)
+                    'is_public': getattr(recipe, 'is_public', False),
+                    'safety_check': safety_checks.get(recipe.id)  # 对所属宠物的过敏检查
                 }
                 
                 recipes_data.append(recipe_dict)
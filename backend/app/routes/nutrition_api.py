@@ -3,13 +3,21 @@
 提供实时营养计算和比例推荐功能
 """
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, request, jsonify, session
 from app.models.ingredient_model import Ingredient
 from app.models.pet_model import Pet
-from app.utils.nutrition_ratio_config import NutritionRatioService, NutritionProfile
+from app.models.recipe_model import Recipe
+from app.utils.nutrition_ratio_config import NutritionRatioService, NutritionProfile, plans_json
+from app.utils.nutrient_matrix import get_nutrient_matrix, nutrient_vector_to_dict
+from app.utils.ingredient_catalog import IngredientCatalog
+from app.utils.pet_nutrition_profile import get_pet_profile
+from app.utils.weight_optimizer import WeightOptimizer
+from app.utils.aafco_evaluator import AafcoEvaluator
+from app.utils.nutrition_requirement_index import get_requirement_index
 from app.extensions import db
 import json
 import traceback
+import numpy as np
 
 nutrition_api_bp = Blueprint('nutrition_api', __name__)
 
@@ -33,25 +41,9 @@ def calculate_nutrition():
         if not ingredients_data:
             return jsonify({'error': 'Please select ingredients'}), 400
         
-        # 修复：统一处理pet_id数据类型
-        if pet_id:
-            try:
-                pet_id = int(pet_id)  # 确保是整数
-            except (ValueError, TypeError):
-                pet_id = None
-        
-        # 修复：统一数据格式处理
-        ingredient_ids = []
-        weight_map = {}
-        
-        for item in ingredients_data:
-            # 支持两种字段名格式：ingredient_id 和 id
-            ingredient_id = item.get('ingredient_id') or item.get('id')
-            weight = float(item.get('weight', 0))
-            
-            if ingredient_id and weight > 0:
-                ingredient_ids.append(int(ingredient_id))
-                weight_map[int(ingredient_id)] = weight
+        pet_id = parse_pet_id(pet_id)
+        weight_map = parse_weight_map(ingredients_data)
+        ingredient_ids = list(weight_map.keys())
         
         if not ingredient_ids:
             return jsonify({'error': 'Please set a valid weight for the ingredients'}), 400
@@ -59,12 +51,13 @@ def calculate_nutrition():
         print(f"Processing ingredient IDs: {ingredient_ids}")
         print(f"Weight map: {weight_map}")
         
-        # 获取食材信息
-        ingredients = Ingredient.query.filter(Ingredient.id.in_(ingredient_ids)).all()
-        if not ingredients:
+        # 从营养矩阵中定位食材（矩阵常驻内存，无需逐个查询数据库）
+        matrix = get_nutrient_matrix()
+        found_ids, rows = matrix.lookup(weight_map.keys())
+        if not found_ids:
             return jsonify({'error': 'No valid ingredients found'}), 404
         
-        print(f"Found ingredients count: {len(ingredients)}")
+        print(f"Found ingredients count: {len(found_ids)}")
         
         # 获取宠物信息（可选）
         pet = None
@@ -73,109 +66,175 @@ def calculate_nutrition():
             if pet:
                 print(f"Found pet: {pet.name}")
         
-        # 计算总营养成分
-        total_nutrition = {
-            'total_weight': 0.0,
-            'calories': 0.0,
-            'protein': 0.0,
-            'fat': 0.0,
-            'carbohydrate': 0.0,
-            'fiber': 0.0,
-            'calcium': 0.0,
-            'phosphorus': 0.0,
-            'vitamin_a': 0.0,
-            'vitamin_d': 0.0,
-            'taurine': 0.0,
-            'omega_3': 0.0,
-            'omega_6': 0.0
-        }
+        # 计算完整营养成分：贡献矩阵 = 每100g营养矩阵 × (重量/100)，总量为按列求和
+        weights = np.array([weight_map[ing_id] for ing_id in found_ids], dtype=np.float64)
+        contributions = matrix.contributions(rows, weights)
+        result = build_nutrition_result(matrix, found_ids, rows, weights,
+                                        contributions.sum(axis=0), contributions, pet)
+        total_nutrition = result['total_nutrition']
         
-        ingredient_details = []
+        print(f"营养计算成功: 总重量={total_nutrition['total_weight']}g, 热量={total_nutrition['calories']:.1f}kcal")
         
-        for ingredient in ingredients:
-            weight = weight_map.get(ingredient.id, 0)
-            if weight <= 0:
+        return jsonify(result)
+        
+    except Exception as e:
+        print(f"营养计算失败: {str(e)}")
+        traceback.print_exc()  # 打印完整错误堆栈
+        return jsonify({'error': f'Failed to calculate nutrition: {str(e)}'}), 500
+
+MAX_BATCH_VARIANTS = 100
+
+@nutrition_api_bp.route('/api/nutrition/calculate-batch', methods=['POST'])
+def calculate_nutrition_batch():
+    """批量计算多个配比方案的营养成分（一次请求完成多方案对比）"""
+    try:
+        if 'user_id' not in session:
+            return jsonify({'error': 'Please log in first'}), 401
+        
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'Invalid request data'}), 400
+        
+        variants = data.get('variants', [])
+        if not isinstance(variants, list) or not variants:
+            return jsonify({'error': 'Please provide at least one variant'}), 400
+        if len(variants) > MAX_BATCH_VARIANTS:
+            return jsonify({'error': f'At most {MAX_BATCH_VARIANTS} variants are allowed per request'}), 400
+        
+        include_details = bool(data.get('include_details', True))
+        default_pet_id = data.get('pet_id')
+        
+        # 解析所有方案（单个方案格式错误不影响其他方案）
+        parsed = []
+        for variant in variants:
+            if not isinstance(variant, dict):
+                parsed.append((None, None, 'Invalid variant data'))
+                continue
+            try:
+                weight_map = parse_weight_map(variant.get('ingredients', []))
+            except (ValueError, TypeError, AttributeError):
+                parsed.append((None, None, 'Invalid ingredient data'))
                 continue
+            pet_id = parse_pet_id(variant.get('pet_id', default_pet_id))
+            parsed.append((weight_map, pet_id, None))
+        
+        # 一次查询获取所有方案涉及的宠物
+        pet_ids = {pet_id for _, pet_id, _ in parsed if pet_id}
+        pets = {}
+        if pet_ids:
+            pets = {
+                pet.id: pet for pet in Pet.query.filter(
+                    Pet.id.in_(pet_ids),
+                    Pet.user_id == session['user_id']
+                ).all()
+            }
+        
+        # 构建重量矩阵 W（方案数 × 涉及食材数），一次矩阵乘法得到全部方案的营养总量
+        matrix = get_nutrient_matrix()
+        union_ids = sorted({ing_id for weight_map, _, _ in parsed if weight_map for ing_id in weight_map})
+        found_ids, union_rows = matrix.lookup(union_ids)
+        column_of = {ing_id: col for col, ing_id in enumerate(found_ids)}
+        
+        weight_matrix = np.zeros((len(parsed), len(found_ids)), dtype=np.float64)
+        for index, (weight_map, _, _) in enumerate(parsed):
+            for ing_id, weight in (weight_map or {}).items():
+                col = column_of.get(ing_id)
+                if col is not None:
+                    weight_matrix[index, col] = weight
+        
+        totals = (weight_matrix / 100.0) @ matrix.matrix[union_rows]
+        
+        # 逐个方案生成结果并评估
+        results = []
+        for index, (weight_map, pet_id, error) in enumerate(parsed):
+            label = variants[index].get('label') if isinstance(variants[index], dict) else None
             
-            print(f"处理食材: {ingredient.name}, 重量: {weight}g")
+            if error is None and not weight_map:
+                error = 'Please set a valid weight for the ingredients'
             
-            # 重量比例 (基于100g)
-            weight_ratio = weight / 100.0
+            variant_ids = [ing_id for ing_id in (weight_map or {}) if ing_id in column_of]
+            if error is None and not variant_ids:
+                error = 'No valid ingredients found'
             
-            # 计算该食材的营养贡献 - 修复：处理None值
-            contribution = {
-                'calories': (ingredient.calories or 0) * weight_ratio,
-                'protein': (ingredient.protein or 0) * weight_ratio,
-                'fat': (ingredient.fat or 0) * weight_ratio,
-                'carbohydrate': (ingredient.carbohydrate or 0) * weight_ratio,
-                'fiber': (ingredient.fiber or 0) * weight_ratio,
-                'calcium': (ingredient.calcium or 0) * weight_ratio,
-                'phosphorus': (ingredient.phosphorus or 0) * weight_ratio,
-                'vitamin_a': (ingredient.vitamin_a or 0) * weight_ratio,
-                'vitamin_d': (ingredient.vitamin_d or 0) * weight_ratio,
-                'taurine': (ingredient.taurine or 0) * weight_ratio,
-                'omega_3': (getattr(ingredient, 'omega_3_fatty_acids', None) or 0) * weight_ratio,
-                'omega_6': (getattr(ingredient, 'omega_6_fatty_acids', None) or 0) * weight_ratio,
-            }
+            if error:
+                results.append({'index': index, 'label': label, 'success': False, 'error': error})
+                continue
             
-            # 累加到总营养
-            total_nutrition['total_weight'] += weight
-            for key in total_nutrition:
-                if key != 'total_weight' and key in contribution:
-                    total_nutrition[key] += contribution[key]
+            cols = [column_of[ing_id] for ing_id in variant_ids]
+            rows = union_rows[cols]
+            weights = weight_matrix[index, cols]
+            contributions = matrix.contributions(rows, weights) if include_details else None
             
-            # 记录食材详情
-            ingredient_details.append({
-                'id': ingredient.id,
-                'name': ingredient.name,
-                'category': ingredient.category.value,
-                'weight': weight,
-                'percentage': 0,  # 稍后计算
-                'contribution': contribution
-            })
-        
-        # 计算每个食材的重量百分比
-        if total_nutrition['total_weight'] > 0:
-            for detail in ingredient_details:
-                detail['percentage'] = round((detail['weight'] / total_nutrition['total_weight']) * 100, 1)
-        
-        # 计算营养比例
-        nutrition_ratios = {}
-        if total_nutrition['total_weight'] > 0:
-            nutrition_ratios = {
-                'protein_percent': round((total_nutrition['protein'] / total_nutrition['total_weight']) * 100, 1),
-                'fat_percent': round((total_nutrition['fat'] / total_nutrition['total_weight']) * 100, 1),
-                'carbohydrate_percent': round((total_nutrition['carbohydrate'] / total_nutrition['total_weight']) * 100, 1),
-                'fiber_percent': round((total_nutrition['fiber'] / total_nutrition['total_weight']) * 100, 1),
-                'calories_per_100g': round((total_nutrition['calories'] / total_nutrition['total_weight']) * 100, 1)
-            }
+            result = build_nutrition_result(matrix, variant_ids, rows, weights,
+                                            totals[index], contributions, pets.get(pet_id))
+            result.update({'index': index, 'label': label})
+            results.append(result)
         
-        # 营养评估（简化版）
-        nutrition_analysis = assess_nutrition_adequacy(total_nutrition, nutrition_ratios, pet)
+        print(f"批量营养计算完成: {len(results)} 个方案, {len(found_ids)} 种食材")
         
-        # 返回结果
-        result = {
+        return jsonify({
             'success': True,
-            'total_nutrition': total_nutrition,
-            'nutrition_ratios': nutrition_ratios,
-            'ingredient_details': ingredient_details,
-            'nutrition_analysis': nutrition_analysis,
-            'pet_info': {
-                'id': pet.id,
-                'name': pet.name,
-                'species': pet.species,
-                'weight': pet.weight
-            } if pet else None
-        }
+            'count': len(results),
+            'results': results
+        })
         
-        print(f"营养计算成功: 总重量={total_nutrition['total_weight']}g, 热量={total_nutrition['calories']:.1f}kcal")
+    except Exception as e:
+        print(f"批量营养计算失败: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': f'Failed to calculate nutrition: {str(e)}'}), 500
+
+@nutrition_api_bp.route('/api/nutrition/aafco-compliance', methods=['POST'])
+def check_aafco_compliance():
+    """批量检查已保存食谱是否满足宠物的营养需求标准（默认检查当前用户的全部食谱）"""
+    try:
+        if 'user_id' not in session:
+            return jsonify({'error': 'Please log in first'}), 401
         
-        return jsonify(result)
+        data = request.get_json() or {}
+        pet_id = parse_pet_id(data.get('pet_id'))
+        if not pet_id:
+            return jsonify({'error': 'Please select a pet'}), 400
+        
+        pet = Pet.query.filter_by(id=pet_id, user_id=session['user_id']).first()
+        if not pet:
+            return jsonify({'error': 'Pet not found'}), 404
+        
+        requirement_row = get_requirement_index().row_for_pet(pet)
+        if requirement_row is None:
+            return jsonify({'error': 'No nutrition requirement standard applies to this pet'}), 404
+        
+        # 只检查公开食谱或当前用户自己的食谱
+        query = db.session.query(Recipe.id).filter(
+            db.or_(Recipe.user_id == session['user_id'], Recipe.is_public.is_(True))
+        )
+        recipe_ids = data.get('recipe_ids')
+        if recipe_ids is not None:
+            if not isinstance(recipe_ids, list):
+                return jsonify({'error': 'recipe_ids must be a list'}), 400
+            try:
+                recipe_ids = {int(recipe_id) for recipe_id in recipe_ids}
+            except (ValueError, TypeError):
+                return jsonify({'error': 'Invalid recipe ID'}), 400
+            query = query.filter(Recipe.id.in_(recipe_ids))
+        else:
+            query = query.filter(Recipe.user_id == session['user_id'])
+        
+        accessible_ids = [row.id for row in query.all()]
+        results = AafcoEvaluator.evaluate_recipes(accessible_ids, requirement_row)
+        
+        return jsonify({
+            'success': True,
+            'pet_id': pet.id,
+            'count': len(results),
+            'compliant_count': sum(1 for result in results.values() if result['compliant']),
+            'results': {str(recipe_id): result for recipe_id, result in results.items()},
+            'not_found': sorted(set(recipe_ids) - set(accessible_ids)) if recipe_ids is not None else []
+        })
         
     except Exception as e:
-        print(f"营养计算失败: {str(e)}")
-        traceback.print_exc()  # 打印完整错误堆栈
-        return jsonify({'error': f'Failed to calculate nutrition: {str(e)}'}), 500
+        print(f"营养标准检查失败: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': f'Failed to check nutrition standards: {str(e)}'}), 500
 
 @nutrition_api_bp.route('/api/nutrition/plans', methods=['GET'])
 def get_nutrition_plans():
@@ -185,87 +244,14 @@ def get_nutrition_plans():
         
         if not pet_id:
             # 返回所有基础方案
-            plans = []
-            for profile, plan in NutritionRatioService.NUTRITION_PLANS.items():
-                plans.append({
-                    'id': profile.value,
-                    'name': plan.name,
-                    'description': plan.description,
-                    'special_notes': plan.special_notes,
-                    'category_ratios': {
-                        'red_meat': plan.category_ratios.red_meat,
-                        'white_meat': plan.category_ratios.white_meat,
-                        'fish': plan.category_ratios.fish,
-                        'organs': plan.category_ratios.organs,
-                        'vegetables': plan.category_ratios.vegetables,
-                        'fruits': plan.category_ratios.fruits,
-                        'grains': plan.category_ratios.grains
-                    },
-                    'is_recommended': False
-                })
-            return jsonify({'plans': plans})
-        
-        # 根据宠物信息推荐方案
-        pet = Pet.query.filter_by(id=int(pet_id), user_id=session.get('user_id')).first()
-        if not pet:
-            return jsonify({'error': 'Pet information not found'}), 404
-        
-        # 解析特殊需求
-        special_needs = []
-        if pet.special_needs and pet.special_needs != 'None':
-            special_needs = [need.strip() for need in pet.special_needs.split(',')]
+            return Response(plans_json(), mimetype='application/json')
         
-        # 获取推荐方案
-        suitable_profiles = NutritionRatioService.get_suitable_plans(
-            pet.species, pet.age, special_needs
-        )
+        # 根据宠物营养画像推荐方案，其他方案作为可选方案附在后面
+        pet_profile = get_pet_profile(int(pet_id), user_id=session.get('user_id'))
+        if not pet_profile:
+            return jsonify({'error': 'Pet information not found'}), 404
         
-        plans = []
-        for profile in suitable_profiles:
-            plan = NutritionRatioService.get_plan(profile)
-            if plan:
-                plans.append({
-                    'id': profile.value,
-                    'name': plan.name,
-                    'description': plan.description,
-                    'special_notes': plan.special_notes,
-                    'category_ratios': {
-                        'red_meat': plan.category_ratios.red_meat,
-                        'white_meat': plan.category_ratios.white_meat,
-                        'fish': plan.category_ratios.fish,
-                        'organs': plan.category_ratios.organs,
-                        'vegetables': plan.category_ratios.vegetables,
-                        'fruits': plan.category_ratios.fruits,
-                        'grains': plan.category_ratios.grains
-                    },
-                    'is_recommended': True
-                })
-        
-        # 添加其他可选方案
-        all_profiles = set(NutritionRatioService.NUTRITION_PLANS.keys())
-        other_profiles = all_profiles - set(suitable_profiles)
-        
-        for profile in other_profiles:
-            plan = NutritionRatioService.get_plan(profile)
-            if plan:
-                plans.append({
-                    'id': profile.value,
-                    'name': plan.name,
-                    'description': plan.description,
-                    'special_notes': plan.special_notes,
-                    'category_ratios': {
-                        'red_meat': plan.category_ratios.red_meat,
-                        'white_meat': plan.category_ratios.white_meat,
-                        'fish': plan.category_ratios.fish,
-                        'organs': plan.category_ratios.organs,
-                        'vegetables': plan.category_ratios.vegetables,
-                        'fruits': plan.category_ratios.fruits,
-                        'grains': plan.category_ratios.grains
-                    },
-                    'is_recommended': False
-                })
-        
-        return jsonify({'plans': plans})
+        return Response(plans_json(pet_profile.suitable_plans), mimetype='application/json')
         
     except Exception as e:
         print(f"获取营养方案失败: {str(e)}")
@@ -296,26 +282,25 @@ def suggest_ingredient_weights():
             return jsonify({'error': 'Nutrition plan not found'}), 404
         
         # 获取食材信息
-        ingredients = Ingredient.query.filter(Ingredient.id.in_(ingredient_ids)).all()
-        ingredient_dict = {ing.id: ing for ing in ingredients}
+        ingredient_dict = IngredientCatalog.get_many(ingredient_ids)
+        ingredients = list(ingredient_dict.values())
+        
+        # 有宠物信息时按宠物每日所需热量确定总重量
+        daily_calories = None
+        if pet_id:
+            pet_profile = get_pet_profile(pet_id, user_id=session.get('user_id'))
+            if pet_profile:
+                daily_calories = pet_profile.daily_calories
         
-        # 计算推荐重量
-        suggested_weights = NutritionRatioService.calculate_ingredient_weights(
-            nutrition_plan, total_weight, ingredient_dict
+        # 求解满足营养方案目标的推荐重量（只计算一次）
+        solution = WeightOptimizer.optimize(
+            nutrition_plan, ingredient_dict, total_weight=total_weight, daily_calories=daily_calories
         )
+        if solution is None:
+            return jsonify({'error': 'No valid ingredients'}), 400
         
-        # 如果有宠物信息，调整总重量
-        if pet_id:
-            pet = Pet.query.filter_by(id=pet_id, user_id=session.get('user_id')).first()
-            if pet:
-                # 根据宠物体重计算建议的日食量
-                daily_food_amount = calculate_daily_food_amount(pet.weight, pet.species, pet.age)
-                total_weight = daily_food_amount
-                
-                # 重新计算重量
-                suggested_weights = NutritionRatioService.calculate_ingredient_weights(
-                    nutrition_plan, total_weight, ingredient_dict
-                )
+        suggested_weights = solution.weights
+        total_weight = round(solution.total_weight, 1)
         
         # 格式化返回结果
         result = []
@@ -326,16 +311,18 @@ def suggest_ingredient_weights():
                 'ingredient_name': ingredient.name,
                 'category': ingredient.category.value,
                 'suggested_weight': round(weight, 1),
-                'percentage': round((weight / total_weight) * 100, 1) if total_weight > 0 else 0
+                'percentage': round((weight / solution.total_weight) * 100, 1) if solution.total_weight > 0 else 0
             })
         
         return jsonify({
             'suggested_weights': result,
             'total_weight': total_weight,
+            'daily_calories': round(daily_calories, 1) if daily_calories else None,
             'nutrition_plan': {
                 'name': nutrition_plan.name,
                 'description': nutrition_plan.description
-            }
+            },
+            'feasibility': solution.report
         })
         
     except Exception as e:
@@ -423,30 +410,78 @@ def assess_nutrition_adequacy(total_nutrition, nutrition_ratios, pet=None):
     
     return assessment
 
-# 辅助函数：计算每日推荐食量
-def calculate_daily_food_amount(weight_kg, species, age):
-    """计算每日推荐食量（克）"""
+# 辅助函数：解析宠物ID
+def parse_pet_id(pet_id):
+    """统一处理pet_id数据类型，无效时返回None"""
+    if not pet_id:
+        return None
     try:
-        # 基础代谢率计算（简化）
-        if species.lower() == 'dog':
-            if age < 1:  # 幼犬
-                daily_calories = weight_kg * 100
-            elif age > 7:  # 老年犬
-                daily_calories = weight_kg * 80
-            else:  # 成犬
-                daily_calories = weight_kg * 95
-        else:  # 猫
-            if age < 1:  # 幼猫
-                daily_calories = weight_kg * 120
-            elif age > 7:  # 老年猫
-                daily_calories = weight_kg * 85
-            else:  # 成猫
-                daily_calories = weight_kg * 100
-        
-        # 假设食物热量密度为每克3.5大卡
-        daily_food_g = daily_calories / 3.5
-        return round(daily_food_g, 1)
-        
-    except:
-        # 默认值
-        return weight_kg * 25
\ No newline at end of file
+        return int(pet_id)
+    except (ValueError, TypeError):
+        return None
+
+# 辅助函数：解析食材重量
+def parse_weight_map(ingredients_data):
+    """将请求中的食材列表解析为 {食材ID: 重量(g)}，忽略重量无效的项"""
+    weight_map = {}
+    for item in ingredients_data:
+        # 支持两种字段名格式：ingredient_id 和 id
+        ingredient_id = item.get('ingredient_id') or item.get('id')
+        weight = float(item.get('weight', 0))
+        
+        if ingredient_id and weight > 0:
+            weight_map[int(ingredient_id)] = weight
+    return weight_map
+
+# 辅助函数：组装营养计算结果
+def build_nutrition_result(matrix, ingredient_ids, rows, weights, totals, contributions=None, pet=None):
+    """根据营养总量向量生成接口返回数据；contributions 为 None 时不返回食材明细"""
+    total_weight = float(np.sum(weights))
+    
+    total_nutrition = {'total_weight': total_weight}
+    total_nutrition.update(nutrient_vector_to_dict(totals))
+    
+    ingredient_details = None
+    if contributions is not None:
+        ingredient_details = []
+        for index, ing_id in enumerate(ingredient_ids):
+            row = rows[index]
+            weight = float(weights[index])
+            ingredient_details.append({
+                'id': ing_id,
+                'name': matrix.names[row],
+                'category': matrix.categories[row],
+                'weight': weight,
+                'percentage': round(weight / total_weight * 100, 1),
+                'contribution': nutrient_vector_to_dict(contributions[index])
+            })
+    
+    # 计算营养比例
+    nutrition_ratios = {
+        'protein_percent': round((total_nutrition['protein'] / total_weight) * 100, 1),
+        'fat_percent': round((total_nutrition['fat'] / total_weight) * 100, 1),
+        'carbohydrate_percent': round((total_nutrition['carbohydrate'] / total_weight) * 100, 1),
+        'fiber_percent': round((total_nutrition['fiber'] / total_weight) * 100, 1),
+        'calories_per_100g': round((total_nutrition['calories'] / total_weight) * 100, 1)
+    }
+    
+    result = {
+        'success': True,
+        'total_nutrition': total_nutrition,
+        'nutrition_ratios': nutrition_ratios,
+        'ingredient_details': ingredient_details,
+        # 营养评估（简化版）
+        'nutrition_analysis': assess_nutrition_adequacy(total_nutrition, nutrition_ratios, pet),
+        'pet_info': {
+            'id': pet.id,
+            'name': pet.name,
+            'species': pet.species,
+            'weight': pet.weight
+        } if pet else None
+    }
+    if pet:
+        # 按宠物适用的营养需求标准逐项检查（干物质基础），没有适用标准时为 None
+        result['aafco_compliance'] = AafcoEvaluator.evaluate_for_pet(totals, total_weight, pet)
+    if ingredient_details is None:
+        del result['ingredient_details']
+    return result
@@ -1,6 +1,7 @@
 # 需要JWT认证才能访问的示例路由
 from flask import Blueprint, jsonify, request, session
 from app.models.pet_model import Pet
+from app.models.nutrition_requirements_model import NutritionRequirement
 from app import db
 
 pet_bp = Blueprint('pet_bp', __name__)
@@ -37,10 +38,12 @@ def get_pets():
         
     user_id = session['user_id']
     pets = Pet.query.filter_by(user_id=user_id).all()
+    requirements = NutritionRequirement.get_requirements_for_pets(pets)
     
     return jsonify([{
         "name": pet.name,
         "species": pet.species,
         "age": pet.age,
-        "weight": pet.weight
+        "weight": pet.weight,
+        "daily_requirements": requirements.get(pet.id)
     } for pet in pets]), 200
\ No newline at end of file
@@ -1,14 +1,20 @@
 # 食谱相关路由
 # 处理食谱创建、营养分析等功能
-from flask import Blueprint, request, jsonify, session, render_template, redirect, url_for, flash
+from flask import Blueprint, request, jsonify, session, render_template, redirect, url_for, flash, current_app
 from app.models.ingredient_model import Ingredient, IngredientCategory
 from app.models.recipe_model import Recipe, RecipeStatus
 from app.models.recipe_ingredient_model import RecipeIngredient
 from app.models.nutrition_requirements_model import NutritionRequirement, PetType, LifeStage, ActivityLevel
+from app.utils.nutrition_requirement_index import life_stage_for
 from app.models.pet_model import Pet
 from app.extensions import db
+from app.utils.ingredient_catalog import IngredientCatalog
+from app.utils.ingredient_search_index import get_search_index
 from sqlalchemy import func
+from collections import OrderedDict
+import hashlib
 import json
+import threading
 
 recipe_bp = Blueprint('recipe_bp', __name__)
 
@@ -27,122 +33,25 @@ def create_recipe():
     
     return render_template('create_recipe.html', pets=user_pets)
 
+# 食材列表响应缓存：(目录版本, 分类, 搜索词) -> (JSON字节, ETag)
+INGREDIENT_PAYLOAD_CACHE_SIZE = 128
+_ingredient_payload_cache = OrderedDict()
+_ingredient_payload_lock = threading.Lock()
+
 @recipe_bp.route('/api/ingredients')
 def get_ingredients():
-    """获取食材列表API"""
+    """获取食材列表API（序列化结果按目录版本缓存，支持 If-None-Match 返回 304）"""
     try:
-        category = request.args.get('category')
+        category = request.args.get('category') or ''
         search = request.args.get('search', '')
-    
-        query = db.session.query(Ingredient).filter(Ingredient.is_active == True)
-    
-        # 分类过滤
-        if category:
-            try:
-                category_enum = IngredientCategory(category)
-                query = query.filter(Ingredient.category == category_enum)
-            except ValueError:
-                pass
-    
-        # 搜索过滤
-        if search:
-            query = query.filter(
-                db.or_(
-                    Ingredient.name.contains(search),
-                    Ingredient.name_en.contains(search)
-                )
-            )
-    
-        # 安全性过滤 - 只返回安全的食材
-        query = query.filter(
-            db.and_(
-                Ingredient.is_safe_for_dogs == True,
-                Ingredient.is_safe_for_cats == True
-            )
-        )
-        
-        ingredients = query.all()
-        
-        # 确保返回完整的营养信息
-        result = []
-        for ing in ingredients:
-            # 安全处理可能为 None 的营养字段
-            calories = float(ing.calories) if ing.calories is not None else 0.0
-            protein = float(ing.protein) if ing.protein is not None else 0.0
-            fat = float(ing.fat) if ing.fat is not None else 0.0
-            carbohydrate = float(ing.carbohydrate) if ing.carbohydrate is not None else 0.0
-            fiber = float(ing.fiber) if ing.fiber is not None else 0.0
-            calcium = float(ing.calcium) if ing.calcium is not None else 0.0
-            phosphorus = float(ing.phosphorus) if ing.phosphorus is not None else 0.0
-            
-            # 生成营养摘要文本 - 前端期望的字段
-            nutrition_summary = f"Calories: {calories:.0f}kcal/100g | Protein: {protein:.1f}g | Fat: {fat:.1f}g | Carbs: {carbohydrate:.1f}g"
-            
-            # 如果有钙磷信息，添加到摘要中
-            if calcium > 0 or phosphorus > 0:
-                nutrition_summary += f" | Ca: {calcium:.0f}mg | P: {phosphorus:.0f}mg"
-                        
-            ingredient_data = {
-                'id': ing.id,
-                'name': ing.name,
-                'name_en': ing.name_en,
-                'category': ing.category.value,
-                'image_filename': ing.image_filename,
-                'seasonality': ing.seasonality,
-                # 基础营养信息
-                'calories': calories,
-                'protein': protein,
-                'fat': fat,
-                'carbohydrate': carbohydrate,
-                'fiber': fiber,
-                'moisture': float(ing.moisture) if ing.moisture is not None else 0.0,
-                'ash': float(ing.ash) if ing.ash is not None else 0.0,
-
-                # 矿物质
-                'calcium': calcium,
-                'phosphorus': phosphorus,
-                'potassium': float(ing.potassium) if ing.potassium is not None else 0.0,
-                'sodium': float(ing.sodium) if ing.sodium is not None else 0.0,
-                'magnesium': float(ing.magnesium) if ing.magnesium is not None else 0.0,
-                'iron': float(ing.iron) if ing.iron is not None else 0.0,
-                'zinc': float(ing.zinc) if ing.zinc is not None else 0.0,
-                
-                # 维生素
-                'vitamin_a': float(ing.vitamin_a) if ing.vitamin_a is not None else 0.0,
-                'vitamin_d': float(ing.vitamin_d) if ing.vitamin_d is not None else 0.0,
-                'vitamin_e': float(ing.vitamin_e) if ing.vitamin_e is not None else 0.0,
-                'taurine': float(ing.taurine) if ing.taurine is not None else 0.0,
-                
-                # 脂肪酸
-                'omega_3_fatty_acids': float(ing.omega_3_fatty_acids) if ing.omega_3_fatty_acids is not None else 0.0,
-                'omega_6_fatty_acids': float(ing.omega_6_fatty_acids) if ing.omega_6_fatty_acids is not None else 0.0,
-                
-                # 安全性信息
-                'is_safe_for_dogs': bool(ing.is_safe_for_dogs),
-                'is_safe_for_cats': bool(ing.is_safe_for_cats),
-                'is_common_allergen': bool(ing.is_common_allergen),
-                
-                # 前端显示字段 - 关键修复
-                'nutrition_summary': nutrition_summary,
-                
-                # 食材指南信息
-                'description': ing.description,
-                'benefits': ing.benefits,
-                'preparation_method': ing.preparation_method,
-                'pro_tip': ing.pro_tip,
-                'allergy_alert': ing.allergy_alert,
-                'storage_notes': ing.storage_notes
-            }
-            result.append(ingredient_data)
         
-        # 按名称排序
-        result.sort(key=lambda x: x['name'])
+        body, etag = get_ingredient_list_payload(category, search)
         
-        return jsonify({
-            'success': True,
-            'ingredients': result,
-            'total_count': len(result)
-        })
+        response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        # 允许浏览器和CDN缓存，但每次需用 ETag 重新验证
+        response.headers['Cache-Control'] = 'public, no-cache'
+        return response.make_conditional(request)
         
     except Exception as e:
         print(f"Failed to load ingredients: {str(e)}")
@@ -150,6 +59,135 @@ def get_ingredients():
         traceback.print_exc()
         return jsonify({'error': 'Failed to load ingredients', 'details': str(e)}), 500
 
+def get_ingredient_list_payload(category, search):
+    """获取序列化后的食材列表及其 ETag，目录版本变化后自动重建"""
+    version = IngredientCatalog.version()
+    key = (version, category, search)
+    
+    with _ingredient_payload_lock:
+        cached = _ingredient_payload_cache.get(key)
+        if cached is not None:
+            _ingredient_payload_cache.move_to_end(key)
+            return cached
+    
+    result = build_ingredient_list(category, search)
+    payload = {
+        'success': True,
+        'ingredients': result,
+        'total_count': len(result)
+    }
+    body = (current_app.json.dumps(payload) + '\n').encode('utf-8')
+    cached = (body, hashlib.sha1(body).hexdigest())
+    
+    with _ingredient_payload_lock:
+        # 目录版本变化后旧版本的缓存全部作废
+        stale_keys = [cache_key for cache_key in _ingredient_payload_cache if cache_key[0] != version]
+        for cache_key in stale_keys:
+            del _ingredient_payload_cache[cache_key]
+        
+        _ingredient_payload_cache[key] = cached
+        while len(_ingredient_payload_cache) > INGREDIENT_PAYLOAD_CACHE_SIZE:
+            _ingredient_payload_cache.popitem(last=False)
+    
+    return cached
+
+def build_ingredient_list(category, search):
+    """构建食材列表数据（含完整营养信息）"""
+    # 从食材目录缓存读取（已按名称排序）
+    ingredients = IngredientCatalog.all()
+
+    # 分类过滤
+    if category:
+        try:
+            category_enum = IngredientCategory(category)
+            ingredients = IngredientCatalog.by_category(category_enum)
+        except ValueError:
+            pass
+
+    # 搜索过滤（倒排索引，仅匹配名称）
+    if search:
+        matched_ids = get_search_index().matching_ids(search, include_description=False)
+        ingredients = [ing for ing in ingredients if ing.id in matched_ids]
+
+    # 安全性过滤 - 只返回安全的食材
+    ingredients = [ing for ing in ingredients if ing.is_safe_for_dogs and ing.is_safe_for_cats]
+    
+    # 确保返回完整的营养信息
+    result = []
+    for ing in ingredients:
+        # 安全处理可能为 None 的营养字段
+        calories = float(ing.calories) if ing.calories is not None else 0.0
+        protein = float(ing.protein) if ing.protein is not None else 0.0
+        fat = float(ing.fat) if ing.fat is not None else 0.0
+        carbohydrate = float(ing.carbohydrate) if ing.carbohydrate is not None else 0.0
+        fiber = float(ing.fiber) if ing.fiber is not None else 0.0
+        calcium = float(ing.calcium) if ing.calcium is not None else 0.0
+        phosphorus = float(ing.phosphorus) if ing.phosphorus is not None else 0.0
+        
+        # 生成营养摘要文本 - 前端期望的字段
+        nutrition_summary = f"Calories: {calories:.0f}kcal/100g | Protein: {protein:.1f}g | Fat: {fat:.1f}g | Carbs: {carbohydrate:.1f}g"
+        
+        # 如果有钙磷信息，添加到摘要中
+        if calcium > 0 or phosphorus > 0:
+            nutrition_summary += f" | Ca: {calcium:.0f}mg | P: {phosphorus:.0f}mg"
+                    
+        ingredient_data = {
+            'id': ing.id,
+            'name': ing.name,
+            'name_en': ing.name_en,
+            'category': ing.category.value,
+            'image_filename': ing.image_filename,
+            'seasonality': ing.seasonality,
+            # 基础营养信息
+            'calories': calories,
+            'protein': protein,
+            'fat': fat,
+            'carbohydrate': carbohydrate,
+            'fiber': fiber,
+            'moisture': float(ing.moisture) if ing.moisture is not None else 0.0,
+            'ash': float(ing.ash) if ing.ash is not None else 0.0,
+
+            # 矿物质
+            'calcium': calcium,
+            'phosphorus': phosphorus,
+            'potassium': float(ing.potassium) if ing.potassium is not None else 0.0,
+            'sodium': float(ing.sodium) if ing.sodium is not None else 0.0,
+            'magnesium': float(ing.magnesium) if ing.magnesium is not None else 0.0,
+            'iron': float(ing.iron) if ing.iron is not None else 0.0,
+            'zinc': float(ing.zinc) if ing.zinc is not None else 0.0,
+            
+            # 维生素
+            'vitamin_a': float(ing.vitamin_a) if ing.vitamin_a is not None else 0.0,
+            'vitamin_d': float(ing.vitamin_d) if ing.vitamin_d is not None else 0.0,
+            'vitamin_e': float(ing.vitamin_e) if ing.vitamin_e is not None else 0.0,
+            'taurine': float(ing.taurine) if ing.taurine is not None else 0.0,
+            
+            # 脂肪酸
+            'omega_3_fatty_acids': float(ing.omega_3_fatty_acids) if ing.omega_3_fatty_acids is not None else 0.0,
+            'omega_6_fatty_acids': float(ing.omega_6_fatty_acids) if ing.omega_6_fatty_acids is not None else 0.0,
+            
+            # 安全性信息
+            'is_safe_for_dogs': bool(ing.is_safe_for_dogs),
+            'is_safe_for_cats': bool(ing.is_safe_for_cats),
+            'is_common_allergen': bool(ing.is_common_allergen),
+            
+            # 前端显示字段 - 关键修复
+            'nutrition_summary': nutrition_summary,
+            
+            # 食材指南信息
+            'description': ing.description,
+            'benefits': ing.benefits,
+            'preparation_method': ing.preparation_method,
+            'pro_tip': ing.pro_tip,
+            'allergy_alert': ing.allergy_alert,
+            'storage_notes': ing.storage_notes
+        }
+        result.append(ingredient_data)
+    
+    # 按名称排序
+    result.sort(key=lambda x: x['name'])
+    return result
+
 @recipe_bp.route('/api/categories')
 def get_categories():
     """获取食材分类列表"""
@@ -157,12 +195,10 @@ def get_categories():
     for category in IngredientCategory:
 
         # 统计该分类下安全食材的数量
-        count = db.session.query(Ingredient).filter(
-            Ingredient.category == category,
-            Ingredient.is_active == True,
-            Ingredient.is_safe_for_dogs == True,
-            Ingredient.is_safe_for_cats == True
-        ).count()
+        count = sum(
+            1 for ing in IngredientCatalog.by_category(category)
+            if ing.is_safe_for_dogs and ing.is_safe_for_cats
+        )
         
         if count > 0:  # 只返回有食材的分类
             categories.append({
@@ -213,17 +249,4 @@ def get_category_icon(category):
 
 def determine_life_stage(age, species):
     """根据年龄和品种确定生命阶段"""
-    if species.lower() == 'dog':
-        if age < 1:
-            return LifeStage.PUPPY_KITTEN
-        elif age >= 7:
-            return LifeStage.SENIOR
-        else:
-            return LifeStage.ADULT
-    else:  # cat
-        if age < 1:
-            return LifeStage.PUPPY_KITTEN
-        elif age >= 7:
-            return LifeStage.SENIOR
-        else:
-            return LifeStage.ADULT
+    return life_stage_for(age)
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify, session
 from werkzeug.exceptions import BadRequest
 from app.extensions import db
 from app.models.recipe_model import Recipe
+from app.utils.recipe_stats_service import RecipeStatsService
 from app.models.user_model import User
 from app.models.ingredient_model import Ingredient
 from app.models.recipe_ingredient_model import RecipeIngredient
@@ -88,8 +89,8 @@ def get_recipe_detail(recipe_id):
             # 获取点赞数量
             likes_count = RecipeLike.query.filter_by(recipe_id=recipe_id).count()
             
-            # 获取收藏数量
-            favorites_count = RecipeFavorite.query.filter_by(recipe_id=recipe_id).count()
+            # 获取收藏数量（缓存字段）
+            favorites_count = recipe.favorites_count or 0
             
             # 检查当前用户是否已点赞
             user_liked = RecipeLike.query.filter_by(
@@ -234,10 +235,11 @@ def add_recipe_favorite():
         # 添加收藏
         favorite = RecipeFavorite(user_id=user_id, recipe_id=recipe_id)
         db.session.add(favorite)
+        RecipeStatsService.record_favorite(recipe_id, 1)
         db.session.commit()
         
         # 获取新的收藏数量
-        new_count = RecipeFavorite.query.filter_by(recipe_id=recipe_id).count()
+        new_count = RecipeStatsService.get_favorites_count(recipe_id)
         
         return jsonify({
             'success': True, 
@@ -277,10 +279,11 @@ def remove_recipe_favorite(recipe_id):
         
         # 移除收藏
         db.session.delete(favorite)
+        RecipeStatsService.record_favorite(recipe_id, -1)
         db.session.commit()
         
         # 获取新的收藏数量
-        new_count = RecipeFavorite.query.filter_by(recipe_id=recipe_id).count()
+        new_count = RecipeStatsService.get_favorites_count(recipe_id)
         
         return jsonify({
             'success': True, 
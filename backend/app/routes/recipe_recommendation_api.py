@@ -6,8 +6,12 @@
 from flask import Blueprint, request, jsonify, session, render_template
 from app.models.ingredient_model import Ingredient
 from app.models.pet_model import Pet
-from app.models.recipe_model import Recipe
+from app.models.recipe_model import Recipe, RecipeStatus
 from app.utils.recipe_recommendation_service import RecipeRecommendationService
+from app.utils.recipe_stats_service import RecipeStatsService
+from app.utils.recommendation_cache import recommendation_cache
+from app.utils.pet_nutrition_profile import get_pet_profile
+from app.utils.ingredient_catalog import IngredientCatalog
 from app.extensions import db
 from datetime import datetime
 
@@ -28,8 +32,7 @@ def get_recipe_recommendations():
         
         # 验证用户权限（如果有pet_id）
         if pet_id and session.get('user_id'):
-            pet = Pet.query.filter_by(id=pet_id, user_id=session['user_id']).first()
-            if not pet:
+            if not get_pet_profile(pet_id, user_id=session['user_id']):
                 return jsonify({'error': 'Pet information does not exist'}), 404
         
         # 创建推荐服务
@@ -61,6 +64,14 @@ def get_recipe_recommendations():
         print(f"推荐API错误: {e}")
         return jsonify({'error': 'Failed to get recommendations, please try again later'}), 500
 
+@recommendation_api_bp.route('/api/recommendations/cache-stats', methods=['GET'])
+def get_recommendation_cache_stats():
+    """获取推荐结果缓存的命中统计"""
+    return jsonify({
+        'success': True,
+        'data': recommendation_cache.stats()
+    })
+
 @recommendation_api_bp.route('/recipe/recommendations')
 def recipe_recommendations_page():
     """食谱推荐页面"""
@@ -79,7 +90,7 @@ def recipe_recommendations_page():
     # 获取食材信息
     selected_ingredients = []
     if ingredient_ids:
-        selected_ingredients = Ingredient.query.filter(Ingredient.id.in_(ingredient_ids)).all()
+        selected_ingredients = list(IngredientCatalog.get_many(ingredient_ids).values())
     
     # 获取宠物信息
     pet = None
@@ -327,7 +338,7 @@ def copy_recipe_to_user(recipe_id):
             description=f"Personal recipe created based on '{original_recipe.name}'",
             user_id=session['user_id'],
             pet_id=pet_id,
-            status='draft',
+            status=RecipeStatus.DRAFT,
             is_public=False
         )
         
@@ -337,7 +348,9 @@ def copy_recipe_to_user(recipe_id):
         # 复制食材关联
         from app.models.recipe_ingredient_model import RecipeIngredient
         
+        ingredient_weights = []
         for original_ri in original_recipe.ingredients:
+            ingredient_weights.append((original_ri.ingredient_id, original_ri.weight))
             new_ri = RecipeIngredient(
                 recipe_id=new_recipe.id,
                 ingredient_id=original_ri.ingredient_id,
@@ -347,11 +360,11 @@ def copy_recipe_to_user(recipe_id):
             db.session.add(new_ri)
         
         # 重新计算营养成分
-        new_recipe.calculate_nutrition()
+        new_recipe.calculate_nutrition(ingredient_weights)
         new_recipe.check_suitability()
         
         # ------------新增：更新原食谱的使用计数------------
-        original_recipe.usage_count = (original_recipe.usage_count or 0) + 1
+        RecipeStatsService.record_usage(original_recipe.id)
         
         db.session.commit()
         
@@ -381,16 +394,12 @@ def get_similar_recipes(recipe_id):
         if not ingredient_ids:
             return jsonify({'recommendations': []})
         
-        # 使用推荐服务查找相似食谱
+        # 使用相似食谱索引查找（不包含原食谱本身）
         recommendation_service = RecipeRecommendationService()
-        similar_recipes = recommendation_service.get_recommendations(
-            selected_ingredient_ids=ingredient_ids,
-            limit=4  # 返回4个相似食谱
+        similar_recipes = recommendation_service.get_similar_recipes(
+            recipe_id, ingredient_ids, limit=3  # 最多返回3个
         )
         
-        # 过滤掉原食谱本身
-        similar_recipes = [rec for rec in similar_recipes if rec['recipe_id'] != recipe_id]
-        
         # ------------增强：添加相似度说明------------
         for rec in similar_recipes:
             rec['similarity_reason'] = f"Shares {len([ing for ing in rec['ingredients'] if ing['id'] in ingredient_ids])} common ingredients"
@@ -398,7 +407,7 @@ def get_similar_recipes(recipe_id):
         
         return jsonify({
             'success': True,
-            'similar_recipes': similar_recipes[:3],  # 最多返回3个
+            'similar_recipes': similar_recipes,
             'base_recipe_info': {
                 'name': base_recipe.name,
                 'ingredient_count': len(ingredient_ids)
@@ -8,7 +8,9 @@ from app.models.recipe_model import Recipe, RecipeStatus
 from app.models.recipe_ingredient_model import RecipeIngredient
 from app.models.ingredient_model import Ingredient
 from app.models.pet_model import Pet
+from app.utils.ingredient_catalog import IngredientCatalog
 from app.utils.allergen_service import AllergenService
+from app.utils.recipe_score_service import RecipeScoreService
 from app.extensions import db
 from datetime import datetime
 
@@ -75,8 +77,7 @@ def save_recipe():
         if not ingredient_ids:
             return jsonify({'error': '请选择有效的食材'}), 400
         
-        ingredients = Ingredient.query.filter(Ingredient.id.in_(ingredient_ids)).all()
-        ingredient_dict = {ing.id: ing for ing in ingredients}
+        ingredient_dict = load_ingredients(ingredient_ids)
         
         # 检查过敏安全性
         if ALLERGEN_SERVICE_AVAILABLE and pet_id:
@@ -108,6 +109,7 @@ def save_recipe():
         
         # 添加食材关联
         total_weight = 0
+        ingredient_weights = []
         for item in ingredients_data:
             ingredient_id = item.get('ingredient_id')
             weight = float(item.get('weight', 0))
@@ -116,6 +118,7 @@ def save_recipe():
                 continue
             
             total_weight += weight
+            ingredient_weights.append((ingredient_id, weight))
             
             recipe_ingredient = RecipeIngredient(
                 recipe_id=recipe.id,
@@ -132,7 +135,7 @@ def save_recipe():
             return jsonify({'error': '食谱总重量太少，请至少添加50g食材'}), 400
         
         # 计算营养成分
-        recipe.calculate_nutrition()
+        recipe.calculate_nutrition(ingredient_weights)
         recipe.check_suitability()
         
         # 计算营养评分（简化版）
@@ -204,11 +207,11 @@ def update_recipe(recipe_id):
         
         # 验证食材数据
         ingredient_ids = [item.get('ingredient_id') for item in ingredients_data]
-        ingredients = Ingredient.query.filter(Ingredient.id.in_(ingredient_ids)).all()
-        ingredient_dict = {ing.id: ing for ing in ingredients}
+        ingredient_dict = load_ingredients(ingredient_ids)
         
         # 重新添加食材关联
         total_weight = 0
+        ingredient_weights = []
         for item in ingredients_data:
             ingredient_id = item.get('ingredient_id')
             weight = float(item.get('weight', 0))
@@ -217,6 +220,7 @@ def update_recipe(recipe_id):
                 continue
             
             total_weight += weight
+            ingredient_weights.append((ingredient_id, weight))
             
             recipe_ingredient = RecipeIngredient(
                 recipe_id=recipe.id,
@@ -233,7 +237,7 @@ def update_recipe(recipe_id):
             return jsonify({'error': '食谱总重量太少，请至少添加50g食材'}), 400
         
         # 重新计算营养成分
-        recipe.calculate_nutrition()
+        recipe.calculate_nutrition(ingredient_weights)
         recipe.check_suitability()
         recipe.nutrition_score = calculate_nutrition_score(recipe)
         recipe.balance_score = calculate_balance_score(recipe)
@@ -355,124 +359,33 @@ def delete_recipe(recipe_id):
         print(f"删除食谱失败: {e}")
         return jsonify({'error': '删除失败，请稍后重试'}), 500
 
+def load_ingredients(ingredient_ids):
+    """
+    按ID获取食材，返回 {食材ID: 记录}
+    食材目录只含上架食材，已下架的食材从数据库补查，重新保存旧食谱时不会丢失这些食材
+    """
+    ingredient_dict = IngredientCatalog.get_many(ingredient_ids)
+    missing_ids = {
+        ingredient_id for ingredient_id in ingredient_ids
+        if isinstance(ingredient_id, int) and ingredient_id not in ingredient_dict
+    }
+    if missing_ids:
+        for ingredient in Ingredient.query.filter(Ingredient.id.in_(missing_ids)).all():
+            ingredient_dict[ingredient.id] = ingredient
+    return ingredient_dict
+
 def calculate_nutrition_score(recipe):
-    """计算营养评分（简化版）"""
+    """计算营养评分（规则见 RecipeScoreService）"""
     try:
-        if recipe.total_weight <= 0:
-            return 0
-        
-        score = 0
-        
-        # 蛋白质比例评分 (30分)
-        protein_percent = (recipe.total_protein / recipe.total_weight) * 100
-        if 18 <= protein_percent <= 35:
-            score += 30
-        elif 15 <= protein_percent < 18 or 35 < protein_percent <= 40:
-            score += 20
-        elif protein_percent >= 10:
-            score += 10
-        
-        # 脂肪比例评分 (20分)
-        fat_percent = (recipe.total_fat / recipe.total_weight) * 100
-        if 5.5 <= fat_percent <= 20:
-            score += 20
-        elif 4 <= fat_percent < 5.5 or 20 < fat_percent <= 25:
-            score += 15
-        elif fat_percent >= 2:
-            score += 10
-        
-        # 钙磷比评分 (20分)
-        if recipe.total_phosphorus > 0:
-            ca_p_ratio = recipe.total_calcium / recipe.total_phosphorus
-            if 1.0 <= ca_p_ratio <= 2.0:
-                score += 20
-            elif 0.8 <= ca_p_ratio < 1.0 or 2.0 < ca_p_ratio <= 2.5:
-                score += 15
-            elif ca_p_ratio >= 0.5:
-                score += 10
-        
-        # 食材多样性评分 (15分)
-        ingredient_count = len(recipe.ingredients)
-        if ingredient_count >= 5:
-            score += 15
-        elif ingredient_count >= 3:
-            score += 10
-        elif ingredient_count >= 2:
-            score += 5
-        
-        # 营养密度评分 (15分)
-        calories_per_100g = (recipe.total_calories / recipe.total_weight) * 100 if recipe.total_weight > 0 else 0
-        if 250 <= calories_per_100g <= 400:
-            score += 15
-        elif 200 <= calories_per_100g < 250 or 400 < calories_per_100g <= 500:
-            score += 10
-        elif 150 <= calories_per_100g <= 600:
-            score += 5
-        
-        return min(score, 100)  # 最高100分
-        
+        return RecipeScoreService.score(recipe)[0]
     except Exception as e:
         print(f"计算营养评分失败: {e}")
         return 0
 
 def calculate_balance_score(recipe):
-    """计算营养平衡评分（简化版）"""
+    """计算营养平衡评分（规则见 RecipeScoreService）"""
     try:
-        if recipe.total_weight <= 0:
-            return 0
-        
-        score = 0
-        
-        # 宏量营养素平衡 (40分)
-        protein_percent = (recipe.total_protein / recipe.total_weight) * 100
-        fat_percent = (recipe.total_fat / recipe.total_weight) * 100
-        carb_percent = (recipe.total_carbohydrate / recipe.total_weight) * 100
-        
-        # 理想比例：蛋白质20-30%, 脂肪10-15%, 碳水化合物5-15%
-        protein_balance = max(0, 20 - abs(25 - protein_percent)) / 20 * 15
-        fat_balance = max(0, 10 - abs(12.5 - fat_percent)) / 10 * 15
-        carb_balance = max(0, 15 - abs(10 - carb_percent)) / 15 * 10
-        
-        score += protein_balance + fat_balance + carb_balance
-        
-        # 矿物质平衡 (30分)
-        if recipe.total_calcium > 0 and recipe.total_phosphorus > 0:
-            ca_mg = recipe.total_calcium
-            p_mg = recipe.total_phosphorus
-            
-            # 钙磷平衡
-            ca_p_ratio = ca_mg / p_mg
-            ca_p_score = max(0, 20 - abs(1.5 - ca_p_ratio) * 10)
-            score += min(ca_p_score, 20)
-            
-            # 微量元素平衡（简化）
-            if recipe.total_iron > 0 and recipe.total_zinc > 0:
-                score += 10
-        
-        # 维生素平衡 (20分)
-        vitamin_count = 0
-        if recipe.total_vitamin_a > 0: vitamin_count += 1
-        if recipe.total_vitamin_d > 0: vitamin_count += 1
-        if recipe.total_vitamin_e > 0: vitamin_count += 1
-        if recipe.total_thiamine > 0: vitamin_count += 1
-        if recipe.total_riboflavin > 0: vitamin_count += 1
-        if recipe.total_niacin > 0: vitamin_count += 1
-        
-        score += min(vitamin_count * 3, 20)  # 每种维生素3分，最多20分
-        
-        # 必需脂肪酸平衡 (10分)
-        if recipe.total_omega_3 > 0 and recipe.total_omega_6 > 0:
-            omega_ratio = recipe.total_omega_6 / recipe.total_omega_3
-            # 理想比例约5:1到10:1
-            if 5 <= omega_ratio <= 10:
-                score += 10
-            elif 3 <= omega_ratio < 5 or 10 < omega_ratio <= 15:
-                score += 7
-            elif omega_ratio <= 20:
-                score += 5
-        
-        return min(score, 100)  # 最高100分
-        
+        return RecipeScoreService.score(recipe)[1]
     except Exception as e:
         print(f"计算平衡评分失败: {e}")
-        return 0
\ No newline at end of file
+        return 0
@@ -2,6 +2,8 @@
 from flask import Blueprint, request, jsonify, session
 from werkzeug.exceptions import BadRequest
 from app.extensions import get_db_connection
+from app.utils.nutrient_aggregation import recipe_totals_dict
+from app.utils.recipe_feature_matrix import invalidate_recipe_features
 import logging
 
 recipe_update_bp = Blueprint('recipe_update', __name__)
@@ -102,6 +104,7 @@ def update_recipe():
             
             # 提交事务
             conn.commit()
+            invalidate_recipe_features()  # 原生SQL写入不会触发会话事件
             
             logging.info(f"用户 {user_id} 成功更新食谱 {recipe_id}: {recipe_name}")
             
@@ -138,39 +141,20 @@ def calculate_recipe_nutrition_for_update(cursor, recipe_id):
     """计算食谱营养信息（用于更新）"""
     try:
         cursor.execute('''
-            SELECT i.calories_per_100g, i.protein_per_100g, i.fat_per_100g, 
-                i.carbs_per_100g, i.fiber_per_100g, i.calcium_per_100g, ri.weight
+            SELECT ri.ingredient_id, ri.weight
             FROM recipe_ingredients ri
-            JOIN ingredients i ON ri.ingredient_id = i.id
             WHERE ri.recipe_id = ?
         ''', (recipe_id,))
         
-        ingredients_nutrition = cursor.fetchall()
-        
-        total_calories = 0
-        total_protein = 0
-        total_fat = 0
-        total_carbs = 0
-        total_fiber = 0
-        total_calcium = 0
-        
-        for nutrition in ingredients_nutrition:
-            weight_ratio = nutrition[6] / 100.0  # 转换为百克比例
-            
-            total_calories += (nutrition[0] or 0) * weight_ratio
-            total_protein += (nutrition[1] or 0) * weight_ratio
-            total_fat += (nutrition[2] or 0) * weight_ratio
-            total_carbs += (nutrition[3] or 0) * weight_ratio
-            total_fiber += (nutrition[4] or 0) * weight_ratio
-            total_calcium += (nutrition[5] or 0) * weight_ratio
+        totals = recipe_totals_dict(cursor.fetchall())
         
         return {
-            'total_calories': round(total_calories, 2),
-            'total_protein': round(total_protein, 2),
-            'total_fat': round(total_fat, 2),
-            'total_carbs': round(total_carbs, 2),
-            'total_fiber': round(total_fiber, 2),
-            'total_calcium': round(total_calcium, 2)
+            'total_calories': round(totals['total_calories'], 2),
+            'total_protein': round(totals['total_protein'], 2),
+            'total_fat': round(totals['total_fat'], 2),
+            'total_carbs': round(totals['total_carbohydrate'], 2),
+            'total_fiber': round(totals['total_fiber'], 2),
+            'total_calcium': round(totals['total_calcium'], 2)
         }
         
     except Exception as e:
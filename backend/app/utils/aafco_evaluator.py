@@ -0,0 +1,275 @@
+"""
+AAFCO 营养标准评估
+把营养需求表中的全部 min/max 列编译成与营养素列对齐的上下限数组，
+食谱的营养总量向量先换算到干物质基础，再一次数组比较得到每种营养素的缺乏/过量情况。
+多个食谱（或多种配比）堆成矩阵即可一次评估，单个食谱的实时计算和全部食谱的批量评估共用同一套数组
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.extensions import db
+from app.models.recipe_ingredient_model import RecipeIngredient
+from app.utils.nutrient_matrix import NUTRIENT_FIELDS, NUTRIENT_INDEX, get_nutrient_matrix
+
+
+@dataclass(frozen=True)
+class NutrientCheck:
+    """一项营养标准"""
+    name: str
+    fields: Tuple[str, ...]         # 参与求和的食材营养素列
+    basis: str                      # 'percent': 占干物质的百分比；'per_kg': 每kg干物质的含量
+    unit: str
+    min_column: Optional[str]       # 营养需求表中的下限列
+    max_column: Optional[str] = None
+    scale: float = 1.0              # 食材营养素单位换算（如氨基酸 mg -> g）
+
+
+def _minimum(name, basis, unit, scale=1.0, fields=None):
+    return NutrientCheck(name, fields or (name,), basis, unit, f'{name}_min', None, scale)
+
+
+def _range(name, basis, unit, fields=None):
+    return NutrientCheck(name, fields or (name,), basis, unit, f'{name}_min', f'{name}_max')
+
+
+AMINO_ACIDS = ('arginine', 'histidine', 'isoleucine', 'leucine', 'lysine', 'methionine',
+               'phenylalanine', 'threonine', 'tryptophan', 'valine')
+
+# 食材营养素按每100g保存：宏量营养素和脂肪酸为 g，矿物质、水溶性维生素和牛磺酸为 mg，
+# 维生素A/D/E 为 IU，维生素B12、生物素为 μg，氨基酸为 mg；需求表按干物质的百分比或每kg含量给出
+AAFCO_CHECKS: Tuple[NutrientCheck, ...] = (
+    _range('protein', 'percent', '%'),
+    _range('fat', 'percent', '%'),
+    NutrientCheck('carbohydrate', ('carbohydrate',), 'percent', '%', None, 'carbohydrate_max'),
+    _range('fiber', 'percent', '%'),
+    _range('calcium', 'per_kg', 'mg/kg'),
+    _range('phosphorus', 'per_kg', 'mg/kg'),
+    _minimum('potassium', 'per_kg', 'mg/kg'),
+    _range('sodium', 'per_kg', 'mg/kg'),
+    _minimum('chloride', 'per_kg', 'mg/kg'),
+    _minimum('magnesium', 'per_kg', 'mg/kg'),
+    _range('iron', 'per_kg', 'mg/kg'),
+    _range('copper', 'per_kg', 'mg/kg'),
+    _range('manganese', 'per_kg', 'mg/kg'),
+    _range('zinc', 'per_kg', 'mg/kg'),
+    _range('iodine', 'per_kg', 'mg/kg'),
+    _range('selenium', 'per_kg', 'mg/kg'),
+    _range('vitamin_a', 'per_kg', 'IU/kg'),
+    _range('vitamin_d', 'per_kg', 'IU/kg'),
+    _minimum('vitamin_e', 'per_kg', 'IU/kg'),
+    _minimum('vitamin_k', 'per_kg', 'mg/kg'),
+    _minimum('thiamine', 'per_kg', 'mg/kg'),
+    _minimum('riboflavin', 'per_kg', 'mg/kg'),
+    _minimum('niacin', 'per_kg', 'mg/kg'),
+    _minimum('pantothenic_acid', 'per_kg', 'mg/kg'),
+    _minimum('pyridoxine', 'per_kg', 'mg/kg'),
+    _minimum('folic_acid', 'per_kg', 'mg/kg'),
+    _minimum('vitamin_b12', 'per_kg', 'μg/kg'),
+    _minimum('biotin', 'per_kg', 'μg/kg'),
+    _minimum('choline', 'per_kg', 'mg/kg'),
+) + tuple(
+    _minimum(name, 'percent', '%', scale=0.001) for name in AMINO_ACIDS
+) + (
+    _minimum('taurine', 'per_kg', 'mg/kg'),
+    _minimum('alpha_linolenic_acid', 'percent', '%'),
+    _minimum('epa_dha', 'percent', '%', fields=('eicosapentaenoic_acid', 'docosahexaenoic_acid')),
+    _minimum('arachidonic_acid', 'percent', '%'),
+)
+
+CHECK_NAMES = tuple(check.name for check in AAFCO_CHECKS)
+
+# 营养素列 -> 标准项的选择矩阵（含单位换算），以及干物质基础的换算系数（百分比 ×100，每kg ×1000）
+_SELECTION = np.zeros((len(AAFCO_CHECKS), len(NUTRIENT_FIELDS)), dtype=np.float64)
+for _index, _check in enumerate(AAFCO_CHECKS):
+    for _field in _check.fields:
+        _SELECTION[_index, NUTRIENT_INDEX[_field]] = _check.scale
+_BASIS_FACTOR = np.array([100.0 if check.basis == 'percent' else 1000.0 for check in AAFCO_CHECKS])
+
+_MOISTURE = NUTRIENT_INDEX['moisture']
+_CALCIUM = NUTRIENT_INDEX['calcium']
+_PHOSPHORUS = NUTRIENT_INDEX['phosphorus']
+
+
+def compile_bounds(requirements: Sequence) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    营养需求记录 -> (下限, 上限, 钙磷比上下限) 数组，行与记录一一对应，缺失的限值为 NaN
+    由营养需求索引在载入时调用
+    """
+    def value(requirement, column):
+        result = getattr(requirement, column) if column else None
+        return np.nan if result is None else result
+
+    minimums = np.array([[value(requirement, check.min_column) for check in AAFCO_CHECKS]
+                         for requirement in requirements], dtype=np.float64)
+    maximums = np.array([[value(requirement, check.max_column) for check in AAFCO_CHECKS]
+                         for requirement in requirements], dtype=np.float64)
+    ratios = np.array([[value(requirement, 'calcium_phosphorus_ratio_min'),
+                        value(requirement, 'calcium_phosphorus_ratio_max')]
+                       for requirement in requirements], dtype=np.float64)
+    shape = (len(requirements), len(AAFCO_CHECKS))
+    return minimums.reshape(shape), maximums.reshape(shape), ratios.reshape(len(requirements), 2)
+
+
+@dataclass(frozen=True)
+class AafcoEvaluation:
+    """一批食谱的评估结果（每行一个食谱，每列一项营养标准）"""
+    values: np.ndarray          # 干物质基础的含量
+    minimums: np.ndarray
+    maximums: np.ndarray
+    deficient: np.ndarray       # 低于下限
+    excess: np.ndarray          # 高于上限
+    ca_p_ratio: np.ndarray
+    ratio_bounds: np.ndarray
+    dry_matter: np.ndarray      # 干物质重量 (g)
+
+    @property
+    def ratio_out_of_range(self) -> np.ndarray:
+        low, high = self.ratio_bounds[:, 0], self.ratio_bounds[:, 1]
+        return (self.ca_p_ratio < low) | (self.ca_p_ratio > high)
+
+    @property
+    def compliant(self) -> np.ndarray:
+        """是否满足全部标准"""
+        return ~(self.deficient.any(axis=1) | self.excess.any(axis=1) | self.ratio_out_of_range)
+
+    @property
+    def checked_counts(self) -> np.ndarray:
+        """每个食谱实际检查的限值个数"""
+        return (~np.isnan(self.minimums)).sum(axis=1) + (~np.isnan(self.maximums)).sum(axis=1)
+
+    def report(self, index: int = 0) -> Dict:
+        """单个食谱的逐项报告"""
+        nutrients = {}
+        for column, check in enumerate(AAFCO_CHECKS):
+            minimum, maximum = self.minimums[index, column], self.maximums[index, column]
+            if np.isnan(minimum) and np.isnan(maximum):
+                continue
+            value = float(self.values[index, column])
+            if self.deficient[index, column]:
+                status, gap = 'deficient', minimum - value
+            elif self.excess[index, column]:
+                status, gap = 'excess', value - maximum
+            else:
+                status, gap = 'ok', 0.0
+            nutrients[check.name] = {
+                'value': round(value, 4),
+                'min': None if np.isnan(minimum) else float(minimum),
+                'max': None if np.isnan(maximum) else float(maximum),
+                'unit': check.unit,
+                'status': status,
+                'gap': round(float(gap), 4)
+            }
+
+        ratio = float(self.ca_p_ratio[index])
+        low, high = self.ratio_bounds[index]
+        return {
+            'basis': 'dry_matter',
+            'dry_matter_g': round(float(self.dry_matter[index]), 1),
+            'compliant': bool(self.compliant[index]),
+            'deficiencies': [CHECK_NAMES[column] for column in np.flatnonzero(self.deficient[index])],
+            'excesses': [CHECK_NAMES[column] for column in np.flatnonzero(self.excess[index])],
+            'calcium_phosphorus_ratio': {
+                'value': None if np.isnan(ratio) else round(ratio, 2),
+                'min': None if np.isnan(low) else float(low),
+                'max': None if np.isnan(high) else float(high),
+                'status': 'unknown' if np.isnan(ratio) else ('out_of_range' if self.ratio_out_of_range[index] else 'ok')
+            },
+            'nutrients': nutrients
+        }
+
+    def summary(self, index: int) -> Dict:
+        """单个食谱的简要结果（批量评估使用）"""
+        return {
+            'compliant': bool(self.compliant[index]),
+            'deficiencies': [CHECK_NAMES[column] for column in np.flatnonzero(self.deficient[index])],
+            'excesses': [CHECK_NAMES[column] for column in np.flatnonzero(self.excess[index])],
+            'ca_p_ratio_ok': not bool(self.ratio_out_of_range[index]),
+            'passed': int(self.checked_counts[index] - self.deficient[index].sum() - self.excess[index].sum()),
+            'checked': int(self.checked_counts[index])
+        }
+
+
+class AafcoEvaluator:
+    """AAFCO 营养标准评估器"""
+
+    @staticmethod
+    def evaluate(totals: np.ndarray, total_weights, requirement_rows: Sequence[int]) -> AafcoEvaluation:
+        """
+        评估营养总量矩阵（需要应用上下文）
+
+        Args:
+            totals: (食谱数, 营养素数) 营养总量，列顺序同 NUTRIENT_FIELDS；单个向量也可
+            total_weights: 每个食谱的总重量 (g)
+            requirement_rows: 每个食谱对应的营养需求行号（营养需求索引中的行）
+        """
+        from app.utils.nutrition_requirement_index import get_requirement_index
+
+        totals = np.atleast_2d(np.asarray(totals, dtype=np.float64))
+        total_weights = np.atleast_1d(np.asarray(total_weights, dtype=np.float64))
+        index = get_requirement_index()
+        rows = np.atleast_1d(np.asarray(requirement_rows, dtype=np.intp))
+        minimums, maximums, ratio_bounds = index.min_bounds[rows], index.max_bounds[rows], index.ratio_bounds[rows]
+
+        # 干物质 = 总重量 - 水分（营养总量中的水分列即水分克数）
+        dry_matter = np.maximum(total_weights - totals[:, _MOISTURE], 0.0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = (totals @ _SELECTION.T) * _BASIS_FACTOR / dry_matter[:, None]
+            ca_p_ratio = totals[:, _CALCIUM] / totals[:, _PHOSPHORUS]
+        values = np.where(dry_matter[:, None] > 0, values, 0.0)
+        ca_p_ratio = np.where(totals[:, _PHOSPHORUS] > 0, ca_p_ratio, np.nan)
+
+        # NaN 限值参与比较的结果为 False，即不检查
+        deficient = values < minimums
+        excess = values > maximums
+
+        return AafcoEvaluation(values, minimums, maximums, deficient, excess, ca_p_ratio, ratio_bounds, dry_matter)
+
+    @staticmethod
+    def evaluate_for_pet(totals: np.ndarray, total_weight: float, pet) -> Optional[Dict]:
+        """按宠物适用的营养需求评估单个食谱，没有适用的需求标准时返回 None"""
+        from app.utils.nutrition_requirement_index import get_requirement_index
+
+        row = get_requirement_index().row_for_pet(pet)
+        if row is None or total_weight <= 0:
+            return None
+        return AafcoEvaluator.evaluate(totals, [total_weight], [row]).report(0)
+
+    @staticmethod
+    def recipe_totals(recipe_ids: Iterable[int]) -> Tuple[List[int], np.ndarray, np.ndarray]:
+        """
+        一次查询计算多个食谱的营养总量，返回 (食谱ID, 营养总量矩阵, 总重量)
+        没有有效食材的食谱不在结果中
+        """
+        recipe_ids = list(dict.fromkeys(recipe_ids))
+        if not recipe_ids:
+            return [], np.zeros((0, len(NUTRIENT_FIELDS))), np.zeros(0)
+
+        rows = db.session.query(
+            RecipeIngredient.recipe_id, RecipeIngredient.ingredient_id, RecipeIngredient.weight
+        ).filter(RecipeIngredient.recipe_id.in_(recipe_ids)).all()
+
+        matrix = get_nutrient_matrix()
+        position = {recipe_id: index for index, recipe_id in enumerate(recipe_ids)}
+        weights = np.zeros((len(recipe_ids), len(matrix)), dtype=np.float64)
+        recipe_index = [position[row.recipe_id] for row in rows if row.ingredient_id in matrix.row_index]
+        ingredient_index = [matrix.row_index[row.ingredient_id] for row in rows if row.ingredient_id in matrix.row_index]
+        amounts = [row.weight or 0.0 for row in rows if row.ingredient_id in matrix.row_index]
+        np.add.at(weights, (recipe_index, ingredient_index), amounts)
+
+        total_weights = weights.sum(axis=1)
+        keep = total_weights > 0
+        totals = (weights[keep] / 100.0) @ matrix.matrix
+        return [recipe_id for recipe_id, kept in zip(recipe_ids, keep) if kept], totals, total_weights[keep]
+
+    @staticmethod
+    def evaluate_recipes(recipe_ids: Iterable[int], requirement_row: int) -> Dict[int, Dict]:
+        """批量评估多个已保存食谱是否满足同一套营养需求 {食谱ID: 简要结果}"""
+        found_ids, totals, total_weights = AafcoEvaluator.recipe_totals(recipe_ids)
+        if not found_ids:
+            return {}
+        evaluation = AafcoEvaluator.evaluate(totals, total_weights, np.full(len(found_ids), requirement_row))
+        return {recipe_id: evaluation.summary(index) for index, recipe_id in enumerate(found_ids)}
@@ -0,0 +1,277 @@
+"""
+过敏食材解析
+合并两类过敏来源：
+- 结构化的过敏食材记录（PetAllergen）
+- 宠物特殊需求文本中的过敏描述（如 "Seafood Allergy"、"过敏:海鲜,牛肉"）
+特殊需求的关键词表由食材目录预编译：食材名称、名称中的单词、分类关键词及中文别名 -> 食材ID集合，
+用 Aho-Corasick 自动机一次扫描文本找出全部关键词；只有同一项需求中出现过敏标记词时关键词才生效。
+关键词表随食材目录版本重建，解析结果随宠物营养画像按宠物缓存
+"""
+
+import bisect
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import String, cast
+
+from app.extensions import db
+from app.models.ingredient_model import IngredientCategory
+from app.models.pet_allergen_model import PetAllergen, severity_value
+from app.utils.ingredient_catalog import IngredientCatalog
+
+# 过敏标记词：一项需求中出现这些词（或以 "过敏:" 开头的列表）时，其中的食材关键词才视为过敏源
+ALLERGY_MARKERS = ('allergy', 'allergies', 'allergic', 'intolerance', '过敏', '不耐受')
+
+# 分类关键词 -> 食材分类
+CATEGORY_KEYWORDS = {
+    'seafood': IngredientCategory.FISH,
+    'fish': IngredientCategory.FISH,
+    'shellfish': IngredientCategory.FISH,
+    'dairy': IngredientCategory.DAIRY,
+    'milk': IngredientCategory.DAIRY,
+    'lactose': IngredientCategory.DAIRY,
+    'red meat': IngredientCategory.RED_MEAT,
+    'poultry': IngredientCategory.WHITE_MEAT,
+    'grain': IngredientCategory.GRAINS,
+    'gluten': IngredientCategory.GRAINS,
+    '海鲜': IngredientCategory.FISH,
+    '鱼': IngredientCategory.FISH,
+    '乳制品': IngredientCategory.DAIRY,
+    '奶': IngredientCategory.DAIRY,
+    '红肉': IngredientCategory.RED_MEAT,
+    '禽肉': IngredientCategory.WHITE_MEAT,
+    '谷物': IngredientCategory.GRAINS
+}
+
+# 中文别名 -> 食材名称中的英文单词
+KEYWORD_ALIASES = {
+    '牛肉': 'beef',
+    '羊肉': 'lamb',
+    '猪肉': 'pork',
+    '鸡肉': 'chicken',
+    '鸡蛋': 'egg',
+    '火鸡': 'turkey',
+    '鸭': 'duck',
+    '三文鱼': 'salmon',
+    '鳕鱼': 'cod',
+    '金枪鱼': 'tuna',
+    '虾': 'shrimp',
+    '酸奶': 'yogurt',
+    '奶酪': 'cheese'
+}
+
+# 食材名称中不作为关键词的描述性单词
+STOP_TOKENS = frozenset({
+    'lean', 'meat', 'powder', 'seed', 'oil', 'plain', 'green', 'brown', 'sweet',
+    'bell', 'breast', 'thigh', 'pacific', 'chinese'
+})
+
+# 需求之间的分隔符
+SEPARATOR_PATTERN = re.compile(r'[,，;；、\n]')
+
+
+class KeywordAutomaton:
+    """Aho-Corasick 多模式匹配自动机：一次扫描文本找出全部关键词出现的位置"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[str, ...]] = [()]
+
+        for keyword in set(keywords):
+            if keyword:
+                self._insert(keyword)
+        self._build_failure_links()
+
+    def _insert(self, keyword: str):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] += (keyword,)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def search(self, text: str) -> List[Tuple[int, str]]:
+        """返回 [(起始位置, 关键词), ...]，包含重叠的匹配"""
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for keyword in self._output[state]:
+                matches.append((position - len(keyword) + 1, keyword))
+        return matches
+
+
+def _is_word_match(text: str, start: int, keyword: str) -> bool:
+    """英文关键词要求完整单词（允许复数 s），中文关键词不限制"""
+    if not keyword.isascii():
+        return True
+    end = start + len(keyword)
+    if start > 0 and text[start - 1].isalnum():
+        return False
+    if end < len(text) and text[end].isalnum():
+        return text[end] == 's' and (end + 1 == len(text) or not text[end + 1].isalnum())
+    return True
+
+
+class AllergenKeywordIndex:
+    """由食材目录预编译的过敏关键词表"""
+
+    def __init__(self, ingredients: Iterable):
+        keyword_map: Dict[str, Set[int]] = {}
+
+        def add(keyword: str, ingredient_ids: Iterable[int]):
+            keyword = keyword.strip().casefold()
+            if keyword:
+                keyword_map.setdefault(keyword, set()).update(ingredient_ids)
+
+        for ingredient in ingredients:
+            for name in {ingredient.name, ingredient.name_en} - {None, ''}:
+                add(name, (ingredient.id,))
+                add(re.sub(r'\s*\(.*?\)', '', name), (ingredient.id,))   # 去掉括号中的说明
+                for token in re.findall(r'[a-z]+', name.casefold()):
+                    if len(token) >= 3 and token not in STOP_TOKENS:
+                        add(token, (ingredient.id,))
+
+            category = ingredient.category
+            if category is not None:
+                add(category.value.replace('_', ' '), (ingredient.id,))
+                for keyword, keyword_category in CATEGORY_KEYWORDS.items():
+                    if keyword_category == category:
+                        add(keyword, (ingredient.id,))
+
+        for alias, keyword in KEYWORD_ALIASES.items():
+            add(alias, keyword_map.get(keyword, ()))
+
+        self.keyword_map: Dict[str, FrozenSet[int]] = {
+            keyword: frozenset(ids) for keyword, ids in keyword_map.items() if ids
+        }
+        self.automaton = KeywordAutomaton(list(self.keyword_map) + list(ALLERGY_MARKERS))
+
+    def match(self, text: Optional[str]) -> Tuple[FrozenSet[int], Tuple[str, ...]]:
+        """
+        解析文本中的过敏食材，返回 (食材ID集合, 命中的关键词)
+        同一位置重叠的关键词只取最长的一个（如 "chicken liver" 不再单独匹配 "chicken"）
+        """
+        text = (text or '').casefold()
+        if not text:
+            return frozenset(), ()
+
+        separators = [found.start() for found in SEPARATOR_PATTERN.finditer(text)]
+        marked_segments = set()
+        list_from = len(separators) + 1    # "过敏:海鲜,牛肉" 形式时，冒号后的各项都是过敏源
+        hits = []
+        for start, keyword in self.automaton.search(text):
+            if not _is_word_match(text, start, keyword):
+                continue
+            segment = bisect.bisect(separators, start)
+            if keyword in ALLERGY_MARKERS:
+                marked_segments.add(segment)
+                if text[start + len(keyword):].lstrip()[:1] in (':', '：'):
+                    list_from = min(list_from, segment)
+            else:
+                hits.append((start, start + len(keyword), segment, keyword))
+
+        ingredient_ids = set()
+        keywords = []
+        covered_end = -1
+        for start, end, segment, keyword in sorted(hits, key=lambda hit: (hit[0], -hit[1])):
+            if end <= covered_end:
+                continue
+            covered_end = end
+            if segment in marked_segments or segment >= list_from:
+                ingredient_ids |= self.keyword_map[keyword]
+                keywords.append(keyword)
+        return frozenset(ingredient_ids), tuple(keywords)
+
+
+@dataclass(frozen=True)
+class RecordedAllergen:
+    """一条过敏食材记录"""
+    ingredient_id: int
+    severity: str
+    notes: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ResolvedAllergens:
+    """宠物的过敏食材解析结果"""
+    recorded: Dict[int, RecordedAllergen] = field(default_factory=dict)   # 过敏食材记录
+    keyword_ids: FrozenSet[int] = frozenset()                            # 特殊需求中的过敏食材
+    keywords: Tuple[str, ...] = ()                                       # 特殊需求中命中的关键词
+
+    @property
+    def recorded_ids(self) -> FrozenSet[int]:
+        return frozenset(self.recorded)
+
+    @property
+    def all_ids(self) -> FrozenSet[int]:
+        """需要排除的全部过敏食材"""
+        return self.recorded_ids | self.keyword_ids
+
+
+class AllergenResolver:
+    """过敏食材解析器"""
+
+    @staticmethod
+    def resolve(pet_id: int, special_needs: Optional[str]) -> ResolvedAllergens:
+        """合并宠物的过敏食材记录和特殊需求中的过敏描述（一次查询）"""
+        rows = db.session.query(
+            PetAllergen.ingredient_id,
+            cast(PetAllergen.severity, String).label('severity'),
+            PetAllergen.notes
+        ).filter(
+            PetAllergen.pet_id == pet_id,
+            PetAllergen.is_active.is_(True)
+        ).all() if pet_id is not None else []
+
+        recorded = {
+            row.ingredient_id: RecordedAllergen(row.ingredient_id, severity_value(row.severity), row.notes)
+            for row in rows
+        }
+        keyword_ids, keywords = get_allergen_keyword_index().match(special_needs)
+        return ResolvedAllergens(recorded=recorded, keyword_ids=keyword_ids, keywords=keywords)
+
+
+# ------------ 进程内缓存：随食材目录版本重建 ------------
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_allergen_keyword_index() -> AllergenKeywordIndex:
+    """获取当前的过敏关键词表（需要应用上下文）"""
+    global _index, _index_version
+
+    version = IngredientCatalog.version()
+    if _index is not None and _index_version == version:
+        return _index
+
+    with _index_lock:
+        if _index is None or _index_version != version:
+            _index = AllergenKeywordIndex(IngredientCatalog.all())
+            _index_version = version
+        return _index
@@ -2,11 +2,14 @@
 过敏食材管理服务
 """
 
-from typing import List, Dict, Set
+from typing import Dict, Iterable, List, Set
 from datetime import datetime
 from app.models.pet_model import Pet
 from app.models.ingredient_model import Ingredient, IngredientCategory
-from app.models.pet_allergen_model import PetAllergen
+from app.models.pet_allergen_model import PetAllergen, AllergySeverity
+from app.models.recipe_ingredient_model import RecipeIngredient
+from app.utils.ingredient_catalog import IngredientCatalog
+from app.utils.pet_nutrition_profile import get_pet_profile
 from app.extensions import db
 
 class AllergenService:
@@ -17,6 +20,12 @@ class AllergenService:
                         notes: str = None, confirmed_date = None) -> bool:
         """为宠物添加过敏食材"""
         try:
+            # 严重程度以枚举保存（无效值按轻微处理）
+            try:
+                severity = AllergySeverity(severity)
+            except ValueError:
+                severity = AllergySeverity.MILD
+            
             # 检查是否已存在
             existing = PetAllergen.query.filter_by(
                 pet_id=pet_id, 
@@ -80,10 +89,10 @@ class AllergenService:
     
     @staticmethod
     def get_pet_allergen_ids(pet_id: int) -> Set[int]:
-        """获取宠物过敏食材的ID集合"""
+        """获取宠物过敏食材的ID集合（过敏食材记录 + 特殊需求中的过敏描述，读取缓存的宠物营养画像）"""
         try:
-            allergens = PetAllergen.query.filter_by(pet_id=pet_id).all()
-            return {allergen.ingredient_id for allergen in allergens}
+            profile = get_pet_profile(pet_id)
+            return set(profile.allergen_ids) if profile else set()
         except Exception as e:
             print(f"获取过敏食材ID失败: {e}")
             return set()
@@ -131,6 +140,53 @@ class AllergenService:
             print(f"获取常见过敏食材失败: {e}")
             return {}
     
+    @staticmethod
+    def _build_safety_check(ingredient_ids: Iterable[int], profile) -> Dict:
+        """根据宠物营养画像中的过敏详情检查一组食材（无需查询）"""
+        allergens = profile.allergens
+        dangerous_ingredients = []
+        warnings = []
+        
+        for ingredient_id in dict.fromkeys(ingredient_ids):
+            recorded = allergens.recorded.get(ingredient_id)
+            if recorded is None and ingredient_id not in allergens.keyword_ids:
+                continue
+            
+            ingredient = IngredientCatalog.get(ingredient_id)
+            ingredient_name = ingredient.name if ingredient else str(ingredient_id)
+            
+            if recorded is not None:
+                dangerous_ingredients.append({
+                    'ingredient_id': ingredient_id,
+                    'ingredient_name': ingredient_name,
+                    'severity': recorded.severity,
+                    'notes': recorded.notes,
+                    'source': 'record'
+                })
+                
+                # 根据严重程度生成警告
+                if recorded.severity == AllergySeverity.SEVERE.value:
+                    warnings.append(f"严重过敏: {ingredient_name}")
+                elif recorded.severity == AllergySeverity.MODERATE.value:
+                    warnings.append(f"中度过敏: {ingredient_name}")
+                else:
+                    warnings.append(f"轻微过敏: {ingredient_name}")
+            else:
+                dangerous_ingredients.append({
+                    'ingredient_id': ingredient_id,
+                    'ingredient_name': ingredient_name,
+                    'severity': None,
+                    'notes': None,
+                    'source': 'special_needs'
+                })
+                warnings.append(f"特殊需求中的过敏食材: {ingredient_name}")
+        
+        return {
+            'is_safe': len(dangerous_ingredients) == 0,
+            'allergens': dangerous_ingredients,
+            'warnings': warnings
+        }
+    
     @staticmethod
     def check_recipe_safety(recipe_ingredient_ids: List[int], pet_id: int) -> Dict:
         """检查食谱对宠物的安全性"""
@@ -138,45 +194,59 @@ class AllergenService:
             if not pet_id:
                 return {'is_safe': True, 'allergens': [], 'warnings': []}
             
-            allergen_ids = AllergenService.get_pet_allergen_ids(pet_id)
-            dangerous_ingredients = []
-            warnings = []
-            
-            # 检查每个食材
-            for ingredient_id in recipe_ingredient_ids:
-                if ingredient_id in allergen_ids:
-                    # 获取过敏详情
-                    allergen = PetAllergen.query.filter_by(
-                        pet_id=pet_id,
-                        ingredient_id=ingredient_id
-                    ).first()
-                    
-                    if allergen:
-                        dangerous_ingredients.append({
-                            'ingredient_id': ingredient_id,
-                            'ingredient_name': allergen.ingredient.name,
-                            'severity': allergen.severity,
-                            'notes': allergen.notes
-                        })
-                        
-                        # 根据严重程度生成警告
-                        if allergen.severity == 'severe':
-                            warnings.append(f"严重过敏: {allergen.ingredient.name}")
-                        elif allergen.severity == 'moderate':
-                            warnings.append(f"中度过敏: {allergen.ingredient.name}")
-                        else:
-                            warnings.append(f"轻微过敏: {allergen.ingredient.name}")
+            profile = get_pet_profile(pet_id)
+            if not profile:
+                return {'is_safe': True, 'allergens': [], 'warnings': []}
             
-            return {
-                'is_safe': len(dangerous_ingredients) == 0,
-                'allergens': dangerous_ingredients,
-                'warnings': warnings
-            }
+            # 过敏详情已缓存在宠物营养画像中，无需查询
+            return AllergenService._build_safety_check(recipe_ingredient_ids, profile)
             
         except Exception as e:
             print(f"检查食谱安全性失败: {e}")
             return {'is_safe': True, 'allergens': [], 'warnings': []}
     
+    @staticmethod
+    def check_recipes_safety(recipe_ids: List[int], pet_id: int) -> Dict[int, Dict]:
+        """
+        批量检查多个食谱对同一宠物的安全性，返回 {食谱ID: 安全检查结果}
+        只查询一次：取出这些食谱中属于宠物过敏食材的配料行，其余食谱直接判定为安全；
+        检查出错时 is_safe 为 None（未知）
+        """
+        recipe_ids = list(dict.fromkeys(recipe_ids or []))
+        safe = lambda: {'is_safe': True, 'allergens': [], 'warnings': []}
+        results = {recipe_id: safe() for recipe_id in recipe_ids}
+        if not pet_id or not recipe_ids:
+            return results
+        
+        try:
+            profile = get_pet_profile(pet_id)
+            if not profile or not profile.allergen_ids:
+                return results
+            
+            rows = db.session.query(
+                RecipeIngredient.recipe_id,
+                RecipeIngredient.ingredient_id
+            ).filter(
+                RecipeIngredient.recipe_id.in_(recipe_ids),
+                RecipeIngredient.ingredient_id.in_(profile.allergen_ids)
+            ).order_by(RecipeIngredient.recipe_id, RecipeIngredient.id).all()
+            
+            conflicts = {}
+            for row in rows:
+                conflicts.setdefault(row.recipe_id, []).append(row.ingredient_id)
+            
+            for recipe_id, ingredient_ids in conflicts.items():
+                results[recipe_id] = AllergenService._build_safety_check(ingredient_ids, profile)
+            return results
+            
+        except Exception as e:
+            # 无法确认安全性时不能判定为安全
+            print(f"批量检查食谱安全性失败: {e}")
+            return {
+                recipe_id: {'is_safe': None, 'allergens': [], 'warnings': ['安全检查失败，请稍后重试']}
+                for recipe_id in recipe_ids
+            }
+    
     @staticmethod
     def get_allergen_statistics(pet_id: int) -> Dict:
         """获取宠物过敏统计信息"""
@@ -192,7 +262,7 @@ class AllergenService:
             
             # 按严重程度统计
             for allergen in allergens:
-                stats['by_severity'][allergen.severity] += 1
+                stats['by_severity'][allergen.severity.value] += 1
                 
                 # 按分类统计
                 category = allergen.ingredient.category.value
@@ -208,7 +278,7 @@ class AllergenService:
             stats['recent_additions'] = [
                 {
                     'ingredient_name': a.ingredient.name,
-                    'severity': a.severity,
+                    'severity': a.severity.value,
                     'added_date': a.created_at.isoformat()
                 }
                 for a in recent_allergens
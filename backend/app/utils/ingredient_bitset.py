@@ -0,0 +1,105 @@
+"""
+食材位集
+食材ID较小且连续，食谱的食材集合可以用整数位集表示，集合判断都变成按位与：
+- 单个食谱：Python 整数位集，第 i 位表示食材ID i（ids_to_mask / mask_to_ids）
+- 食谱特征矩阵中的全部食谱：按矩阵列打包的 uint64 位集数组，每个食谱一行（pack_rows / pack_columns）
+不宜食用食材（对狗/猫不安全）的位集随食材目录版本缓存
+"""
+
+import threading
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from app.models.ingredient_model import Ingredient
+from app.utils.ingredient_catalog import IngredientCatalog
+
+
+def ids_to_mask(ingredient_ids: Iterable[int]) -> int:
+    """食材ID集合 -> 整数位集"""
+    mask = 0
+    for ingredient_id in ingredient_ids:
+        if ingredient_id is not None:
+            mask |= 1 << int(ingredient_id)
+    return mask
+
+
+def mask_to_ids(mask: int) -> List[int]:
+    """整数位集 -> 食材ID列表（升序）"""
+    ids = []
+    while mask:
+        low_bit = mask & -mask
+        ids.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return ids
+
+
+def _word_count(width: int) -> int:
+    return max((width + 63) // 64, 1)
+
+
+def pack_rows(incidence: np.ndarray) -> np.ndarray:
+    """bool 矩阵 (行数, 列数) -> uint64 位集数组 (行数, 字数)，第 j 列对应第 j 位"""
+    rows, width = incidence.shape
+    padded = np.zeros((rows, _word_count(width) * 64), dtype=bool)
+    padded[:, :width] = incidence
+    return np.packbits(padded, axis=1, bitorder='little').view('<u8').astype(np.uint64, copy=False)
+
+
+def pack_columns(columns: Iterable[int], width: int) -> np.ndarray:
+    """列号集合 -> 与 pack_rows 对齐的 uint64 位集 (字数,)"""
+    selected = np.zeros((1, width), dtype=bool)
+    selected[0, list(columns)] = True
+    return pack_rows(selected)[0]
+
+
+def rows_intersecting(bits: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """位集与 mask 有交集的行（含任一指定食材）"""
+    return np.bitwise_and(bits, mask).any(axis=1)
+
+
+def rows_covering(bits: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """位集包含 mask 全部位的行（含全部指定食材）"""
+    return (np.bitwise_and(bits, mask) == mask).all(axis=1)
+
+
+# ------------ 不宜食用食材的位集：随食材目录版本缓存 ------------
+_unsafe_masks = None    # (目录版本, 对狗不安全, 对猫不安全, 目录中的全部食材)
+_unsafe_lock = threading.Lock()
+
+
+def _catalog_masks() -> Tuple[int, int, int]:
+    global _unsafe_masks
+
+    version = IngredientCatalog.version()
+    cached = _unsafe_masks
+    if cached is not None and cached[0] == version:
+        return cached[1:]
+
+    with _unsafe_lock:
+        if _unsafe_masks is None or _unsafe_masks[0] != version:
+            records = IngredientCatalog.all()
+            _unsafe_masks = (
+                version,
+                ids_to_mask(record.id for record in records if not record.is_safe_for_dogs),
+                ids_to_mask(record.id for record in records if not record.is_safe_for_cats),
+                ids_to_mask(record.id for record in records)
+            )
+        return _unsafe_masks[1:]
+
+
+def unsafe_ingredient_masks(ingredient_mask: int = 0) -> Tuple[int, int]:
+    """
+    返回 (对狗不安全的食材位集, 对猫不安全的食材位集)
+    ingredient_mask 中不在食材目录里的食材（如已停用）用一次查询补齐
+    """
+    unsafe_for_dogs, unsafe_for_cats, known = _catalog_masks()
+
+    unknown = ingredient_mask & ~known
+    if unknown:
+        for ingredient in Ingredient.query.filter(Ingredient.id.in_(mask_to_ids(unknown))).all():
+            if not ingredient.is_safe_for_dogs:
+                unsafe_for_dogs |= 1 << ingredient.id
+            if not ingredient.is_safe_for_cats:
+                unsafe_for_cats |= 1 << ingredient.id
+    return unsafe_for_dogs, unsafe_for_cats
@@ -0,0 +1,198 @@
+"""
+食材目录缓存服务
+将所有启用的食材加载为进程内的只读记录，按ID、名称、分类提供查询。
+通过版本号失效：本进程提交食材变更后自动递增版本，
+其他进程（如初始化脚本）的写入在 TTL 到期后通过轻量的指纹查询发现
+"""
+
+import itertools
+import threading
+import time
+from dataclasses import make_dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.ingredient_model import Ingredient, IngredientCategory
+
+# 只读食材记录：字段与 Ingredient 模型的列一致，并复用模型的 to_dict / is_suitable_for_pet
+INGREDIENT_COLUMNS = tuple(column.name for column in Ingredient.__table__.columns)
+
+IngredientRecord = make_dataclass(
+    'IngredientRecord',
+    INGREDIENT_COLUMNS,
+    namespace={
+        'to_dict': Ingredient.to_dict,
+        'is_suitable_for_pet': Ingredient.is_suitable_for_pet,
+    },
+    frozen=True,
+    slots=True,
+)
+
+# 全局版本号（食材写入后递增）
+_catalog_version = 0
+_version_lock = threading.Lock()
+
+
+def bump_catalog_version() -> int:
+    """递增食材目录版本号，使所有基于目录的缓存失效"""
+    global _catalog_version
+    with _version_lock:
+        _catalog_version += 1
+        return _catalog_version
+
+
+class IngredientCatalog:
+    """食材目录（进程内只读缓存）"""
+
+    # 跨进程写入的检测间隔（秒）
+    REFRESH_TTL = 300
+
+    _lock = threading.Lock()
+    _loaded_version = None
+    _checked_at = 0.0
+    _fingerprint = None
+
+    _records: Tuple = ()
+    _by_id: Dict[int, object] = {}
+    _by_name: Dict[str, object] = {}
+    _by_category: Dict[IngredientCategory, Tuple] = {}
+
+    @classmethod
+    def version(cls) -> int:
+        """当前目录版本号（需要应用上下文）"""
+        cls._ensure_loaded()
+        return cls._loaded_version
+
+    @classmethod
+    def all(cls) -> Tuple:
+        """所有启用的食材（按名称排序）"""
+        cls._ensure_loaded()
+        return cls._records
+
+    @classmethod
+    def get(cls, ingredient_id) -> Optional[object]:
+        """按ID获取食材"""
+        cls._ensure_loaded()
+        try:
+            return cls._by_id.get(int(ingredient_id))
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def get_many(cls, ingredient_ids) -> Dict[int, object]:
+        """按ID批量获取食材，返回 {食材ID: 记录}，忽略不存在的ID"""
+        cls._ensure_loaded()
+        result = {}
+        for ingredient_id in ingredient_ids:
+            record = cls.get(ingredient_id)
+            if record is not None:
+                result[record.id] = record
+        return result
+
+    @classmethod
+    def by_name(cls, name: str) -> Optional[object]:
+        """按中文或英文名称获取食材（不区分大小写）"""
+        cls._ensure_loaded()
+        if not name:
+            return None
+        return cls._by_name.get(name.strip().casefold())
+
+    @classmethod
+    def by_category(cls, category) -> Tuple:
+        """按分类获取食材，category 可以是枚举或枚举值字符串"""
+        cls._ensure_loaded()
+        if isinstance(category, str):
+            try:
+                category = IngredientCategory(category)
+            except ValueError:
+                return ()
+        return cls._by_category.get(category, ())
+
+    @classmethod
+    def invalidate(cls):
+        """强制下次访问时重新加载"""
+        bump_catalog_version()
+
+    # ------------ 内部方法 ------------
+
+    @classmethod
+    def _ensure_loaded(cls):
+        now = time.monotonic()
+        if cls._loaded_version == _catalog_version and now - cls._checked_at < cls.REFRESH_TTL:
+            return
+
+        with cls._lock:
+            if cls._loaded_version == _catalog_version and now - cls._checked_at < cls.REFRESH_TTL:
+                return
+
+            fingerprint = cls._read_fingerprint()
+            if cls._loaded_version == _catalog_version and fingerprint == cls._fingerprint:
+                # TTL 到期但数据未变化，只刷新检查时间
+                cls._checked_at = now
+                return
+
+            if cls._loaded_version == _catalog_version:
+                # 其他进程修改了食材表
+                bump_catalog_version()
+
+            cls._load(fingerprint, now)
+
+    @staticmethod
+    def _read_fingerprint():
+        """食材表指纹：行数 + 最后更新时间 + 最大ID"""
+        return tuple(db.session.query(
+            func.count(Ingredient.id),
+            func.max(Ingredient.updated_at),
+            func.max(Ingredient.id)
+        ).one())
+
+    @classmethod
+    def _load(cls, fingerprint, now):
+        version = _catalog_version
+        rows = Ingredient.query.filter_by(is_active=True).order_by(Ingredient.name, Ingredient.id).all()
+
+        records = tuple(
+            IngredientRecord(**{name: getattr(row, name) for name in INGREDIENT_COLUMNS})
+            for row in rows
+        )
+
+        by_name = {}
+        by_category = {}
+        for record in records:
+            for name in (record.name, record.name_en):
+                if name:
+                    by_name.setdefault(name.strip().casefold(), record)
+            by_category.setdefault(record.category, []).append(record)
+
+        cls._records = records
+        cls._by_id = {record.id: record for record in records}
+        cls._by_name = by_name
+        cls._by_category = {category: tuple(items) for category, items in by_category.items()}
+        cls._fingerprint = fingerprint
+        cls._checked_at = now
+        cls._loaded_version = version
+        print(f"食材目录已加载: {len(records)} 种食材 (版本 {version})")
+
+
+# ------------ 食材写入后自动递增版本号 ------------
+
+@event.listens_for(Session, 'before_flush')
+def _track_ingredient_changes(session, flush_context, instances):
+    """记录本次事务是否修改了食材"""
+    changed = itertools.chain(session.new, session.dirty, session.deleted)
+    if any(isinstance(obj, Ingredient) for obj in changed):
+        session.info['ingredients_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_after_commit(session):
+    if session.info.pop('ingredients_changed', False):
+        bump_catalog_version()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('ingredients_changed', None)
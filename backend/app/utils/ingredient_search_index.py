@@ -0,0 +1,121 @@
+"""
+食材搜索倒排索引
+对食材中英文名称和描述建立字符 n-gram（单字 + 双字）倒排索引，
+搜索时先用 n-gram 求交集得到候选，再做精确子串校验并分级排序：
+名称前缀匹配 > 名称子串匹配 > 描述匹配。索引随食材目录版本重建
+"""
+
+import threading
+from typing import Dict, List, Set, Tuple
+
+from app.utils.ingredient_catalog import IngredientCatalog
+
+# 排序等级
+RANK_NAME_PREFIX = 0
+RANK_NAME_SUBSTRING = 1
+RANK_DESCRIPTION = 2
+
+
+def _normalize(text) -> str:
+    return (text or '').strip().casefold()
+
+
+def _ngrams(text: str) -> Set[str]:
+    """生成文本的单字和双字片段"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class IngredientSearchIndex:
+    """食材搜索索引"""
+
+    def __init__(self, records):
+        self.records = {record.id: record for record in records}
+        self.order = {record.id: position for position, record in enumerate(records)}   # 目录顺序（按名称）
+
+        self.names: Dict[int, Tuple[str, ...]] = {}
+        self.descriptions: Dict[int, str] = {}
+        self.name_postings: Dict[str, Set[int]] = {}
+        self.description_postings: Dict[str, Set[int]] = {}
+
+        for record in records:
+            names = tuple(name for name in (_normalize(record.name), _normalize(record.name_en)) if name)
+            description = _normalize(record.description)
+            self.names[record.id] = names
+            self.descriptions[record.id] = description
+
+            for name in names:
+                for gram in _ngrams(name):
+                    self.name_postings.setdefault(gram, set()).add(record.id)
+            for gram in _ngrams(description):
+                self.description_postings.setdefault(gram, set()).add(record.id)
+
+    @staticmethod
+    def _candidates(postings: Dict[str, Set[int]], term: str) -> Set[int]:
+        """用查询词的 n-gram 求交集得到候选ID"""
+        grams = [term] if len(term) == 1 else [term[i:i + 2] for i in range(len(term) - 1)]
+        posting_lists = [postings.get(gram) for gram in grams]
+        if not all(posting_lists):
+            return set()
+        posting_lists.sort(key=len)
+        return set(posting_lists[0]).intersection(*posting_lists[1:])
+
+    def search(self, term: str, include_description: bool = True, limit: int = None) -> List:
+        """
+        搜索食材，返回按匹配等级排序的记录列表
+        同一等级内名称完全相同的排最前，其余保持目录（名称）顺序
+        """
+        term = _normalize(term)
+        if not term:
+            return []
+
+        ranked = {}
+        for ingredient_id in self._candidates(self.name_postings, term):
+            names = self.names[ingredient_id]
+            if any(name.startswith(term) for name in names):
+                ranked[ingredient_id] = RANK_NAME_PREFIX
+            elif any(term in name for name in names):
+                ranked[ingredient_id] = RANK_NAME_SUBSTRING
+
+        if include_description:
+            for ingredient_id in self._candidates(self.description_postings, term):
+                if ingredient_id not in ranked and term in self.descriptions[ingredient_id]:
+                    ranked[ingredient_id] = RANK_DESCRIPTION
+
+        ordered = sorted(
+            ranked,
+            key=lambda ingredient_id: (
+                ranked[ingredient_id],
+                term not in self.names[ingredient_id],
+                self.order[ingredient_id]
+            )
+        )
+        if limit is not None:
+            ordered = ordered[:limit]
+        return [self.records[ingredient_id] for ingredient_id in ordered]
+
+    def matching_ids(self, term: str, include_description: bool = True) -> Set[int]:
+        """返回匹配的食材ID集合（不排序）"""
+        return {record.id for record in self.search(term, include_description)}
+
+
+# ------------ 进程内缓存：随食材目录版本重建 ------------
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> IngredientSearchIndex:
+    """获取当前的食材搜索索引（需要应用上下文）"""
+    global _index, _index_version
+
+    version = IngredientCatalog.version()
+    if _index is not None and _index_version == version:
+        return _index
+
+    with _index_lock:
+        if _index is None or _index_version != version:
+            _index = IngredientSearchIndex(IngredientCatalog.all())
+            _index_version = version
+        return _index
@@ -0,0 +1,91 @@
+"""
+营养聚合内核
+Recipe 营养总量、RecipeIngredient 营养贡献以及原生SQL更新路径共用同一套累加逻辑。
+模型字段与营养矩阵列的对应关系在导入时根据模型列自动生成，
+计算只需要 (食材ID, 重量) 对，不会触发 recipe_ingredient.ingredient 的懒加载
+"""
+
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from app.models.recipe_model import Recipe
+from app.models.recipe_ingredient_model import RecipeIngredient
+from app.models.ingredient_model import Ingredient
+from app.utils.nutrient_matrix import (
+    NUTRIENT_FIELDS, NUTRIENT_INDEX, LEGACY_ALIASES, NutrientMatrix, get_nutrient_matrix
+)
+
+
+def _compile_field_map(model, prefix: str) -> Tuple[Tuple[str, ...], np.ndarray]:
+    """根据模型列生成 (字段名列表, 营养矩阵列号数组)"""
+    fields, columns = [], []
+    for column in model.__table__.columns:
+        if not column.name.startswith(prefix):
+            continue
+        nutrient = column.name[len(prefix):]
+        nutrient = LEGACY_ALIASES.get(nutrient, nutrient)   # total_omega_3 -> omega_3_fatty_acids
+        if nutrient in NUTRIENT_INDEX:
+            fields.append(column.name)
+            columns.append(NUTRIENT_INDEX[nutrient])
+    return tuple(fields), np.array(columns, dtype=np.intp)
+
+
+# 导入时编译的字段映射（total_weight 不是营养素，不在映射中）
+RECIPE_TOTAL_FIELDS, _RECIPE_TOTAL_COLUMNS = _compile_field_map(Recipe, 'total_')
+CONTRIBUTION_FIELDS, _CONTRIBUTION_COLUMNS = _compile_field_map(RecipeIngredient, 'contributed_')
+
+
+def aggregate_pairs(pairs: Iterable[Tuple[int, float]]) -> Tuple[float, np.ndarray]:
+    """
+    根据 (食材ID, 重量g) 对计算营养总量
+    返回 (总重量, 完整营养向量)，营养向量列顺序同 NUTRIENT_FIELDS；
+    不存在的食材不计入营养，也不计入总重量
+    """
+    pairs = [(int(ingredient_id), float(weight or 0)) for ingredient_id, weight in pairs]
+
+    matrix = get_nutrient_matrix()
+    missing_ids = {ingredient_id for ingredient_id, _ in pairs if ingredient_id not in matrix.row_index}
+    extra = None
+    if missing_ids:
+        # 可能是本事务中新增的食材：只查询缺失的食材，不重建全局矩阵
+        extra = NutrientMatrix.from_ingredients(Ingredient.query.filter(Ingredient.id.in_(missing_ids)).all())
+
+    vectors, weights = [], []
+    for ingredient_id, weight in pairs:
+        row = matrix.row_index.get(ingredient_id)
+        if row is not None:
+            vectors.append(matrix.matrix[row])
+        elif extra is not None and ingredient_id in extra.row_index:
+            vectors.append(extra.matrix[extra.row_index[ingredient_id]])
+        else:
+            continue
+        weights.append(weight)
+
+    weights = np.array(weights, dtype=np.float64)
+    vectors = np.array(vectors, dtype=np.float64).reshape(len(weights), len(NUTRIENT_FIELDS))
+    totals = (weights / 100.0) @ vectors
+    return float(weights.sum()), totals
+
+
+def apply_recipe_totals(recipe, pairs: Iterable[Tuple[int, float]]):
+    """将营养总量写入 Recipe 的 total_* 字段"""
+    total_weight, totals = aggregate_pairs(pairs)
+    recipe.total_weight = total_weight
+    for field, value in zip(RECIPE_TOTAL_FIELDS, totals[_RECIPE_TOTAL_COLUMNS].tolist()):
+        setattr(recipe, field, value)
+
+
+def apply_contribution(recipe_ingredient):
+    """将单个食材的营养贡献写入 RecipeIngredient 的 contributed_* 字段"""
+    _, totals = aggregate_pairs([(recipe_ingredient.ingredient_id, recipe_ingredient.weight)])
+    for field, value in zip(CONTRIBUTION_FIELDS, totals[_CONTRIBUTION_COLUMNS].tolist()):
+        setattr(recipe_ingredient, field, value)
+
+
+def recipe_totals_dict(pairs: Iterable[Tuple[int, float]]) -> Dict[str, float]:
+    """以 {total_*: 数值} 字典形式返回营养总量（供原生SQL路径使用）"""
+    total_weight, totals = aggregate_pairs(pairs)
+    result = {'total_weight': total_weight}
+    result.update(zip(RECIPE_TOTAL_FIELDS, totals[_RECIPE_TOTAL_COLUMNS].tolist()))
+    return result
@@ -0,0 +1,117 @@
+"""
+营养矩阵引擎
+将全部食材的营养成分加载为 NumPy 矩阵（每行一个食材，每列一个营养素，每100g），
+食谱的营养总量即为重量向量与矩阵的一次乘积；矩阵随食材目录版本号失效
+"""
+
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from sqlalchemy import Float
+
+from app.models.ingredient_model import Ingredient
+from app.utils.ingredient_catalog import IngredientCatalog
+
+# 所有营养素字段（按 Ingredient 模型的列顺序，自动覆盖新增的营养素列）
+NUTRIENT_FIELDS = tuple(
+    column.name for column in Ingredient.__table__.columns
+    if isinstance(column.type, Float)
+)
+NUTRIENT_INDEX = {name: index for index, name in enumerate(NUTRIENT_FIELDS)}
+
+# 旧接口使用的字段别名（前端仍读取 omega_3 / omega_6）
+LEGACY_ALIASES = {
+    'omega_3': 'omega_3_fatty_acids',
+    'omega_6': 'omega_6_fatty_acids',
+}
+
+
+class NutrientMatrix:
+    """食材营养矩阵"""
+
+    def __init__(self, ingredient_ids: List[int], matrix: np.ndarray,
+                names: List[str], categories: List[str]):
+        self.ingredient_ids = ingredient_ids
+        self.matrix = matrix                  # shape: (食材数, 营养素数)
+        self.names = names
+        self.categories = categories
+        self.row_index = {ing_id: row for row, ing_id in enumerate(ingredient_ids)}
+
+    @classmethod
+    def from_ingredients(cls, ingredients: Iterable) -> 'NutrientMatrix':
+        """从食材对象构建矩阵"""
+        ingredients = list(ingredients)
+        matrix = np.zeros((len(ingredients), len(NUTRIENT_FIELDS)), dtype=np.float64)
+
+        for row, ingredient in enumerate(ingredients):
+            matrix[row] = [getattr(ingredient, field) or 0.0 for field in NUTRIENT_FIELDS]
+
+        return cls(
+            ingredient_ids=[ing.id for ing in ingredients],
+            matrix=matrix,
+            names=[ing.name for ing in ingredients],
+            categories=[ing.category.value if ing.category else None for ing in ingredients]
+        )
+
+    def __len__(self):
+        return len(self.ingredient_ids)
+
+    def lookup(self, ingredient_ids: Iterable[int]) -> Tuple[List[int], np.ndarray]:
+        """返回存在于矩阵中的食材ID及其行号"""
+        found_ids = [ing_id for ing_id in ingredient_ids if ing_id in self.row_index]
+        rows = np.fromiter((self.row_index[ing_id] for ing_id in found_ids),
+                        dtype=np.intp, count=len(found_ids))
+        return found_ids, rows
+
+    def contributions(self, rows: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """计算每个食材的营养贡献矩阵 (食材数 × 营养素数)"""
+        return self.matrix[rows] * (np.asarray(weights, dtype=np.float64) / 100.0)[:, None]
+
+    def totals(self, weight_map: Dict[int, float]) -> np.ndarray:
+        """根据 {食材ID: 重量(g)} 计算营养总量向量"""
+        found_ids, rows = self.lookup(weight_map.keys())
+        weights = np.array([weight_map[ing_id] for ing_id in found_ids], dtype=np.float64)
+        return (weights / 100.0) @ self.matrix[rows]
+
+
+def nutrient_vector_to_dict(vector: np.ndarray) -> Dict[str, float]:
+    """将营养向量转换为字典（包含旧接口别名）"""
+    result = dict(zip(NUTRIENT_FIELDS, vector.tolist()))
+    for alias, field in LEGACY_ALIASES.items():
+        result[alias] = result[field]
+    return result
+
+
+# ------------ 进程内缓存：首次使用时构建，食材目录版本变化后重建 ------------
+_matrix = None
+_matrix_version = None
+_matrix_stale = True
+_matrix_lock = threading.Lock()
+
+
+def get_nutrient_matrix() -> NutrientMatrix:
+    """获取当前的营养矩阵（需要应用上下文）"""
+    global _matrix, _matrix_version, _matrix_stale
+
+    version = IngredientCatalog.version()
+    matrix = _matrix
+    if matrix is not None and not _matrix_stale and _matrix_version == version:
+        return matrix
+
+    with _matrix_lock:
+        if _matrix is None or _matrix_stale or _matrix_version != version:
+            _matrix_stale = False
+            # 包含已停用的食材，保证历史食谱仍能计算营养
+            _matrix = NutrientMatrix.from_ingredients(
+                Ingredient.query.order_by(Ingredient.id).all()
+            )
+            _matrix_version = version
+            print(f"营养矩阵已构建: {len(_matrix)} 种食材 × {len(NUTRIENT_FIELDS)} 种营养素")
+        return _matrix
+
+
+def invalidate_nutrient_matrix():
+    """标记营养矩阵失效，下次使用时重建"""
+    global _matrix_stale
+    _matrix_stale = True
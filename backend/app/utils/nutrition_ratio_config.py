@@ -1,11 +1,15 @@
 """
 营养比例配置系统
-提供不同宠物类型和特殊需求的营养比例预设方案
+提供不同宠物类型和特殊需求的营养比例预设方案。
+预设方案在导入时编译为只读的方案记录（含序列化好的 JSON 片段），
+营养方案列表接口只需查表并拼接字节
 """
 
+import json
 from enum import Enum
-from dataclasses import dataclass
-from typing import Dict, List, Optional
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
 class NutritionProfile(Enum):
     """营养配置方案类型"""
@@ -221,33 +225,11 @@ class NutritionRatioService:
     
     @classmethod
     def get_suitable_plans(cls, pet_species: str, age: int, special_needs: List[str]) -> List[NutritionProfile]:
-        """根据宠物信息推荐合适的营养方案"""
-        suitable_plans = []
-        
-        # 基础方案
-        if pet_species.lower() == 'dog':
-            if age >= 7:
-                suitable_plans.append(NutritionProfile.SENIOR_DOG)
-            else:
-                suitable_plans.append(NutritionProfile.BASIC_DOG)
-                suitable_plans.append(NutritionProfile.ACTIVE_DOG)
-        elif pet_species.lower() == 'cat':
-            suitable_plans.append(NutritionProfile.BASIC_CAT)
-        
-        # 特殊需求方案
-        if special_needs:
-            for need in special_needs:
-                need_lower = need.lower()
-                if any(keyword in need_lower for keyword in ['obesity', 'overweight', 'weight loss', '肥胖', '减重']):
-                    suitable_plans.append(NutritionProfile.WEIGHT_LOSS)
-                elif any(keyword in need_lower for keyword in ['kidney', 'renal', '肾']):
-                    suitable_plans.append(NutritionProfile.KIDNEY_SUPPORT)
-                elif any(keyword in need_lower for keyword in ['coat', 'skin', 'hair', '美毛', '毛发']):
-                    suitable_plans.append(NutritionProfile.COAT_HEALTH)
-                elif any(keyword in need_lower for keyword in ['allergy', 'allergic', '过敏']):
-                    suitable_plans.append(NutritionProfile.ALLERGY_FRIENDLY)
-        
-        return list(set(suitable_plans))  # 去重
+        """根据宠物信息推荐合适的营养方案（按推荐顺序，结果按物种、年龄段和特殊需求缓存）"""
+        species = (pet_species or '').lower()
+        is_senior = species == 'dog' and age >= 7    # 只有犬的方案区分年龄段
+        needs = tuple(sorted({need.strip().lower() for need in special_needs or () if need and need.strip()}))
+        return list(_suitable_plans(species, is_senior, needs))
     
     @classmethod
     def calculate_ingredient_weights(cls, plan: NutritionPlan, total_weight: float,
@@ -294,6 +276,77 @@ class NutritionRatioService:
         
         return weights
 
+@lru_cache(maxsize=1024)
+def _suitable_plans(species: str, is_senior: bool, needs: Tuple[str, ...]) -> Tuple[NutritionProfile, ...]:
+    """(物种, 是否老年犬, 规范化的特殊需求) -> 推荐的营养方案"""
+    suitable_plans = []
+    
+    # 基础方案
+    if species == 'dog':
+        if is_senior:
+            suitable_plans.append(NutritionProfile.SENIOR_DOG)
+        else:
+            suitable_plans.append(NutritionProfile.BASIC_DOG)
+            suitable_plans.append(NutritionProfile.ACTIVE_DOG)
+    elif species == 'cat':
+        suitable_plans.append(NutritionProfile.BASIC_CAT)
+    
+    # 特殊需求方案
+    for need_lower in needs:
+        if any(keyword in need_lower for keyword in ['obesity', 'overweight', 'weight loss', '肥胖', '减重']):
+            suitable_plans.append(NutritionProfile.WEIGHT_LOSS)
+        elif any(keyword in need_lower for keyword in ['kidney', 'renal', '肾']):
+            suitable_plans.append(NutritionProfile.KIDNEY_SUPPORT)
+        elif any(keyword in need_lower for keyword in ['coat', 'skin', 'hair', '美毛', '毛发']):
+            suitable_plans.append(NutritionProfile.COAT_HEALTH)
+        elif any(keyword in need_lower for keyword in ['allergy', 'allergic', '过敏']):
+            suitable_plans.append(NutritionProfile.ALLERGY_FRIENDLY)
+    
+    return tuple(dict.fromkeys(suitable_plans))  # 去重并保持推荐顺序
+
+# ------------ 编译后的方案记录：导入时生成，方案列表接口直接拼接 JSON 片段 ------------
+
+@dataclass(frozen=True)
+class CompiledPlan:
+    """只读的营养方案记录"""
+    profile: NutritionProfile
+    plan: NutritionPlan
+    payload: Dict           # 接口返回的方案字典（不含 is_recommended）
+    recommended_json: bytes
+    default_json: bytes
+
+def _compile_plan(profile: NutritionProfile, plan: NutritionPlan) -> CompiledPlan:
+    payload = {
+        'id': profile.value,
+        'name': plan.name,
+        'description': plan.description,
+        'special_notes': list(plan.special_notes),
+        'category_ratios': asdict(plan.category_ratios)
+    }
+    
+    def encode(is_recommended):
+        return json.dumps(dict(payload, is_recommended=is_recommended),
+                        separators=(',', ':'), sort_keys=True).encode('utf-8')
+    
+    return CompiledPlan(profile, plan, payload, encode(True), encode(False))
+
+COMPILED_PLANS: Dict[NutritionProfile, CompiledPlan] = {
+    profile: _compile_plan(profile, plan)
+    for profile, plan in NutritionRatioService.NUTRITION_PLANS.items()
+}
+
+@lru_cache(maxsize=256)
+def plans_json(recommended: Tuple[NutritionProfile, ...] = ()) -> bytes:
+    """
+    营养方案列表接口的响应体：推荐方案在前（按推荐顺序），其余方案按预设顺序
+    按推荐方案组合缓存，组合数很少
+    """
+    fragments = [COMPILED_PLANS[profile].recommended_json for profile in recommended if profile in COMPILED_PLANS]
+    fragments.extend(
+        compiled.default_json for profile, compiled in COMPILED_PLANS.items() if profile not in recommended
+    )
+    return b'{"plans":[' + b','.join(fragments) + b']}'
+
 def get_nutrition_profile_choices():
     """获取可选的营养方案列表（用于前端下拉框）"""
     return [
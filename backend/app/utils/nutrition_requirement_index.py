@@ -0,0 +1,195 @@
+"""
+营养需求标准索引
+营养需求表很小且基本不变（由 init_nutrition_data.init_nutrition_requirements 写入），
+首次使用时一次性载入内存：按 (宠物类型, 生命阶段, 活动量) 分组，每组是按体重下限排序的体重区间，
+查询只需二分定位再检查区间上限；每日需求的计算按列存成 NumPy 数组，多只宠物一次向量化计算。
+营养需求表修改提交后索引自动失效
+"""
+
+import bisect
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.nutrition_requirements_model import ActivityLevel, LifeStage, NutritionRequirement, PetType
+from app.utils.aafco_evaluator import compile_bounds
+
+# 每日需求计算使用的需求列（每kg干物质）
+REQUIREMENT_FIELDS = (
+    'calories_per_kg', 'protein_min', 'fat_min', 'calcium_min', 'phosphorus_min',
+    'vitamin_a_min', 'vitamin_d_min', 'taurine_min'
+)
+
+# 每kg干物质约4000kcal
+DRY_MATTER_CALORIES_PER_KG = 4000
+
+# 未指定活动量时按此顺序匹配
+ACTIVITY_FALLBACK = (ActivityLevel.MODERATE, ActivityLevel.LOW, ActivityLevel.HIGH)
+
+
+def life_stage_for(age) -> LifeStage:
+    """根据年龄确定生命阶段（犬猫的划分相同）"""
+    if age is not None and age < 1:
+        return LifeStage.PUPPY_KITTEN
+    if age is not None and age >= 7:
+        return LifeStage.SENIOR
+    return LifeStage.ADULT
+
+
+@dataclass(frozen=True)
+class WeightIntervals:
+    """同一 (宠物类型, 生命阶段, 活动量) 下的体重区间，按下限排序"""
+    starts: Tuple[float, ...]
+    ends: Tuple[float, ...]
+    rows: Tuple[int, ...]           # 对应的需求行号（REQUIREMENT_FIELDS 数组的行）
+    max_end: Tuple[float, ...]      # 前缀最大上限，用于提前结束扫描
+
+    def find(self, weight: float) -> Optional[int]:
+        """包含该体重的区间中 ID 最小的一条（与原查询 .first() 一致）"""
+        position = bisect.bisect_right(self.starts, weight)
+        matches = []
+        for index in range(position - 1, -1, -1):
+            if self.max_end[index] < weight:
+                break
+            if self.ends[index] >= weight:
+                matches.append(self.rows[index])
+        return min(matches) if matches else None
+
+
+class NutritionRequirementIndex:
+    """营养需求标准的内存索引"""
+
+    def __init__(self, requirements: Iterable[NutritionRequirement]):
+        requirements = sorted(requirements, key=lambda requirement: requirement.id)
+        self.requirement_ids = [requirement.id for requirement in requirements]
+        self.values = np.array(
+            [[getattr(requirement, field) or 0.0 for field in REQUIREMENT_FIELDS] for requirement in requirements],
+            dtype=np.float64
+        ).reshape(len(requirements), len(REQUIREMENT_FIELDS))
+        # AAFCO 评估使用的全部上下限（与营养素列对齐）
+        self.min_bounds, self.max_bounds, self.ratio_bounds = compile_bounds(requirements)
+
+        groups: Dict[Tuple, List] = {}
+        for row, requirement in enumerate(requirements):
+            key = (requirement.pet_type, requirement.life_stage, requirement.activity_level)
+            groups.setdefault(key, []).append((requirement.min_weight, requirement.max_weight, row))
+
+        self.intervals: Dict[Tuple, WeightIntervals] = {}
+        for key, items in groups.items():
+            items.sort()
+            ends = [end for _, end, _ in items]
+            self.intervals[key] = WeightIntervals(
+                starts=tuple(start for start, _, _ in items),
+                ends=tuple(ends),
+                rows=tuple(row for _, _, row in items),
+                max_end=tuple(np.maximum.accumulate(ends).tolist())
+            )
+
+    def find_row(self, pet_type: PetType, life_stage: LifeStage, activity_level: Optional[ActivityLevel],
+                weight_kg: float) -> Optional[int]:
+        """查找适用的需求行号；活动量为 None 时按 ACTIVITY_FALLBACK 顺序匹配"""
+        if weight_kg is None:
+            return None
+        for level in (activity_level,) if activity_level is not None else ACTIVITY_FALLBACK:
+            intervals = self.intervals.get((pet_type, life_stage, level))
+            row = intervals.find(weight_kg) if intervals else None
+            if row is not None:
+                return row
+        return None
+
+    def calculate_daily_requirements(self, rows: Sequence[Optional[int]],
+                                    weights_kg: Sequence[float]) -> List[Optional[Dict]]:
+        """向量化计算多只宠物的每日营养需求（与 NutritionRequirement.calculate_daily_requirements 相同的公式）"""
+        found = np.array([row is not None for row in rows], dtype=bool)
+        results: List[Optional[Dict]] = [None] * len(rows)
+        if not found.any():
+            return results
+
+        row_index = np.array([row for row in rows if row is not None], dtype=np.intp)
+        weights = np.array([weight for row, weight in zip(rows, weights_kg) if row is not None], dtype=np.float64)
+        values = self.values[row_index]
+        column = {field: values[:, index] for index, field in enumerate(REQUIREMENT_FIELDS)}
+
+        daily_calories = column['calories_per_kg'] * weights
+        dry_matter = daily_calories / DRY_MATTER_CALORIES_PER_KG
+        computed = np.column_stack([
+            daily_calories,
+            dry_matter,
+            column['protein_min'] / 100 * dry_matter * 1000,
+            column['fat_min'] / 100 * dry_matter * 1000,
+            column['calcium_min'] * dry_matter,
+            column['phosphorus_min'] * dry_matter,
+            column['vitamin_a_min'] * dry_matter,
+            column['vitamin_d_min'] * dry_matter,
+            column['taurine_min'] * dry_matter
+        ]).tolist()
+
+        keys = ('daily_calories', 'dry_matter_needed_kg', 'protein_min_g', 'fat_min_g', 'calcium_min_mg',
+                'phosphorus_min_mg', 'vitamin_a_min_iu', 'vitamin_d_min_iu', 'taurine_min_mg')
+        for position, values_row in zip(np.flatnonzero(found), computed):
+            results[position] = dict(zip(keys, values_row))
+        return results
+
+    def row_for_pet(self, pet) -> Optional[int]:
+        """宠物适用的需求行号（生命阶段按年龄确定，活动量优先匹配中等）"""
+        try:
+            pet_type = PetType((pet.species or '').lower())
+        except ValueError:
+            return None
+        return self.find_row(pet_type, life_stage_for(pet.age), None, pet.weight)
+
+    def requirements_for_pets(self, pets: Iterable) -> Dict[int, Optional[Dict]]:
+        """{宠物ID: 每日营养需求}，宠物没有适用的需求标准时为 None"""
+        pets = list(pets)
+        rows = [self.row_for_pet(pet) for pet in pets]
+        results = self.calculate_daily_requirements(rows, [pet.weight for pet in pets])
+        return {pet.id: result for pet, result in zip(pets, results)}
+
+
+# ------------ 进程内缓存：首次使用时载入，需求表修改提交后失效 ------------
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_requirement_index(session=None) -> NutritionRequirementIndex:
+    """获取营养需求索引（需要应用上下文）"""
+    global _index
+
+    index = _index
+    if index is not None:
+        return index
+
+    with _index_lock:
+        if _index is None:
+            query = (session or db.session).query(NutritionRequirement)
+            _index = NutritionRequirementIndex(query.filter(NutritionRequirement.is_active == True).all())
+        return _index
+
+
+def invalidate_requirement_index():
+    """使营养需求索引失效，下次使用时重新载入"""
+    global _index
+    _index = None
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_requirement_changes(session, flush_context, instances):
+    if any(isinstance(obj, NutritionRequirement)
+           for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info['nutrition_requirements_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('nutrition_requirements_changed', False):
+        invalidate_requirement_index()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('nutrition_requirements_changed', None)
@@ -0,0 +1,223 @@
+"""
+宠物营养画像
+把宠物的营养方案、目标营养范围、过敏食材和特殊需求解析一次，评分、过敏检查和重量推荐都使用同一个画像，
+不再在每次请求中重复解析 special_needs 字符串和匹配营养方案。
+画像按宠物ID缓存：宠物信息（edit_pet）或过敏食材（过敏食材API）的修改提交后失效；
+其他进程的修改在 TTL 到期后生效
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import FrozenSet, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models.pet_model import Pet
+from app.models.pet_allergen_model import PetAllergen
+from app.utils.allergen_resolver import AllergenResolver, ResolvedAllergens
+from app.utils.ingredient_catalog import IngredientCatalog
+from app.utils.nutrition_ratio_config import NutritionPlan, NutritionProfile, NutritionRatioService
+
+
+def parse_special_needs(special_needs: Optional[str]) -> Tuple[str, ...]:
+    """解析特殊需求为列表（表单未选择时保存为 'None'）"""
+    if not special_needs or special_needs == 'None':
+        return ()
+    return tuple(need.strip() for need in special_needs.split(',') if need.strip())
+
+
+# 估算日食量时假设的食物热量密度（大卡/克）
+FOOD_CALORIES_PER_GRAM = 3.5
+
+
+def calculate_daily_food_amount(weight_kg, species, age):
+    """计算每日推荐食量（克）"""
+    try:
+        # 基础代谢率计算（简化）
+        if species.lower() == 'dog':
+            if age < 1:  # 幼犬
+                daily_calories = weight_kg * 100
+            elif age > 7:  # 老年犬
+                daily_calories = weight_kg * 80
+            else:  # 成犬
+                daily_calories = weight_kg * 95
+        else:  # 猫
+            if age < 1:  # 幼猫
+                daily_calories = weight_kg * 120
+            elif age > 7:  # 老年猫
+                daily_calories = weight_kg * 85
+            else:  # 成猫
+                daily_calories = weight_kg * 100
+
+        # 假设食物热量密度为每克3.5大卡
+        daily_food_g = daily_calories / FOOD_CALORIES_PER_GRAM
+        return round(daily_food_g, 1)
+
+    except:
+        # 默认值
+        return weight_kg * 25
+
+
+@dataclass(frozen=True)
+class PetNutritionProfile:
+    """宠物营养画像（只读）"""
+    pet_id: int
+    user_id: int
+    species: str                                  # 小写物种
+    age: int
+    weight: float
+    special_needs_text: str                       # 原始特殊需求（小写），用于关键词匹配
+    special_needs: Tuple[str, ...]                # 解析后的特殊需求列表
+    suitable_plans: Tuple[NutritionProfile, ...]  # 推荐的营养方案
+    plan: Optional[NutritionPlan]                 # 评分使用的营养方案（第一个推荐方案）
+    protein_range: Optional[Tuple[float, float]]  # 蛋白质百分比范围
+    fat_range: Optional[Tuple[float, float]]      # 脂肪百分比范围
+    carb_max: Optional[float]                     # 碳水最大百分比
+    allergens: ResolvedAllergens                  # 过敏食材（记录 + 特殊需求中的过敏描述）
+    daily_food_amount: float                      # 每日推荐食量（克）
+    catalog_version: int                          # 构建时的食材目录版本
+
+    @property
+    def recorded_allergen_ids(self) -> FrozenSet[int]:
+        """过敏食材记录中的食材"""
+        return self.allergens.recorded_ids
+
+    @property
+    def allergen_ids(self) -> FrozenSet[int]:
+        """需要排除的全部过敏食材"""
+        return self.allergens.all_ids
+
+    @property
+    def daily_calories(self) -> float:
+        """每日所需热量（大卡），与每日推荐食量使用同一估算"""
+        return self.daily_food_amount * FOOD_CALORIES_PER_GRAM
+
+    @property
+    def is_young(self) -> bool:
+        return self.age < 1
+
+    @property
+    def is_senior(self) -> bool:
+        return self.age >= 7
+
+    @property
+    def age_group(self) -> str:
+        """评分规则只区分幼年(<1)、成年、老年(>=7)"""
+        if self.is_young:
+            return 'young'
+        if self.is_senior:
+            return 'senior'
+        return 'adult'
+
+    @property
+    def signature(self) -> Tuple:
+        """影响推荐评分的画像签名（物种、年龄段、特殊需求）"""
+        return (self.species, self.age_group, ' '.join(self.special_needs_text.split()))
+
+    @classmethod
+    def build(cls, pet: Pet) -> 'PetNutritionProfile':
+        """从宠物记录构建画像（一次过敏食材查询，特殊需求中的过敏描述由关键词表解析）"""
+        special_needs = parse_special_needs(pet.special_needs)
+        suitable_plans = tuple(NutritionRatioService.get_suitable_plans(pet.species, pet.age, list(special_needs)))
+        plan = NutritionRatioService.get_plan(suitable_plans[0]) if suitable_plans else None
+        targets = plan.nutrition_targets if plan else None
+
+        return cls(
+            pet_id=pet.id,
+            user_id=pet.user_id,
+            species=(pet.species or '').lower(),
+            age=pet.age,
+            weight=pet.weight,
+            special_needs_text=(pet.special_needs or '').lower(),
+            special_needs=special_needs,
+            suitable_plans=suitable_plans,
+            plan=plan,
+            protein_range=(targets.protein_min, targets.protein_max) if targets else None,
+            fat_range=(targets.fat_min, targets.fat_max) if targets else None,
+            carb_max=targets.carb_max if targets else None,
+            allergens=AllergenResolver.resolve(pet.id, pet.special_needs),
+            daily_food_amount=calculate_daily_food_amount(pet.weight, pet.species, pet.age),
+            catalog_version=IngredientCatalog.version()
+        )
+
+
+# ------------ 进程内缓存 ------------
+REFRESH_TTL = 300       # 跨进程写入的检测间隔（秒）
+MAX_PROFILES = 1024
+
+_profiles = OrderedDict()   # 宠物ID -> (构建时间, 画像)
+_profiles_lock = threading.Lock()
+
+
+def get_pet_profile(pet_id: int, user_id: int = None) -> Optional[PetNutritionProfile]:
+    """
+    获取宠物营养画像（需要应用上下文），宠物不存在时返回 None
+    传入 user_id 时只返回属于该用户的宠物
+    pet_id 统一转换为 int 作为缓存键（请求 JSON 中可能是字符串），与提交后按 int 失效一致
+    """
+    try:
+        pet_id = int(pet_id)
+    except (TypeError, ValueError):
+        return None
+
+    now = time.monotonic()
+    version = IngredientCatalog.version()
+
+    with _profiles_lock:
+        entry = _profiles.get(pet_id)
+        if entry is not None and now - entry[0] < REFRESH_TTL and entry[1].catalog_version == version:
+            _profiles.move_to_end(pet_id)
+            profile = entry[1]
+        else:
+            profile = None
+
+    if profile is None:
+        pet = Pet.query.get(pet_id)
+        if pet is None:
+            return None
+        profile = PetNutritionProfile.build(pet)
+        with _profiles_lock:
+            _profiles[pet_id] = (now, profile)
+            _profiles.move_to_end(pet_id)
+            while len(_profiles) > MAX_PROFILES:
+                _profiles.popitem(last=False)
+
+    if user_id is not None and profile.user_id != user_id:
+        return None
+    return profile
+
+
+def invalidate_pet_profile(pet_id: int = None):
+    """使指定宠物（默认全部）的画像失效"""
+    with _profiles_lock:
+        if pet_id is None:
+            _profiles.clear()
+        else:
+            _profiles.pop(pet_id, None)
+
+
+# ------------ 宠物信息、过敏食材修改后自动失效 ------------
+
+@event.listens_for(Session, 'before_flush')
+def _track_pet_changes(session, flush_context, instances):
+    """记录本次事务修改过的宠物"""
+    changed = session.info.setdefault('changed_pet_ids', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Pet) and obj.id is not None:
+            changed.add(obj.id)
+        elif isinstance(obj, PetAllergen) and obj.pet_id is not None:
+            changed.add(obj.pet_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    for pet_id in session.info.pop('changed_pet_ids', ()):
+        invalidate_pet_profile(pet_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('changed_pet_ids', None)
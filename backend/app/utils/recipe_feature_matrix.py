@@ -0,0 +1,303 @@
+"""
+食谱特征矩阵
+为所有可推荐的食谱（已发布、公开、有实际内容）维护三个特征矩阵，推荐评分时对全部候选食谱做向量化计算：
+- 食谱×食材 关联矩阵（0/1，列顺序同营养矩阵的食材行）
+- 食谱×食材分类 数量矩阵
+- 食谱×营养特征 矩阵（所含食材每100g营养特征的平均值）
+同时保存评分用到的营养总量、适用性标志和创建时间。
+食谱发布、编辑、删除或食材目录变化后失效，下次使用时重建；
+其他进程的写入在 TTL 到期后通过指纹查询发现
+"""
+
+import itertools
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.ingredient_model import IngredientCategory
+from app.models.recipe_model import Recipe, RecipeStatus
+from app.models.recipe_ingredient_model import RecipeIngredient
+from app.utils.ingredient_bitset import pack_columns, pack_rows, rows_covering, rows_intersecting
+from app.utils.ingredient_catalog import IngredientCatalog
+from app.utils.nutrient_matrix import NUTRIENT_INDEX, NutrientMatrix, get_nutrient_matrix
+from app.utils.recommendation_cache import recommendation_cache
+
+# 营养特征（与推荐算法的营养特征相似度一致）
+FEATURE_NUTRIENTS = ('protein', 'fat', 'carbohydrate', 'calories', 'calcium', 'phosphorus')
+
+# 食材分类列
+CATEGORIES = tuple(category.value for category in IngredientCategory)
+CATEGORY_INDEX = {category: index for index, category in enumerate(CATEGORIES)}
+
+# 评分用到的食谱字段
+PROFILE_FIELDS = (
+    'total_weight', 'total_calories', 'total_protein', 'total_fat', 'total_carbohydrate',
+    'total_calcium', 'total_phosphorus', 'total_omega_3', 'total_omega_6'
+)
+FLAG_FIELDS = (
+    'suitable_for_dogs', 'suitable_for_cats', 'suitable_for_puppies',
+    'suitable_for_kittens', 'suitable_for_seniors'
+)
+
+# 修改后需要重建矩阵的食谱字段（点赞、收藏等计数不影响特征）
+TRACKED_RECIPE_ATTRIBUTES = ('status', 'is_public') + PROFILE_FIELDS + FLAG_FIELDS
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def recommendable_condition():
+    """可被推荐的食谱条件"""
+    return (
+        (Recipe.status == RecipeStatus.PUBLISHED) &
+        (Recipe.is_public == True) &
+        (Recipe.total_weight > 0)
+    )
+
+
+def to_timestamp(value: datetime) -> float:
+    """UTC 时间转换为秒数（与 datetime.utcnow 使用同一基准），None 转为 NaN"""
+    return (value - _EPOCH).total_seconds() if value else np.nan
+
+
+class RecipeFeatureMatrix:
+    """食谱特征矩阵"""
+
+    def __init__(self, recipe_ids: List[int], ingredient_ids: List[int], incidence: np.ndarray,
+                categories: np.ndarray, nutrients: np.ndarray, profile: Dict[str, np.ndarray],
+                flags: Dict[str, np.ndarray], created_at: np.ndarray,
+                category_onehot: np.ndarray, ingredient_features: np.ndarray):
+        self.recipe_ids = np.array(recipe_ids, dtype=np.int64)
+        self.row_index = {recipe_id: row for row, recipe_id in enumerate(recipe_ids)}
+        self.ingredient_ids = ingredient_ids
+        self.column_index = {ingredient_id: column for column, ingredient_id in enumerate(ingredient_ids)}
+
+        self.incidence = incidence            # shape: (食谱数, 食材数)，bool
+        self.ingredient_bits = pack_rows(incidence)   # shape: (食谱数, 字数)，uint64 位集（第 j 位对应第 j 列）
+        self.categories = categories          # shape: (食谱数, 分类数)，食材数量
+        self.nutrients = nutrients            # shape: (食谱数, 营养特征数)
+        self.profile = profile                # {字段: (食谱数,)}
+        self.flags = flags                    # {字段: (食谱数,) bool}
+        self.created_at = created_at          # (食谱数,) UTC 秒数
+        self.ingredient_counts = incidence.sum(axis=1)
+
+        self.category_onehot = category_onehot            # shape: (食材数, 分类数)
+        self.ingredient_features = ingredient_features    # shape: (食材数, 营养特征数)
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    @classmethod
+    def build(cls, nutrient_matrix: NutrientMatrix) -> 'RecipeFeatureMatrix':
+        """从数据库加载可推荐的食谱并构建矩阵（两次查询）"""
+        recipe_rows = db.session.query(
+            Recipe.id,
+            Recipe.created_at,
+            *(getattr(Recipe, field) for field in PROFILE_FIELDS + FLAG_FIELDS)
+        ).filter(recommendable_condition()).order_by(Recipe.id).all()
+
+        pair_rows = db.session.query(
+            RecipeIngredient.recipe_id,
+            RecipeIngredient.ingredient_id
+        ).join(Recipe, Recipe.id == RecipeIngredient.recipe_id).filter(recommendable_condition()).all()
+
+        recipe_ids = [row.id for row in recipe_rows]
+        row_index = {recipe_id: row for row, recipe_id in enumerate(recipe_ids)}
+
+        # 食材出现次数矩阵（同一食材可能在食谱中出现多次）
+        counts = np.zeros((len(recipe_ids), len(nutrient_matrix)), dtype=np.float64)
+        rows, columns = [], []
+        for recipe_id, ingredient_id in pair_rows:
+            column = nutrient_matrix.row_index.get(ingredient_id)
+            if column is not None:
+                rows.append(row_index[recipe_id])
+                columns.append(column)
+        np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)), 1.0)
+
+        # 食材 -> 分类 的独热矩阵
+        category_onehot = np.zeros((len(nutrient_matrix), len(CATEGORIES)), dtype=np.float64)
+        for column, category in enumerate(nutrient_matrix.categories):
+            if category in CATEGORY_INDEX:
+                category_onehot[column, CATEGORY_INDEX[category]] = 1.0
+
+        # 食材营养特征，食谱特征为所含食材的平均值
+        ingredient_features = nutrient_matrix.matrix[:, [NUTRIENT_INDEX[name] for name in FEATURE_NUTRIENTS]]
+        totals = counts.sum(axis=1, keepdims=True)
+        nutrients = np.divide(counts @ ingredient_features, totals,
+                            out=np.zeros((len(recipe_ids), len(FEATURE_NUTRIENTS))), where=totals > 0)
+
+        profile = {
+            field: np.array([getattr(row, field) or 0.0 for row in recipe_rows], dtype=np.float64)
+            for field in PROFILE_FIELDS
+        }
+        flags = {
+            field: np.array([bool(getattr(row, field)) for row in recipe_rows], dtype=bool)
+            for field in FLAG_FIELDS
+        }
+        created_at = np.array([to_timestamp(row.created_at) for row in recipe_rows], dtype=np.float64)
+
+        return cls(
+            recipe_ids=recipe_ids,
+            ingredient_ids=list(nutrient_matrix.ingredient_ids),
+            incidence=counts > 0,
+            categories=counts @ category_onehot,
+            nutrients=nutrients,
+            profile=profile,
+            flags=flags,
+            created_at=created_at,
+            category_onehot=category_onehot,
+            ingredient_features=ingredient_features
+        )
+
+    def selection_vectors(self, ingredients) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        将用户选择的食材转换为与矩阵对应的向量
+        返回 (食材列号数组, 分类数量向量, 平均营养特征向量)
+        """
+        columns = np.array([self.column_index[ing.id] for ing in ingredients if ing.id in self.column_index],
+                        dtype=np.intp)
+
+        category_vector = np.zeros(len(CATEGORIES), dtype=np.float64)
+        for ing in ingredients:
+            if ing.category is not None:
+                category_vector[CATEGORY_INDEX[ing.category.value]] += 1
+
+        nutrient_vector = np.zeros(len(FEATURE_NUTRIENTS), dtype=np.float64)
+        if ingredients:
+            nutrient_vector = np.array(
+                [[getattr(ing, name) or 0.0 for name in FEATURE_NUTRIENTS] for ing in ingredients],
+                dtype=np.float64
+            ).mean(axis=0)
+
+        return columns, category_vector, nutrient_vector
+
+    def features_for_ingredients(self, ingredient_ids) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        按与矩阵行相同的方式计算任意食材列表（可重复）的特征，
+        用于不在矩阵中的食谱（如草稿）。返回 (关联行, 分类数量行, 营养特征行)
+        """
+        counts = np.zeros(len(self.ingredient_ids), dtype=np.float64)
+        for ingredient_id in ingredient_ids:
+            column = self.column_index.get(ingredient_id)
+            if column is not None:
+                counts[column] += 1
+
+        total = counts.sum()
+        nutrients = counts @ self.ingredient_features / total if total else np.zeros(len(FEATURE_NUTRIENTS))
+        return counts > 0, counts @ self.category_onehot, nutrients
+
+    def ingredient_mask(self, ingredient_ids) -> Tuple[np.ndarray, bool]:
+        """食材ID -> 与 ingredient_bits 对齐的位集；第二项表示是否所有食材都在矩阵中"""
+        columns = [self.column_index[ing_id] for ing_id in ingredient_ids if ing_id in self.column_index]
+        return pack_columns(columns, len(self.ingredient_ids)), len(columns) == len(set(ingredient_ids))
+
+    def rows_containing(self, ingredient_ids) -> np.ndarray:
+        """包含任一指定食材的食谱（bool 掩码）"""
+        mask, _ = self.ingredient_mask(ingredient_ids)
+        return rows_intersecting(self.ingredient_bits, mask)
+
+    def rows_containing_all(self, ingredient_ids) -> np.ndarray:
+        """包含全部指定食材的食谱（bool 掩码），有食材不在矩阵中时没有食谱满足"""
+        mask, complete = self.ingredient_mask(ingredient_ids)
+        if not complete:
+            return np.zeros(len(self), dtype=bool)
+        return rows_covering(self.ingredient_bits, mask)
+
+
+# ------------ 进程内缓存 ------------
+REFRESH_TTL = 300     # 跨进程写入的检测间隔（秒）
+
+_features = None
+_features_version = None
+_features_stale = True
+_features_fingerprint = None
+_features_checked_at = 0.0
+_features_lock = threading.Lock()
+
+
+def _read_fingerprint():
+    """食谱特征指纹：可推荐食谱数 + 最后更新时间 + 食材关联的行数和最大ID"""
+    recipe_part = db.session.query(
+        func.count(Recipe.id), func.max(Recipe.updated_at)
+    ).filter(recommendable_condition()).one()
+    ingredient_part = db.session.query(
+        func.count(RecipeIngredient.id), func.max(RecipeIngredient.id)
+    ).one()
+    return tuple(recipe_part) + tuple(ingredient_part)
+
+
+def _is_fresh(version, now) -> bool:
+    return (_features is not None and not _features_stale and _features_version == version
+            and now - _features_checked_at < REFRESH_TTL)
+
+
+def get_recipe_features() -> RecipeFeatureMatrix:
+    """获取当前的食谱特征矩阵（需要应用上下文）"""
+    global _features, _features_version, _features_stale, _features_fingerprint, _features_checked_at
+
+    version = IngredientCatalog.version()
+    now = time.monotonic()
+    if _is_fresh(version, now):
+        return _features
+
+    with _features_lock:
+        if _is_fresh(version, now):
+            return _features
+
+        fingerprint = _read_fingerprint()
+        if (_features is not None and not _features_stale and _features_version == version
+                and fingerprint == _features_fingerprint):
+            # TTL 到期但数据未变化，只刷新检查时间
+            _features_checked_at = now
+            return _features
+
+        _features_stale = False
+        _features = RecipeFeatureMatrix.build(get_nutrient_matrix())
+        _features_version = version
+        _features_fingerprint = fingerprint
+        _features_checked_at = now
+        print(f"食谱特征矩阵已构建: {len(_features)} 个食谱 × {len(_features.ingredient_ids)} 种食材")
+        return _features
+
+
+def invalidate_recipe_features():
+    """标记食谱特征矩阵失效，下次使用时重建（原生SQL写入路径需要手动调用），同时清空推荐缓存"""
+    global _features_stale
+    _features_stale = True
+    recommendation_cache.invalidate()
+
+
+# ------------ 食谱发布、编辑、删除后自动失效 ------------
+
+def _affects_features(obj) -> bool:
+    if isinstance(obj, RecipeIngredient):
+        return True
+    if isinstance(obj, Recipe):
+        state = inspect(obj)
+        return any(state.attrs[name].history.has_changes() for name in TRACKED_RECIPE_ATTRIBUTES)
+    return False
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_recipe_changes(session, flush_context, instances):
+    """记录本次事务是否修改了食谱特征"""
+    created_or_deleted = itertools.chain(session.new, session.deleted)
+    if any(isinstance(obj, (Recipe, RecipeIngredient)) for obj in created_or_deleted) \
+            or any(_affects_features(obj) for obj in session.dirty):
+        session.info['recipe_features_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('recipe_features_changed', False):
+        invalidate_recipe_features()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('recipe_features_changed', None)
@@ -1,25 +1,56 @@
 """
 食谱推荐算法服务
 基于食材相似性和营养匹配度推荐食谱
+所有可推荐食谱的特征保存在食谱特征矩阵中，评分对全部候选食谱做向量化计算
 """
 
-import math
-from typing import List, Dict, Tuple, Set
+from typing import List, Dict, Tuple, Set, Iterable, Iterator
 from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime
+import heapq
+
+import numpy as np
+
 from app.models.ingredient_model import Ingredient, IngredientCategory
 from app.models.recipe_model import Recipe
 from app.models.recipe_ingredient_model import RecipeIngredient
-from app.models.pet_model import Pet
-from app.utils.nutrition_ratio_config import NutritionRatioService, NutritionProfile
+from app.utils.pet_nutrition_profile import PetNutritionProfile, get_pet_profile
+from app.utils.ingredient_catalog import IngredientCatalog
+from app.utils.recommendation_cache import recommendation_cache
+from app.utils.recipe_similarity_index import get_similarity_index
+from app.utils.recipe_similarity_service import RecipeSimilarityService
+from app.utils.recipe_feature_matrix import (
+    RecipeFeatureMatrix,
+    get_recipe_features,
+    recommendable_condition,
+    to_timestamp
+)
 from app.extensions import db
 
+# 推荐分数的最低阈值
+MIN_RECOMMENDATION_SCORE = 0.3
+
+# 社区热度的满分基准（基于网站整体数据的合理假设）
+POPULARITY_LIKES_FULL = 50       # 50个赞为满分
+POPULARITY_FAVORITES_FULL = 20   # 20个收藏为满分
+POPULARITY_USAGE_FULL = 10       # 10次使用为满分
+
+# 每批精确评分的食谱数
+SCORING_CHUNK_SIZE = 256
+
+# 分数上界的浮点误差余量（余弦相似度可能略大于1）
+SCORE_BOUND_TOLERANCE = 1e-9
+
+
+def _cosine_rows(matrix: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    """计算矩阵每一行与向量的余弦相似度，零向量的相似度为0"""
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+    return np.divide(matrix @ vector, norms, out=np.zeros(len(matrix)), where=norms > 0)
+
+
 class RecipeRecommendationService:
     """食谱推荐服务类"""
     
-    def __init__(self):
-        self.nutrition_service = NutritionRatioService()
-    
     def get_recommendations(self,
                         selected_ingredient_ids: List[int],
                         pet_id: int = None,
@@ -30,7 +61,7 @@ class RecipeRecommendationService:
         
         Args:
             selected_ingredient_ids: 用户选择的食材ID列表
-            pet_id: 宠物ID（用于获取过敏信息）
+            pet_id: 宠物ID（用于获取宠物营养画像和过敏食材）
             exclude_allergens: 需要排除的过敏食材ID列表
             limit: 返回推荐数量限制
             
@@ -38,87 +69,170 @@ class RecipeRecommendationService:
             推荐食谱列表
         """
         try:
-            # 获取宠物信息和过敏食材
-            pet = None
+            # 获取宠物营养画像和过敏食材
+            profile = get_pet_profile(pet_id) if pet_id else None
             allergen_ids = set(exclude_allergens or [])
+            if profile:
+                allergen_ids.update(profile.allergen_ids)
             
-            if pet_id:
-                pet = Pet.query.get(pet_id)
-                if pet and pet.special_needs:
-                    # 解析过敏食材（假设存储格式为 "过敏:食材ID1,食材ID2"）
-                    allergen_ids.update(self._extract_allergen_ids(pet.special_needs))
+            # 相同签名的请求直接返回缓存结果
+            cache_key = recommendation_cache.make_key(
+                selected_ingredient_ids, profile, allergen_ids, limit, IngredientCatalog.version()
+            )
+            cached = recommendation_cache.get(cache_key)
+            if cached is not None:
+                return cached
             
-            # 获取用户选择的食材信息
-            selected_ingredients = Ingredient.query.filter(
-                Ingredient.id.in_(selected_ingredient_ids)
-            ).all()
+            generation = recommendation_cache.generation
+            recommendations = self._compute_recommendations(selected_ingredient_ids, profile, allergen_ids, limit)
+            recommendation_cache.put(cache_key, recommendations, generation)
+            return recommendations
             
-            if not selected_ingredients:
+        except Exception as e:
+            print(f"推荐算法错误: {e}")
+            return []
+    
+    def _compute_recommendations(self, selected_ingredient_ids: List[int], profile: PetNutritionProfile,
+                                allergen_ids: Set[int], limit: int) -> List[Dict]:
+        """执行完整的推荐计算（不经过缓存）"""
+        # 获取用户选择的食材信息
+        selected_ingredients = list(IngredientCatalog.get_many(selected_ingredient_ids).values())
+        
+        if not selected_ingredients:
+            return []
+        
+        features = get_recipe_features()
+        if not len(features):
+            return []
+        
+        # 先对所有可推荐食谱计算廉价的评分项，再按分数上界分批精确评分（排除包含过敏食材的食谱）
+        candidates = ~features.rows_containing(allergen_ids)
+        counters = self._load_community_counters(features)
+        scores = self._calculate_recommendation_scores(features, counters, profile)
+        ranked_rows = self._iter_ranked_candidates(features, counters, scores, selected_ingredients, candidates)
+        
+        # ------------新增：确保推荐多样性------------
+        rows = self._ensure_recommendation_diversity(features, ranked_rows, limit)
+        
+        # 格式化返回结果
+        recommendations = self._load_recommendations(features, rows, scores)
+        return [self._format_recommendation(rec) for rec in recommendations]
+    
+    def get_similar_recipes(self, recipe_id: int, ingredient_ids: List[int], limit: int = 3) -> List[Dict]:
+        """
+        获取与指定食谱相似的公开食谱（不包含该食谱本身）
+        优先读取离线预计算的相似食谱表，尚未计算的食谱（如新发布、草稿）再查相似食谱索引；
+        similarity_score 为食材、分类、营养特征的加权余弦相似度
+        """
+        try:
+            matches = RecipeSimilarityService.get_neighbours(recipe_id, limit=limit)
+            if not matches:
+                matches = get_similarity_index().similar_to_recipe(recipe_id, ingredient_ids, limit=limit)
+            if not matches:
                 return []
             
-            # 获取候选食谱（排除包含过敏食材的食谱）
-            candidate_recipes = self._get_candidate_recipes(allergen_ids)
-            
-            # 计算推荐分数
-            recommendations = []
-            for recipe in candidate_recipes:
-                score_data = self._calculate_recommendation_score(
-                    recipe, selected_ingredients, pet
-                )
-                
-                if score_data['total_score'] > 0.3:  # 最低分数阈值
-                    recommendations.append({
-                        'recipe': recipe,
-                        'score_data': score_data,
-                        'total_score': score_data['total_score']
-                    })
-            
-            # ------------新增：确保推荐多样性------------
-            recommendations = self._ensure_recommendation_diversity(recommendations)
-            
-            # 按分数排序并限制数量
-            recommendations.sort(key=lambda x: x['total_score'], reverse=True)
-            recommendations = recommendations[:limit]
+            # 预计算结果可能包含之后下架的食谱，加载时再次过滤
+            recipe_ids = [match_id for match_id, _ in matches]
+            recipes = {
+                recipe.id: recipe
+                for recipe in Recipe.query.filter(Recipe.id.in_(recipe_ids), recommendable_condition()).all()
+            }
+            recipe_ingredients = self._prefetch_recipe_ingredients(recipe_ids)
             
-            # 格式化返回结果
-            return [self._format_recommendation(rec) for rec in recommendations]
+            similar_recipes = []
+            for match_id, similarity in matches:
+                recipe = recipes.get(match_id)
+                if recipe is None:
+                    continue
+                result = self._format_recipe_summary(recipe, recipe_ingredients.get(match_id, []))
+                result['similarity_score'] = round(similarity, 3)
+                similar_recipes.append(result)
+            return similar_recipes
             
         except Exception as e:
-            print(f"推荐算法错误: {e}")
+            print(f"相似食谱查找错误: {e}")
             return []
     
-    def _get_candidate_recipes(self, allergen_ids: Set[int]) -> List[Recipe]:
-        """获取候选食谱（排除过敏食材）- 优化查询性能"""
-        # ------------性能优化：使用联接加载减少数据库查询次数------------
-        query = db.session.query(Recipe).options(
-            db.joinedload(Recipe.ingredients).joinedload(RecipeIngredient.ingredient),
-            db.joinedload(Recipe.user)
-        ).filter(
-            Recipe.status == 'published',
-            Recipe.is_public == True,
-            Recipe.total_weight > 0  # 确保食谱有实际内容
-        )
+    def _load_community_counters(self, features: RecipeFeatureMatrix) -> Dict[str, np.ndarray]:
+        """一次查询加载所有可推荐食谱的社区计数（计数变化频繁，不缓存在特征矩阵中）"""
+        counters = {
+            name: np.zeros(len(features), dtype=np.float64)
+            for name in ('likes_count', 'favorites_count', 'usage_count')
+        }
+        rows = db.session.query(
+            Recipe.id, Recipe.likes_count, Recipe.favorites_count, Recipe.usage_count
+        ).filter(recommendable_condition()).all()
+        
+        for row in rows:
+            index = features.row_index.get(row.id)
+            if index is not None:
+                counters['likes_count'][index] = row.likes_count or 0
+                counters['favorites_count'][index] = row.favorites_count or 0
+                counters['usage_count'][index] = row.usage_count or 0
+        return counters
+    
+    def _load_recommendations(self, features: RecipeFeatureMatrix,
+                            rows: np.ndarray, scores: Dict[str, np.ndarray]) -> List[Dict]:
+        """加载最终入选食谱的完整信息（一次食谱查询 + 一次食材查询）"""
+        recipe_ids = [int(features.recipe_ids[row]) for row in rows]
+        if not recipe_ids:
+            return []
         
-        # 排除包含过敏食材的食谱
-        if allergen_ids:
-            subquery = db.session.query(RecipeIngredient.recipe_id).filter(
-                RecipeIngredient.ingredient_id.in_(allergen_ids)
-            ).subquery()
-            
-            query = query.filter(~Recipe.id.in_(subquery))
+        recipes = {recipe.id: recipe for recipe in Recipe.query.filter(Recipe.id.in_(recipe_ids)).all()}
+        recipe_ingredients = self._prefetch_recipe_ingredients(recipe_ids)
+        
+        recommendations = []
+        for row, recipe_id in zip(rows, recipe_ids):
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            score_data = {name: float(values[row]) for name, values in scores.items()}
+            recommendations.append({
+                'recipe': recipe,
+                'ingredients': recipe_ingredients.get(recipe_id, []),
+                'score_data': score_data,
+                'total_score': score_data['total_score']
+            })
+        return recommendations
+    
+    def _prefetch_recipe_ingredients(self, recipe_ids: List[int]) -> Dict[int, List[Tuple[object, float]]]:
+        """
+        一次查询加载多个食谱的食材，返回 {食谱ID: [(食材记录, 重量g), ...]}
+        食材记录来自食材目录缓存；已停用的食材再用一次批量查询补齐
+        """
+        if not recipe_ids:
+            return {}
+        
+        rows = db.session.query(
+            RecipeIngredient.recipe_id,
+            RecipeIngredient.ingredient_id,
+            RecipeIngredient.weight
+        ).filter(
+            RecipeIngredient.recipe_id.in_(recipe_ids)
+        ).order_by(RecipeIngredient.recipe_id, RecipeIngredient.id).all()
+        
+        records = IngredientCatalog.get_many({row.ingredient_id for row in rows})
+        missing_ids = {row.ingredient_id for row in rows} - set(records)
+        if missing_ids:
+            records.update({
+                ingredient.id: ingredient
+                for ingredient in Ingredient.query.filter(Ingredient.id.in_(missing_ids)).all()
+            })
         
-        # ------------性能优化：添加排序和限制，优先返回热门食谱------------
-        return query.order_by(
-            Recipe.likes_count.desc(), 
-            Recipe.created_at.desc()
-        ).limit(50).all()  # 限制候选数量以提高性能
+        recipe_ingredients = defaultdict(list)
+        for row in rows:
+            ingredient = records.get(row.ingredient_id)
+            if ingredient is not None:
+                recipe_ingredients[row.recipe_id].append((ingredient, row.weight or 0))
+        return recipe_ingredients
     
-    def _calculate_recommendation_score(self,
-                                    recipe: Recipe, 
-                                    selected_ingredients: List[Ingredient],
-                                    pet: Pet = None) -> Dict:
+    def _calculate_recommendation_scores(self,
+                                        features: RecipeFeatureMatrix,
+                                        counters: Dict[str, np.ndarray],
+                                        profile: PetNutritionProfile = None) -> Dict[str, np.ndarray]:
         """
-        计算推荐分数 - 改进版本
+        计算所有食谱的廉价评分项，每项分数都是长度为食谱数的数组
+        食材相似性和总分只在精确评分时按行填入（未评分的食谱为 NaN）
         
         权重分配：
         - 食材相似性：35%
@@ -127,26 +241,20 @@ class RecipeRecommendationService:
         - 社区热度：10% ------------新增------------
         - 时间因子：5% ------------新增------------
         """
-        # 1. 食材相似性分数 (35%)
-        ingredient_similarity = self._calculate_ingredient_similarity(
-            recipe, selected_ingredients
-        )
-        
         # 2. 营养匹配度分数 (30%)
-        nutrition_match = self._calculate_nutrition_match(recipe, pet)
+        nutrition_match = self._calculate_nutrition_match(features, profile)
         
         # 3. 宠物适用性分数 (20%)
-        pet_suitability = self._calculate_pet_suitability(recipe, pet)
+        pet_suitability = self._calculate_pet_suitability(features, profile)
         
         # ------------新增：4. 社区热度分数 (10%)------------
-        popularity_score = self._calculate_popularity_score(recipe)
+        popularity_score = self._calculate_popularity_score(counters)
         
         # ------------新增：5. 时间因子分数 (5%)------------
-        time_factor = self._calculate_time_factor(recipe)
+        time_factor = self._calculate_time_factor(features)
         
-        # 计算加权总分
-        total_score = (
-            ingredient_similarity * 0.35 +
+        # 除食材相似性外的加权分数
+        base_score = (
             nutrition_match * 0.30 +
             pet_suitability * 0.20 +
             popularity_score * 0.10 +  # ------------新增------------
@@ -154,423 +262,281 @@ class RecipeRecommendationService:
         )
         
         return {
-            'ingredient_similarity': ingredient_similarity,
+            'ingredient_similarity': np.full(len(features), np.nan),
             'nutrition_match': nutrition_match,
             'pet_suitability': pet_suitability,
             'popularity_score': popularity_score,  # ------------新增------------
             'time_factor': time_factor,            # ------------新增------------
-            'total_score': total_score
+            'base_score': base_score,
+            'total_score': np.full(len(features), np.nan)
         }
     
-    # ------------新增：计算社区热度分数------------
-    def _calculate_popularity_score(self, recipe: Recipe) -> float:
-        """计算社区热度分数"""
-        try:
-            # 权重设置
-            likes_weight = 0.4
-            favorites_weight = 0.4
-            usage_weight = 0.2
-            
-            # 获取收藏数（需要查询关联表）
-            from app.models.recipe_favorite_model import RecipeFavorite
-            favorites_count = RecipeFavorite.query.filter_by(recipe_id=recipe.id).count()
-            
-            # 标准化分数（基于网站整体数据的合理假设）
-            normalized_likes = min((recipe.likes_count or 0) / 50, 1.0)  # 假设50个赞为满分
-            normalized_favorites = min(favorites_count / 20, 1.0)        # 假设20个收藏为满分
-            normalized_usage = min((recipe.usage_count or 0) / 10, 1.0)  # 假设10次使用为满分
-            
-            popularity_score = (
-                normalized_likes * likes_weight +
-                normalized_favorites * favorites_weight +
-                normalized_usage * usage_weight
-            )
+    def _iter_ranked_candidates(self,
+                                features: RecipeFeatureMatrix,
+                                counters: Dict[str, np.ndarray],
+                                scores: Dict[str, np.ndarray],
+                                selected_ingredients: List[Ingredient],
+                                candidates: np.ndarray) -> Iterator[int]:
+        """
+        按最终排序（分数降序，同分时热门、较新的食谱优先）逐个产出候选食谱的行号
+        
+        食材相似性中的分类、营养余弦相似度需要对食谱特征做矩阵运算，是评分中最贵的部分。
+        这里先用直接匹配分数求出每个食谱总分的上界，按上界从高到低分批精确评分；
+        已评分食谱的分数高于剩余食谱的上界时即可产出。调用方取够结果后停止迭代，
+        上界不可能超过已选结果的食谱就不会被精确评分
+        """
+        selection = features.selection_vectors(selected_ingredients)
+        direct_match = self._calculate_direct_match(features, selection, len(selected_ingredients))
+        
+        # 分类、营养相似度不超过1，相似性上界为 min(直接匹配*0.5 + 0.5, 1)
+        similarity_bound = np.minimum(direct_match * 0.5 + 0.5, 1.0)
+        similarity_bound[features.ingredient_counts == 0] = 0.0
+        upper_bound = scores['base_score'] + similarity_bound * 0.35 + SCORE_BOUND_TOLERANCE
+        
+        rows = np.flatnonzero(candidates & (upper_bound > MIN_RECOMMENDATION_SCORE))
+        rows = rows[np.argsort(-upper_bound[rows], kind='stable')]
+        created_at = np.nan_to_num(features.created_at, nan=-np.inf)
+        
+        pending = []  # 已精确评分、等待产出的食谱：(-总分, -点赞数, -创建时间, 行号)
+        for start in range(0, len(rows), SCORING_CHUNK_SIZE):
+            chunk = rows[start:start + SCORING_CHUNK_SIZE]
+            similarity = self._calculate_ingredient_similarity(features, selection, direct_match[chunk], chunk)
+            total = scores['base_score'][chunk] + similarity * 0.35
+            scores['ingredient_similarity'][chunk] = similarity
+            scores['total_score'][chunk] = total
             
-            return popularity_score
+            for row, score in zip(chunk.tolist(), total.tolist()):
+                if score > MIN_RECOMMENDATION_SCORE:
+                    heapq.heappush(pending, (-score, -counters['likes_count'][row], -created_at[row], row))
             
-        except Exception as e:
-            print(f"计算热度分数错误: {e}")
-            return 0.0
+            # 分数严格高于剩余食谱上界的已评分食谱，顺序已经确定
+            next_start = start + SCORING_CHUNK_SIZE
+            remaining_bound = upper_bound[rows[next_start]] if next_start < len(rows) else -np.inf
+            while pending and -pending[0][0] > remaining_bound:
+                yield heapq.heappop(pending)[3]
+        
+        while pending:
+            yield heapq.heappop(pending)[3]
+    
+    # ------------新增：计算社区热度分数------------
+    def _calculate_popularity_score(self, counters: Dict[str, np.ndarray]) -> np.ndarray:
+        """计算社区热度分数"""
+        # 权重设置
+        likes_weight = 0.4
+        favorites_weight = 0.4
+        usage_weight = 0.2
+        
+        # 标准化分数
+        normalized_likes = np.minimum(counters['likes_count'] / POPULARITY_LIKES_FULL, 1.0)
+        normalized_favorites = np.minimum(counters['favorites_count'] / POPULARITY_FAVORITES_FULL, 1.0)
+        normalized_usage = np.minimum(counters['usage_count'] / POPULARITY_USAGE_FULL, 1.0)
+        
+        return (
+            normalized_likes * likes_weight +
+            normalized_favorites * favorites_weight +
+            normalized_usage * usage_weight
+        )
     
     # ------------新增：计算时间因子分数------------
-    def _calculate_time_factor(self, recipe: Recipe) -> float:
+    def _calculate_time_factor(self, features: RecipeFeatureMatrix) -> np.ndarray:
         """计算时间因子 - 新发布的食谱获得适当加权"""
-        try:
-            if not recipe.created_at:
-                return 0.0
-            
-            days_since_created = (datetime.utcnow() - recipe.created_at).days
-            
-            # 新食谱(7天内)获得加成，逐渐衰减
-            if days_since_created <= 7:
-                return 0.8 * (1 - days_since_created / 7)  # 最高80%加成，逐渐衰减到0
-            elif days_since_created <= 30:
-                # 一个月内的食谱获得较小加成
-                return 0.3 * (1 - (days_since_created - 7) / 23)
-            
-            return 0.0
-            
-        except Exception as e:
-            print(f"计算时间因子错误: {e}")
-            return 0.0
+        days_since_created = np.floor((to_timestamp(datetime.utcnow()) - features.created_at) / 86400)
+        
+        # 新食谱(7天内)获得加成，逐渐衰减；一个月内的食谱获得较小加成
+        time_factor = np.where(
+            days_since_created <= 7,
+            0.8 * (1 - days_since_created / 7),            # 最高80%加成，逐渐衰减到0
+            np.where(days_since_created <= 30, 0.3 * (1 - (days_since_created - 7) / 23), 0.0)
+        )
+        return np.nan_to_num(time_factor, nan=0.0)        # 没有创建时间的食谱为0
     
     # ------------新增：确保推荐多样性------------
-    def _ensure_recommendation_diversity(self, recommendations: List[Dict]) -> List[Dict]:
-        """确保推荐结果的多样性，避免推荐过于相似的食谱"""
-        if len(recommendations) <= 2:
-            return recommendations
-        
-        diverse_recommendations = [recommendations[0]]  # 保留最佳推荐
-        
-        for candidate in recommendations[1:]:
-            # 检查与已选推荐的相似度
-            is_diverse = True
-            for selected in diverse_recommendations:
-                similarity = self._calculate_recipe_ingredient_similarity(
-                    candidate['recipe'], selected['recipe']
-                )
-                if similarity > 0.8:  # 食材相似度过高，跳过
-                    is_diverse = False
-                    break
+    def _ensure_recommendation_diversity(self, features: RecipeFeatureMatrix,
+                                        ranked_rows: Iterable[int], limit: int) -> np.ndarray:
+        """
+        确保推荐结果的多样性，避免推荐过于相似的食谱（ranked_rows 按分数降序产出）
+        取够结果后立即停止消费候选
+        """
+        max_count = min(limit, 3)  # 限制推荐数量
+        seen_rows = []
+        diverse_rows = []
+        
+        for row in ranked_rows:
+            seen_rows.append(row)
+            # 检查与已选推荐的相似度（食材相似度过高则跳过），保留最佳推荐
+            if not diverse_rows or \
+                    self._calculate_recipe_ingredient_similarity(features, row, diverse_rows).max() <= 0.8:
+                diverse_rows.append(row)
             
-            if is_diverse:
-                diverse_recommendations.append(candidate)
-                
-            if len(diverse_recommendations) >= 3:  # 限制推荐数量
+            if len(diverse_rows) >= max_count:
                 break
+        else:
+            # 候选不超过2个时不做多样性过滤
+            if len(seen_rows) <= 2:
+                diverse_rows = seen_rows
         
-        return diverse_recommendations
+        return np.array(diverse_rows[:limit], dtype=np.intp)
     
-    # ------------新增：计算两个食谱之间的食材相似度------------
-    def _calculate_recipe_ingredient_similarity(self, recipe1: Recipe, recipe2: Recipe) -> float:
-        """计算两个食谱之间的食材相似度"""
-        try:
-            # 获取两个食谱的食材ID集合
-            ingredients1 = {ri.ingredient_id for ri in recipe1.ingredients}
-            ingredients2 = {ri.ingredient_id for ri in recipe2.ingredients}
-            
-            if not ingredients1 or not ingredients2:
-                return 0.0
-            
-            # 计算Jaccard相似度 (交集/并集)
-            intersection = len(ingredients1.intersection(ingredients2))
-            union = len(ingredients1.union(ingredients2))
-            
-            return intersection / union if union > 0 else 0.0
-            
-        except Exception as e:
-            print(f"计算食谱相似度错误: {e}")
-            return 0.0
+    # ------------新增：计算食谱之间的食材相似度------------
+    def _calculate_recipe_ingredient_similarity(self, features: RecipeFeatureMatrix,
+                                                row: int, other_rows: List[int]) -> np.ndarray:
+        """计算一个食谱与多个食谱之间的食材 Jaccard 相似度 (交集/并集)"""
+        base = features.incidence[row]
+        others = features.incidence[other_rows]
+        intersection = (others & base).sum(axis=1)
+        union = (others | base).sum(axis=1)
+        
+        similarity = np.divide(intersection, union, out=np.zeros(len(other_rows)), where=union > 0)
+        # 任一食谱没有食材时相似度为0
+        if not base.any():
+            similarity[:] = 0.0
+        similarity[features.ingredient_counts[other_rows] == 0] = 0.0
+        return similarity
     
-    def _calculate_ingredient_similarity(self, 
-                                    recipe: Recipe, 
-                                    selected_ingredients: List[Ingredient]) -> float:
-        """计算食材相似性分数"""
-        if not selected_ingredients:
-            return 0.0
-        
-        # 获取食谱中的食材
-        recipe_ingredients = [ri.ingredient for ri in recipe.ingredients]
-        
-        if not recipe_ingredients:
-            return 0.0
-        
-        # 1. 直接匹配分数（共同食材）
-        selected_ids = {ing.id for ing in selected_ingredients}
-        recipe_ids = {ing.id for ing in recipe_ingredients}
-        common_ingredients = selected_ids.intersection(recipe_ids)
+    def _calculate_direct_match(self, features: RecipeFeatureMatrix, selection, selected_count: int) -> np.ndarray:
+        """直接匹配分数（共同食材占所选食材的比例），只需读取关联矩阵的几列"""
+        if not selected_count:
+            return np.zeros(len(features))
+        columns = selection[0]
+        return features.incidence[:, columns].sum(axis=1) / selected_count
+    
+    def _calculate_ingredient_similarity(self,
+                                        features: RecipeFeatureMatrix,
+                                        selection,
+                                        direct_match_score: np.ndarray,
+                                        rows: np.ndarray) -> np.ndarray:
+        """计算指定食谱的食材相似性分数（selection 为 selection_vectors 的结果）"""
+        _, category_vector, nutrient_vector = selection
         
-        direct_match_score = len(common_ingredients) / len(selected_ids)
+        # 分类相似性分数（分类数量向量的余弦相似度）
+        category_similarity = _cosine_rows(features.categories[rows], category_vector)
         
-        # 2. 分类相似性分数
-        category_similarity = self._calculate_category_similarity(
-            selected_ingredients, recipe_ingredients
-        )
-        
-        # 3. 营养特征相似性
-        nutrition_similarity = self._calculate_nutrition_feature_similarity(
-            selected_ingredients, recipe_ingredients
-        )
+        # 营养特征相似性（平均营养特征的余弦相似度）
+        nutrition_similarity = _cosine_rows(features.nutrients[rows], nutrient_vector)
         
         # 综合相似性分数
-        similarity_score = (
+        similarity_score = np.minimum(
             direct_match_score * 0.5 +      # 直接匹配权重最高
             category_similarity * 0.3 +      # 分类相似性
-            nutrition_similarity * 0.2       # 营养特征相似性
+            nutrition_similarity * 0.2,      # 营养特征相似性
+            1.0
         )
         
-        return min(similarity_score, 1.0)
-    
-    def _calculate_category_similarity(self, 
-                                    selected_ingredients: List[Ingredient],
-                                    recipe_ingredients: List[Ingredient]) -> float:
-        """计算食材分类相似性"""
-        selected_categories = defaultdict(int)
-        recipe_categories = defaultdict(int)
-        
-        # 统计分类分布
-        for ing in selected_ingredients:
-            selected_categories[ing.category.value] += 1
-        
-        for ing in recipe_ingredients:
-            recipe_categories[ing.category.value] += 1
-        
-        # 计算分类向量的余弦相似度
-        all_categories = set(selected_categories.keys()) | set(recipe_categories.keys())
-        
-        if not all_categories:
-            return 0.0
-        
-        # 构建向量
-        selected_vector = [selected_categories[cat] for cat in all_categories]
-        recipe_vector = [recipe_categories[cat] for cat in all_categories]
-        
-        # 计算余弦相似度
-        return self._cosine_similarity(selected_vector, recipe_vector)
-    
-    def _calculate_nutrition_feature_similarity(self,
-                                            selected_ingredients: List[Ingredient],
-                                            recipe_ingredients: List[Ingredient]) -> float:
-        """计算营养特征相似性"""
-        # 计算选择食材的平均营养特征
-        selected_features = self._get_average_nutrition_features(selected_ingredients)
-        recipe_features = self._get_average_nutrition_features(recipe_ingredients)
-        
-        if not selected_features or not recipe_features:
-            return 0.0
-        
-        # 计算特征向量的余弦相似度
-        selected_vector = list(selected_features.values())
-        recipe_vector = list(recipe_features.values())
-        
-        return self._cosine_similarity(selected_vector, recipe_vector)
-    
-    def _get_average_nutrition_features(self, ingredients: List[Ingredient]) -> Dict:
-        """获取食材的平均营养特征"""
-        if not ingredients:
-            return {}
-        
-        total_features = {
-            'protein': 0.0,
-            'fat': 0.0,
-            'carbohydrate': 0.0,
-            'calories': 0.0,
-            'calcium': 0.0,
-            'phosphorus': 0.0
-        }
-        
-        for ing in ingredients:
-            total_features['protein'] += ing.protein or 0
-            total_features['fat'] += ing.fat or 0
-            total_features['carbohydrate'] += ing.carbohydrate or 0
-            total_features['calories'] += ing.calories or 0
-            total_features['calcium'] += ing.calcium or 0
-            total_features['phosphorus'] += ing.phosphorus or 0
-        
-        # 计算平均值
-        count = len(ingredients)
-        return {key: value / count for key, value in total_features.items()}
+        # 没有食材的食谱相似性为0
+        similarity_score[features.ingredient_counts[rows] == 0] = 0.0
+        return similarity_score
     
-    def _calculate_nutrition_match(self, recipe: Recipe, pet: Pet = None) -> float:
-        """计算营养匹配度分数"""
-        if not pet:
-            return 0.5  # 没有宠物信息时给予中等分数
-        
-        # 获取宠物的营养需求
-        pet_type = 'dog' if pet.species.lower() == 'dog' else 'cat'
-        
-        # 根据宠物信息选择合适的营养方案
-        suitable_profiles = self.nutrition_service.get_suitable_plans(
-            pet.species, pet.age, self._parse_special_needs(pet.special_needs)
-        )
-        
-        if not suitable_profiles:
-            return 0.5
-        
-        # 使用第一个推荐方案作为标准
-        target_plan = self.nutrition_service.get_plan(suitable_profiles[0])
-        if not target_plan:
-            return 0.5
-        
-        # 计算食谱营养比例
-        if recipe.total_weight <= 0:
-            return 0.0
-        
-        recipe_ratios = {
-            'protein_percent': (recipe.total_protein / recipe.total_weight) * 100,
-            'fat_percent': (recipe.total_fat / recipe.total_weight) * 100,
-            'carb_percent': (recipe.total_carbohydrate / recipe.total_weight) * 100
-        }
+    def _calculate_nutrition_match(self, features: RecipeFeatureMatrix,
+                                profile: PetNutritionProfile = None) -> np.ndarray:
+        """计算营养匹配度分数（目标范围来自宠物营养画像）"""
+        if not profile or not profile.plan:
+            return np.full(len(features), 0.5)  # 没有宠物信息或营养方案时给予中等分数
+        
+        # 计算食谱营养比例（可推荐食谱的总重量均大于0）
+        total_weight = features.profile['total_weight']
+        protein_percent = features.profile['total_protein'] / total_weight * 100
+        fat_percent = features.profile['total_fat'] / total_weight * 100
+        carb_percent = features.profile['total_carbohydrate'] / total_weight * 100
         
         # 计算与目标的匹配程度
-        target_nutrition = target_plan.nutrition_targets
-        
-        protein_match = self._calculate_range_match(
-            recipe_ratios['protein_percent'],
-            target_nutrition.protein_min,
-            target_nutrition.protein_max
-        )
-        
-        fat_match = self._calculate_range_match(
-            recipe_ratios['fat_percent'],
-            target_nutrition.fat_min,
-            target_nutrition.fat_max
-        )
-        
-        carb_match = 1.0 if recipe_ratios['carb_percent'] <= target_nutrition.carb_max else 0.5
+        protein_match = self._calculate_range_match(protein_percent, *profile.protein_range)
+        fat_match = self._calculate_range_match(fat_percent, *profile.fat_range)
+        carb_match = np.where(carb_percent <= profile.carb_max, 1.0, 0.5)
         
         # 综合营养匹配分数
-        nutrition_score = (protein_match + fat_match + carb_match) / 3
-        
-        return nutrition_score
+        return (protein_match + fat_match + carb_match) / 3
     
-    def _calculate_pet_suitability(self, recipe: Recipe, pet: Pet = None) -> float:
+    def _calculate_pet_suitability(self, features: RecipeFeatureMatrix,
+                                profile: PetNutritionProfile = None) -> np.ndarray:
         """计算宠物适用性分数"""
-        if not pet:
-            return 0.8  # 没有宠物信息时给予较高基础分数
+        if not profile:
+            return np.full(len(features), 0.8)  # 没有宠物信息时给予较高基础分数
         
-        suitability_score = 0.0
+        flags = features.flags
+        species = profile.species
+        suitability_score = np.zeros(len(features))
         
         # 基础适用性检查
-        if pet.species.lower() == 'dog' and recipe.suitable_for_dogs:
-            suitability_score += 0.4
-        elif pet.species.lower() == 'cat' and recipe.suitable_for_cats:
-            suitability_score += 0.4
+        if species == 'dog':
+            suitability_score += 0.4 * flags['suitable_for_dogs']
+        elif species == 'cat':
+            suitability_score += 0.4 * flags['suitable_for_cats']
         
         # 年龄适用性检查
-        if pet.age < 1:  # 幼体
-            if (pet.species.lower() == 'dog' and recipe.suitable_for_puppies) or \
-                (pet.species.lower() == 'cat' and recipe.suitable_for_kittens):
-                suitability_score += 0.3
-        elif pet.age >= 7:  # 老年
-            if recipe.suitable_for_seniors:
-                suitability_score += 0.3
+        if profile.is_young:  # 幼体
+            if species == 'dog':
+                suitability_score += 0.3 * flags['suitable_for_puppies']
+            elif species == 'cat':
+                suitability_score += 0.3 * flags['suitable_for_kittens']
+        elif profile.is_senior:  # 老年
+            suitability_score += 0.3 * flags['suitable_for_seniors']
         else:  # 成年
             suitability_score += 0.3
         
         # 特殊需求适用性
-        if pet.special_needs:
-            special_match = self._check_special_needs_match(recipe, pet.special_needs)
+        if profile.special_needs_text:
+            special_match = self._check_special_needs_match(features, profile.special_needs_text)
             suitability_score += special_match * 0.3
         else:
             suitability_score += 0.3
         
-        return min(suitability_score, 1.0)
+        return np.minimum(suitability_score, 1.0)
     
-    def _calculate_range_match(self, value: float, min_val: float, max_val: float) -> float:
+    def _calculate_range_match(self, values: np.ndarray, min_val: float, max_val: float) -> np.ndarray:
         """计算数值与目标范围的匹配程度"""
-        if min_val <= value <= max_val:
-            return 1.0  # 完全匹配
-        elif value < min_val:
-            # 低于最小值的惩罚
-            ratio = value / min_val if min_val > 0 else 0
-            return max(ratio, 0.0)
+        result = np.ones_like(values)  # 范围内完全匹配
+        
+        # 低于最小值的惩罚
+        below = values < min_val
+        result[below] = np.maximum(values[below] / min_val, 0.0) if min_val > 0 else 0.0
+        
+        # 高于最大值的惩罚
+        above = values > max_val
+        if max_val > 0:
+            excess_ratio = (values[above] - max_val) / max_val
+            result[above] = np.maximum(1.0 - excess_ratio * 0.5, 0.0)
         else:
-            # 高于最大值的惩罚
-            if max_val > 0:
-                excess_ratio = (value - max_val) / max_val
-                return max(1.0 - excess_ratio * 0.5, 0.0)
-            return 0.5
+            result[above] = 0.5
+        return result
     
-    def _check_special_needs_match(self, recipe: Recipe, special_needs: str) -> float:
+    def _check_special_needs_match(self, features: RecipeFeatureMatrix, special_needs: str) -> np.ndarray:
         """检查特殊需求匹配度"""
         if not special_needs:
-            return 1.0
+            return np.ones(len(features))
         
         needs = special_needs.lower()
-        match_score = 0.0
+        profile = features.profile
+        match_score = np.zeros(len(features))
+        
+        protein_percent = profile['total_protein'] / profile['total_weight'] * 100
         
         # 根据特殊需求检查食谱适用性
         if '减重' in needs or '肥胖' in needs:
             # 检查是否为低热量、高蛋白配方
-            if recipe.total_weight > 0:
-                calories_per_100g = (recipe.total_calories / recipe.total_weight) * 100
-                protein_percent = (recipe.total_protein / recipe.total_weight) * 100
-                
-                if calories_per_100g < 300 and protein_percent >= 20:
-                    match_score += 0.8
+            calories_per_100g = profile['total_calories'] / profile['total_weight'] * 100
+            match_score += 0.8 * ((calories_per_100g < 300) & (protein_percent >= 20))
         
         if '肾' in needs:
             # 检查是否为低蛋白、低磷配方
-            if recipe.total_weight > 0:
-                protein_percent = (recipe.total_protein / recipe.total_weight) * 100
-                if protein_percent < 20:
-                    match_score += 0.7
+            match_score += 0.7 * (protein_percent < 20)
         
         if '美毛' in needs:
             # 检查是否含有丰富的omega脂肪酸
-            if recipe.total_omega_3 > 0 or recipe.total_omega_6 > 0:
-                match_score += 0.8
-        
-        return min(match_score, 1.0) if match_score > 0 else 0.5
-    
-    def _cosine_similarity(self, vector1: List[float], vector2: List[float]) -> float:
-        """计算两个向量的余弦相似度"""
-        if len(vector1) != len(vector2):
-            return 0.0
-        
-        dot_product = sum(a * b for a, b in zip(vector1, vector2))
-        magnitude1 = math.sqrt(sum(a * a for a in vector1))
-        magnitude2 = math.sqrt(sum(b * b for b in vector2))
+            match_score += 0.8 * ((profile['total_omega_3'] > 0) | (profile['total_omega_6'] > 0))
         
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0.0
-        
-        return dot_product / (magnitude1 * magnitude2)
-    
-    def _extract_allergen_ids(self, special_needs: str) -> Set[int]:
-        """从特殊需求字符串中提取过敏食材ID"""
-        allergen_ids = set()
-        
-        if not special_needs:
-            return allergen_ids
-        
-        # 解析过敏信息（假设格式为 "过敏:海鲜,坚果" 或包含食材ID）
-        needs_lower = special_needs.lower()
-        
-        if '过敏' in needs_lower:
-            # 这里可以根据实际存储格式来解析
-            # 简单示例：查找已知过敏食材
-            allergen_keywords = {
-                '海鲜': ['三文鱼', '鳕鱼', '金枪鱼'],
-                '坚果': ['核桃', '杏仁'],
-                '乳制品': ['牛奶', '奶酪', '酸奶'],
-                '鸡蛋': ['鸡蛋'],
-                '牛肉': ['牛肉']
-            }
-            
-            for allergen_type, ingredient_names in allergen_keywords.items():
-                if allergen_type in needs_lower:
-                    # 查找对应的食材ID
-                    ingredients = Ingredient.query.filter(
-                        Ingredient.name.in_(ingredient_names)
-                    ).all()
-                    allergen_ids.update(ing.id for ing in ingredients)
-        
-        return allergen_ids
+        return np.where(match_score > 0, np.minimum(match_score, 1.0), 0.5)
     
-    def _parse_special_needs(self, special_needs: str) -> List[str]:
-        """解析特殊需求为列表"""
-        if not special_needs:
-            return []
-        
-        # 简单的解析逻辑，根据逗号分割
-        return [need.strip() for need in special_needs.split(',') if need.strip()]
-    
-    def _format_recommendation(self, recommendation: Dict) -> Dict:
-        """格式化推荐结果 - 增强版本"""
-        recipe = recommendation['recipe']
-        score_data = recommendation['score_data']
-        
-        # 获取食材信息
+    def _format_recipe_summary(self, recipe: Recipe, ingredients: List[Tuple[object, float]]) -> Dict:
+        """格式化食谱的基本信息、食材、营养比例和社区数据（推荐和相似食谱共用）"""
+        # 获取食材信息（已批量预取）
         ingredients_info = []
-        for ri in recipe.ingredients:
+        for ingredient, weight in ingredients:
             ingredients_info.append({
-                'id': ri.ingredient.id,
-                'name': ri.ingredient.name,
-                'category': ri.ingredient.category.value,
-                'weight': ri.weight,
-                'percentage': round((ri.weight / recipe.total_weight) * 100, 1) if recipe.total_weight > 0 else 0
+                'id': ingredient.id,
+                'name': ingredient.name,
+                'category': ingredient.category.value,
+                'weight': weight,
+                'percentage': round((weight / recipe.total_weight) * 100, 1) if recipe.total_weight > 0 else 0
             })
         
         # 计算营养比例
@@ -583,9 +549,6 @@ class RecipeRecommendationService:
                 'calories_per_100g': round((recipe.total_calories / recipe.total_weight) * 100, 1)
             }
         
-        # ------------增强：生成详细的推荐亮点------------
-        match_highlights = self._generate_detailed_match_highlights(score_data, recipe)
-        
         return {
             'recipe_id': recipe.id,
             'name': recipe.name,
@@ -594,6 +557,24 @@ class RecipeRecommendationService:
             'total_calories': recipe.total_calories,
             'ingredients': ingredients_info,
             'nutrition_ratios': nutrition_ratios,
+            # ------------新增：社区数据------------
+            'community_stats': {
+                'likes_count': recipe.likes_count or 0,
+                'usage_count': recipe.usage_count or 0,
+                'created_days_ago': (datetime.utcnow() - recipe.created_at).days if recipe.created_at else None
+            }
+        }
+    
+    def _format_recommendation(self, recommendation: Dict) -> Dict:
+        """格式化推荐结果 - 增强版本"""
+        recipe = recommendation['recipe']
+        score_data = recommendation['score_data']
+        
+        # ------------增强：生成详细的推荐亮点------------
+        match_highlights = self._generate_detailed_match_highlights(score_data, recipe)
+        
+        result = self._format_recipe_summary(recipe, recommendation['ingredients'])
+        result.update({
             'recommendation_score': round(recommendation['total_score'], 3),
             'score_breakdown': {
                 'ingredient_similarity': round(score_data['ingredient_similarity'], 3),
@@ -602,14 +583,9 @@ class RecipeRecommendationService:
                 'popularity_score': round(score_data.get('popularity_score', 0), 3),  # ------------新增------------
                 'time_factor': round(score_data.get('time_factor', 0), 3)             # ------------新增------------
             },
-            'match_highlights': match_highlights,  # ------------增强版本------------
-            # ------------新增：社区数据------------
-            'community_stats': {
-                'likes_count': recipe.likes_count or 0,
-                'usage_count': recipe.usage_count or 0,
-                'created_days_ago': (datetime.utcnow() - recipe.created_at).days if recipe.created_at else None
-            }
-        }
+            'match_highlights': match_highlights  # ------------增强版本------------
+        })
+        return result
     
     # ------------增强：生成详细的推荐亮点------------
     def _generate_detailed_match_highlights(self, score_data: Dict, recipe: Recipe) -> List[str]:
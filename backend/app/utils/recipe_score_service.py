@@ -0,0 +1,186 @@
+"""
+食谱营养评分服务
+营养评分 (nutrition_score) 和平衡评分 (balance_score) 的规则按列向量化实现：
+食谱的营养总量按 SCORE_FIELDS 排成矩阵，一次数组运算得到一批食谱的评分。
+保存食谱时对单个食谱评分，评分规则调整后由 rescore_recipes.py 按ID分批重新计算全部食谱，两者共用同一套规则
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, func, select
+
+from app.extensions import db
+from app.models.recipe_model import Recipe
+from app.models.recipe_ingredient_model import RecipeIngredient
+from app.utils.recommendation_cache import mark_recommendations_changed
+
+# 评分使用的食谱营养总量列
+SCORE_FIELDS = (
+    'total_weight', 'total_calories', 'total_protein', 'total_fat', 'total_carbohydrate',
+    'total_calcium', 'total_phosphorus', 'total_iron', 'total_zinc',
+    'total_vitamin_a', 'total_vitamin_d', 'total_vitamin_e', 'total_thiamine', 'total_riboflavin', 'total_niacin',
+    'total_omega_3', 'total_omega_6'
+)
+SCORE_INDEX: Dict[str, int] = {name: index for index, name in enumerate(SCORE_FIELDS)}
+
+VITAMIN_FIELDS = ('total_vitamin_a', 'total_vitamin_d', 'total_vitamin_e',
+                  'total_thiamine', 'total_riboflavin', 'total_niacin')
+
+# 重新计算时评分变化小于该值的食谱不写回
+SCORE_TOLERANCE = 1e-9
+
+
+def _columns(values: np.ndarray) -> Dict[str, np.ndarray]:
+    return {name: values[:, index] for name, index in SCORE_INDEX.items()}
+
+
+def _percent_of_weight(column: Dict[str, np.ndarray], name: str) -> np.ndarray:
+    weight = column['total_weight']
+    return column[name] / np.where(weight > 0, weight, 1.0) * 100
+
+
+def nutrition_scores(values: np.ndarray, ingredient_counts: np.ndarray) -> np.ndarray:
+    """营养评分 (0-100)：蛋白质30 + 脂肪20 + 钙磷比20 + 食材多样性15 + 营养密度15"""
+    column = _columns(values)
+    protein = _percent_of_weight(column, 'total_protein')
+    fat = _percent_of_weight(column, 'total_fat')
+    calories = _percent_of_weight(column, 'total_calories')
+    calcium, phosphorus = column['total_calcium'], column['total_phosphorus']
+    ca_p_ratio = calcium / np.where(phosphorus > 0, phosphorus, 1.0)
+
+    score = np.select(
+        [(18 <= protein) & (protein <= 35), ((15 <= protein) & (protein < 18)) | ((35 < protein) & (protein <= 40)),
+         protein >= 10],
+        [30, 20, 10], 0
+    ) + np.select(
+        [(5.5 <= fat) & (fat <= 20), ((4 <= fat) & (fat < 5.5)) | ((20 < fat) & (fat <= 25)), fat >= 2],
+        [20, 15, 10], 0
+    ) + np.where(phosphorus > 0, np.select(
+        [(1.0 <= ca_p_ratio) & (ca_p_ratio <= 2.0),
+         ((0.8 <= ca_p_ratio) & (ca_p_ratio < 1.0)) | ((2.0 < ca_p_ratio) & (ca_p_ratio <= 2.5)),
+         ca_p_ratio >= 0.5],
+        [20, 15, 10], 0
+    ), 0) + np.select(
+        [ingredient_counts >= 5, ingredient_counts >= 3, ingredient_counts >= 2],
+        [15, 10, 5], 0
+    ) + np.select(
+        [(250 <= calories) & (calories <= 400),
+         ((200 <= calories) & (calories < 250)) | ((400 < calories) & (calories <= 500)),
+         (150 <= calories) & (calories <= 600)],
+        [15, 10, 5], 0
+    )
+    return np.where(column['total_weight'] > 0, np.minimum(score, 100), 0).astype(np.float64)
+
+
+def balance_scores(values: np.ndarray) -> np.ndarray:
+    """平衡评分 (0-100)：宏量营养素40 + 矿物质30 + 维生素20 + 必需脂肪酸10"""
+    column = _columns(values)
+    protein = _percent_of_weight(column, 'total_protein')
+    fat = _percent_of_weight(column, 'total_fat')
+    carbohydrate = _percent_of_weight(column, 'total_carbohydrate')
+
+    # 理想比例：蛋白质20-30%, 脂肪10-15%, 碳水化合物5-15%
+    score = (np.maximum(0, 20 - np.abs(25 - protein)) / 20 * 15
+             + np.maximum(0, 10 - np.abs(12.5 - fat)) / 10 * 15
+             + np.maximum(0, 15 - np.abs(10 - carbohydrate)) / 15 * 10)
+
+    # 钙磷平衡和微量元素
+    calcium, phosphorus = column['total_calcium'], column['total_phosphorus']
+    has_minerals = (calcium > 0) & (phosphorus > 0)
+    ca_p_ratio = calcium / np.where(has_minerals, phosphorus, 1.0)
+    trace_elements = (column['total_iron'] > 0) & (column['total_zinc'] > 0)
+    score = score + np.where(has_minerals,
+                             np.minimum(np.maximum(0, 20 - np.abs(1.5 - ca_p_ratio) * 10), 20)
+                             + np.where(trace_elements, 10, 0), 0)
+
+    # 每种维生素3分，最多20分
+    vitamin_count = sum((column[name] > 0).astype(np.int64) for name in VITAMIN_FIELDS)
+    score = score + np.minimum(vitamin_count * 3, 20)
+
+    # 必需脂肪酸：omega-6/omega-3 理想比例约5:1到10:1
+    omega_3, omega_6 = column['total_omega_3'], column['total_omega_6']
+    has_omega = (omega_3 > 0) & (omega_6 > 0)
+    omega_ratio = omega_6 / np.where(has_omega, omega_3, 1.0)
+    score = score + np.where(has_omega, np.select(
+        [(5 <= omega_ratio) & (omega_ratio <= 10),
+         ((3 <= omega_ratio) & (omega_ratio < 5)) | ((10 < omega_ratio) & (omega_ratio <= 15)),
+         omega_ratio <= 20],
+        [10, 7, 5], 0
+    ), 0)
+
+    return np.where(column['total_weight'] > 0, np.minimum(score, 100), 0).astype(np.float64)
+
+
+class RecipeScoreService:
+    """食谱评分服务类（rescore_chunk 只写入当前会话，不负责提交）"""
+
+    DEFAULT_CHUNK_SIZE = 5000
+
+    @staticmethod
+    def score(recipe) -> Tuple[float, float]:
+        """单个食谱的 (营养评分, 平衡评分)"""
+        values = np.array([[getattr(recipe, name) or 0.0 for name in SCORE_FIELDS]], dtype=np.float64)
+        counts = np.array([len(recipe.ingredients)])
+        return float(nutrition_scores(values, counts)[0]), float(balance_scores(values)[0])
+
+    @staticmethod
+    def count_recipes(after_id: int = 0) -> int:
+        """ID 大于 after_id 的食谱数"""
+        return db.session.execute(select(func.count(Recipe.id)).where(Recipe.id > after_id)).scalar()
+
+    @staticmethod
+    def rescore_chunk(after_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[int, int, int]:
+        """
+        按ID顺序重新计算 after_id 之后的一批食谱评分，只写回评分有变化的食谱
+        返回 (本批最后一个食谱ID, 处理数, 更新数)；没有剩余食谱时处理数为 0
+        """
+        fields = [getattr(Recipe, name) for name in SCORE_FIELDS]
+        rows = db.session.execute(
+            select(Recipe.id, Recipe.nutrition_score, Recipe.balance_score, *fields)
+            .where(Recipe.id > after_id).order_by(Recipe.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            return after_id, 0, 0
+
+        data = np.array(rows, dtype=np.float64)      # NULL 评分转为 NaN，必然写回
+        recipe_ids = data[:, 0].astype(np.int64)
+        first_id, last_id = int(recipe_ids[0]), int(recipe_ids[-1])
+        values = np.nan_to_num(data[:, 3:])
+
+        # 食材数：按ID范围一次分组计数
+        count_rows = db.session.execute(
+            select(RecipeIngredient.recipe_id, func.count())
+            .where(RecipeIngredient.recipe_id.between(first_id, last_id))
+            .group_by(RecipeIngredient.recipe_id)
+        ).all()
+        ingredient_counts = np.zeros(len(recipe_ids), dtype=np.int64)
+        if count_rows:
+            counted = np.array(count_rows, dtype=np.int64)
+            positions = np.searchsorted(recipe_ids, counted[:, 0])
+            positions = np.minimum(positions, len(recipe_ids) - 1)
+            matched = recipe_ids[positions] == counted[:, 0]
+            ingredient_counts[positions[matched]] = counted[matched, 1]
+
+        nutrition = nutrition_scores(values, ingredient_counts)
+        balance = balance_scores(values)
+        changed = ~(np.isclose(nutrition, data[:, 1], rtol=0, atol=SCORE_TOLERANCE)
+                    & np.isclose(balance, data[:, 2], rtol=0, atol=SCORE_TOLERANCE))
+
+        if changed.any():
+            table = Recipe.__table__
+            # 评分是派生数据，保留 updated_at 不触发 onupdate
+            statement = table.update().where(table.c.id == bindparam('b_id')).values(
+                nutrition_score=bindparam('b_nutrition'),
+                balance_score=bindparam('b_balance'),
+                updated_at=table.c.updated_at
+            )
+            db.session.execute(statement, [
+                {'b_id': recipe_id, 'b_nutrition': nutrition_score, 'b_balance': balance_score}
+                for recipe_id, nutrition_score, balance_score in zip(
+                    recipe_ids[changed].tolist(), nutrition[changed].tolist(), balance[changed].tolist()
+                )
+            ])
+            mark_recommendations_changed(db.session)
+
+        return last_id, len(rows), int(changed.sum())
@@ -0,0 +1,146 @@
+"""
+社区食谱全文检索（SQLite FTS5）
+recipes_fts 虚拟表收录所有公开、已发布、未删除的食谱（rowid 即食谱ID），
+索引字段：名称、描述、标签、作者昵称/用户名。
+由 recipes / users 表上的触发器保持同步，发布、取消发布、编辑、删除都会自动更新。
+SQLite 未编译 FTS5 时 FTS_AVAILABLE 为 False，调用方回退到 LIKE 查询。
+unicode61 分词器不切分中日韩文字（整段连续汉字是一个词），含这类文字的查询也回退到 LIKE 子串匹配
+"""
+
+import re
+
+from sqlalchemy import func, literal_column, select, table, column, text
+from sqlalchemy.exc import OperationalError
+
+from app.extensions import db
+
+# 是否可用（在 ensure_index 中检测）
+FTS_AVAILABLE = False
+
+# BM25 字段权重，顺序同 FTS 表的列 (名称, 描述, 标签, 作者)：名称 > 标签 > 作者 > 描述
+BM25_WEIGHTS = (10.0, 1.0, 3.0, 2.0)
+
+# 中日韩文字（含日文假名、韩文音节）
+_CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+# 仅用于构造查询的轻量表对象（不注册到 metadata，避免 create_all 建成普通表）
+recipes_fts = table('recipes_fts', column('rowid'), column('name'), column('description'),
+                    column('tags'), column('author'))
+
+# 可被检索的食谱条件（Enum 列存储的是枚举名）
+_VISIBLE_CONDITION = "{row}.is_public = 1 AND {row}.status = 'PUBLISHED' AND {row}.is_active = 1"
+
+_AUTHOR_EXPRESSION = (
+    "(SELECT COALESCE(u.nickname, '') || ' ' || COALESCE(u.username, '') "
+    "FROM users u WHERE u.id = {row}.user_id)"
+)
+
+_SETUP_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+        name, description, tags, author,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_after_insert AFTER INSERT ON recipes
+    WHEN {_VISIBLE_CONDITION.format(row='new')}
+    BEGIN
+        INSERT INTO recipes_fts(rowid, name, description, tags, author)
+        VALUES (new.id, new.name, new.description, new.tags, {_AUTHOR_EXPRESSION.format(row='new')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_after_update
+    AFTER UPDATE OF name, description, tags, user_id, is_public, status, is_active ON recipes
+    BEGIN
+        DELETE FROM recipes_fts WHERE rowid = old.id;
+        INSERT INTO recipes_fts(rowid, name, description, tags, author)
+        SELECT new.id, new.name, new.description, new.tags, {_AUTHOR_EXPRESSION.format(row='new')}
+        WHERE {_VISIBLE_CONDITION.format(row='new')};
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_after_delete AFTER DELETE ON recipes
+    BEGIN
+        DELETE FROM recipes_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_author_update
+    AFTER UPDATE OF username, nickname ON users
+    BEGIN
+        UPDATE recipes_fts
+        SET author = COALESCE(new.nickname, '') || ' ' || COALESCE(new.username, '')
+        WHERE rowid IN (SELECT id FROM recipes WHERE user_id = new.id);
+    END
+    """,
+]
+
+_REBUILD_STATEMENTS = [
+    "DELETE FROM recipes_fts",
+    f"""
+    INSERT INTO recipes_fts(rowid, name, description, tags, author)
+    SELECT r.id, r.name, r.description, r.tags, {_AUTHOR_EXPRESSION.format(row='r')}
+    FROM recipes r
+    WHERE {_VISIBLE_CONDITION.format(row='r')}
+    """,
+]
+
+
+def ensure_index(rebuild: bool = False) -> bool:
+    """
+    创建 FTS 表和同步触发器（幂等），首次创建时从 recipes 表回填
+    需要应用上下文；返回 FTS5 是否可用
+    """
+    global FTS_AVAILABLE
+
+    try:
+        with db.engine.begin() as connection:
+            existed = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes_fts'"
+            )).first() is not None
+
+            for statement in _SETUP_STATEMENTS:
+                connection.execute(text(statement))
+
+            if rebuild or not existed:
+                for statement in _REBUILD_STATEMENTS:
+                    connection.execute(text(statement))
+                print("食谱全文索引已重建")
+
+        FTS_AVAILABLE = True
+    except OperationalError as e:
+        print(f"⚠️ FTS5 不可用，社区搜索回退到 LIKE 查询: {e}")
+        FTS_AVAILABLE = False
+
+    return FTS_AVAILABLE
+
+
+def build_match_expression(search: str) -> str:
+    """
+    将用户输入转换为安全的 FTS5 查询：每个词加引号并做前缀匹配，词之间为 AND
+    例如 'chicken rice' -> '"chicken"* "rice"*'
+    含中日韩文字时返回空串（分词器无法切分，由调用方回退到 LIKE）
+    """
+    if _CJK_PATTERN.search(search or ''):
+        return ''
+    tokens = re.findall(r'\w+', search or '', flags=re.UNICODE)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def match_subquery(match_expression: str):
+    """返回 (recipe_id, rank) 子查询，rank 为 BM25 分数（越小越相关）"""
+    fts_ref = literal_column('recipes_fts')
+    return select(
+        recipes_fts.c.rowid.label('recipe_id'),
+        func.bm25(fts_ref, *BM25_WEIGHTS).label('rank')
+    ).where(fts_ref.op('MATCH')(match_expression)).subquery('fts_match')
+
+
+def count_matches(match_expression: str) -> int:
+    """统计命中数量（只访问 FTS 索引）"""
+    fts_ref = literal_column('recipes_fts')
+    return db.session.execute(
+        select(func.count()).select_from(recipes_fts).where(fts_ref.op('MATCH')(match_expression))
+    ).scalar() or 0
@@ -0,0 +1,246 @@
+"""
+相似食谱索引（随机投影 LSH）
+每个可推荐食谱表示为一个单位嵌入向量，由三部分按推荐算法的权重拼接：
+食材关联(0.5) + 食材分类分布(0.3) + 平均营养特征(0.2)，各部分先单独归一化，
+因此两个嵌入的点积就是三项余弦相似度的加权和。
+查询时先用多张随机超平面哈希表取得候选，再对候选精确计算点积排序；
+候选不足时回退到全量扫描，保证覆盖所有公开食谱。
+食谱特征矩阵重建后，索引按食谱ID与上一份特征矩阵比对，只对新增、修改、下架的食谱
+重新计算嵌入并在哈希桶中增删；食材目录变化或变化的食谱过多时才整体重建
+"""
+
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.utils.recipe_feature_matrix import RecipeFeatureMatrix, get_recipe_features
+
+# 嵌入各部分的权重（与食材相似性评分一致）
+EMBEDDING_WEIGHTS = (0.5, 0.3, 0.2)
+
+# LSH 参数：NUM_TABLES 张哈希表，每张 NUM_BITS 个超平面
+NUM_TABLES = 16
+NUM_BITS = 10
+RANDOM_SEED = 20240601
+
+# 变化的食谱超过该比例时整体重建（比逐行增删更快）
+REBUILD_FRACTION = 0.25
+
+_EMPTY_BUCKET = np.empty(0, dtype=np.intp)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """按行做 L2 归一化（零向量保持为0）"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class RecipeSimilarityIndex:
+    """
+    相似食谱 LSH 索引
+    行号是索引内部的槽位：下架的食谱留下空槽（嵌入置零、不在任何桶中），新食谱追加到末尾。
+    查询不加锁，更新时先写数组再写桶，查询时先读桶再读数组，保证桶中的行号都在数组范围内
+    """
+
+    def __init__(self, features: RecipeFeatureMatrix):
+        self.features = features      # 最近同步的特征矩阵（食材级数据用于计算任意食材列表的嵌入）
+
+        # 营养特征量纲不同（热量远大于钙磷），先按全库最大值缩放到 [0, 1]
+        scale = features.nutrients.max(axis=0) if len(features) else np.ones(features.nutrients.shape[1])
+        self.nutrient_scale = np.where(scale > 0, scale, 1.0)
+
+        self.embeddings = self._embed(
+            features.incidence.astype(np.float64), features.categories, features.nutrients
+        )
+        self.recipe_ids = np.array(features.recipe_ids, dtype=np.int64)
+        self.row_index: Dict[int, int] = dict(features.row_index)
+
+        rng = np.random.default_rng(RANDOM_SEED)
+        self.hyperplanes = rng.standard_normal((NUM_TABLES, self.embeddings.shape[1], NUM_BITS))
+        self.bit_weights = 1 << np.arange(NUM_BITS, dtype=np.int64)
+
+        self.keys = self._hash(self.embeddings)     # shape: (哈希表数, 槽位数)，删除时据此找到所在的桶
+        self.tables: List[Dict[int, np.ndarray]] = []
+        for keys in self.keys:
+            buckets: Dict[int, List[int]] = {}
+            for row, key in enumerate(keys.tolist()):
+                buckets.setdefault(key, []).append(row)
+            self.tables.append({key: np.array(rows, dtype=np.intp) for key, rows in buckets.items()})
+
+    def __len__(self):
+        return len(self.row_index)
+
+    def _embed(self, incidence: np.ndarray, categories: np.ndarray, nutrients: np.ndarray) -> np.ndarray:
+        """生成单位嵌入向量（支持一维或二维输入）"""
+        parts = (incidence, categories, nutrients / self.nutrient_scale)
+        parts = [_normalize_rows(np.atleast_2d(part)) * np.sqrt(weight)
+                for part, weight in zip(parts, EMBEDDING_WEIGHTS)]
+        return np.hstack(parts)
+
+    def _hash(self, embeddings: np.ndarray) -> np.ndarray:
+        """计算每张哈希表的桶编号，shape: (哈希表数, 向量数)"""
+        bits = np.einsum('nd,tdb->tnb', embeddings, self.hyperplanes) > 0
+        return bits @ self.bit_weights
+
+    def embed_ingredients(self, ingredient_ids) -> np.ndarray:
+        """按食材列表生成嵌入（用于不在索引中的食谱）"""
+        incidence, categories, nutrients = self.features.features_for_ingredients(ingredient_ids)
+        return self._embed(incidence.astype(np.float64), categories, nutrients)[0]
+
+    # ------------ 增量更新 ------------
+
+    def sync(self, features: RecipeFeatureMatrix) -> bool:
+        """
+        与新的特征矩阵同步：只处理新增、修改和下架的食谱
+        食材列变化或变化的食谱过多时返回 False，由调用方整体重建
+        """
+        previous = self.features
+        if features is previous:
+            return True
+        if features.ingredient_ids != previous.ingredient_ids:
+            return False
+
+        # 两份特征矩阵都按食谱ID排序，按ID对齐后逐行比较
+        _, old_rows, new_rows = np.intersect1d(previous.recipe_ids, features.recipe_ids,
+                                               assume_unique=True, return_indices=True)
+        modified = (
+            (previous.incidence[old_rows] != features.incidence[new_rows]).any(axis=1)
+            | (previous.categories[old_rows] != features.categories[new_rows]).any(axis=1)
+            | (previous.nutrients[old_rows] != features.nutrients[new_rows]).any(axis=1)
+        )
+        added = np.setdiff1d(np.arange(len(features)), new_rows, assume_unique=True)
+        upserted = np.concatenate([new_rows[modified], added]).astype(np.intp)
+        removed_ids = np.setdiff1d(previous.recipe_ids, features.recipe_ids, assume_unique=True)
+
+        if len(upserted) + len(removed_ids) > REBUILD_FRACTION * max(len(features), 1):
+            return False
+
+        for recipe_id in removed_ids.tolist():
+            self.remove(recipe_id)
+        if len(upserted):
+            embeddings = self._embed(features.incidence[upserted].astype(np.float64),
+                                     features.categories[upserted], features.nutrients[upserted])
+            self._upsert_rows(features.recipe_ids[upserted].tolist(), embeddings)
+
+        self.features = features
+        return True
+
+    def remove(self, recipe_id: int):
+        """从索引中删除食谱（留下空槽）"""
+        row = self.row_index.pop(recipe_id, None)
+        if row is None:
+            return
+        self._remove_from_buckets(row)
+        self.embeddings[row] = 0.0
+        self.recipe_ids[row] = -1
+
+    def _upsert_rows(self, recipe_ids: List[int], embeddings: np.ndarray):
+        """写入一批食谱的嵌入：已有的食谱原地更新并换桶，新食谱追加到末尾"""
+        rows = []
+        for recipe_id in recipe_ids:
+            row = self.row_index.get(recipe_id)
+            if row is not None:
+                self._remove_from_buckets(row)
+            rows.append(row)
+
+        appended = sum(row is None for row in rows)
+        if appended:
+            self._grow(appended)
+        next_row = len(self.recipe_ids) - appended
+        for position, row in enumerate(rows):
+            if row is None:
+                rows[position] = next_row
+                next_row += 1
+
+        rows = np.array(rows, dtype=np.intp)
+        keys = self._hash(embeddings)
+        self.embeddings[rows] = embeddings
+        self.recipe_ids[rows] = recipe_ids
+        self.keys[:, rows] = keys
+        for recipe_id, row in zip(recipe_ids, rows.tolist()):
+            self.row_index[recipe_id] = row
+        for table, table_keys in zip(self.tables, keys.tolist()):
+            for row, key in zip(rows.tolist(), table_keys):
+                table[key] = np.append(table.get(key, _EMPTY_BUCKET), row)
+
+    def _grow(self, count: int):
+        """追加 count 个空槽"""
+        self.embeddings = np.vstack([self.embeddings, np.zeros((count, self.embeddings.shape[1]))])
+        self.recipe_ids = np.concatenate([self.recipe_ids, np.full(count, -1, dtype=np.int64)])
+        self.keys = np.hstack([self.keys, np.zeros((NUM_TABLES, count), dtype=self.keys.dtype)])
+
+    def _remove_from_buckets(self, row: int):
+        for table, key in zip(self.tables, self.keys[:, row].tolist()):
+            bucket = table.get(key)
+            if bucket is None:
+                continue
+            bucket = bucket[bucket != row]
+            if len(bucket):
+                table[key] = bucket
+            else:
+                del table[key]
+
+    # ------------ 查询 ------------
+
+    def query(self, embedding: np.ndarray, limit: int = 3, exclude_ids=()) -> List[Tuple[int, float]]:
+        """
+        查找最相似的食谱，返回 [(食谱ID, 相似度), ...]（相似度降序，相同时按行号）
+        exclude_ids 中的食谱不会出现在结果中
+        """
+        if not len(self) or not embedding.any() or limit <= 0:
+            return []
+
+        keys = self._hash(embedding[None, :])[:, 0]
+        buckets = [table.get(key) for table, key in zip(self.tables, keys.tolist())]
+        embeddings, recipe_ids = self.embeddings, self.recipe_ids
+
+        exclude_rows = [self.row_index[recipe_id] for recipe_id in exclude_ids if recipe_id in self.row_index]
+        candidates = np.zeros(len(recipe_ids), dtype=bool)
+        for bucket in buckets:
+            if bucket is not None:
+                candidates[bucket] = True
+        candidates[exclude_rows] = False
+        candidates &= recipe_ids >= 0      # 并发删除时桶中可能短暂残留空槽
+        rows = np.flatnonzero(candidates)
+
+        if len(rows) < limit:
+            # 桶内候选不足，回退到全量扫描
+            candidates = recipe_ids >= 0
+            candidates[exclude_rows] = False
+            rows = np.flatnonzero(candidates)
+
+        similarity = embeddings[rows] @ embedding
+        if len(rows) > limit:
+            # 先取出不低于第 limit 大分数的候选（含并列），再精确排序
+            threshold = np.partition(similarity, len(rows) - limit)[len(rows) - limit]
+            keep = np.flatnonzero(similarity >= threshold)
+            rows, similarity = rows[keep], similarity[keep]
+        top = np.lexsort((rows, -similarity))[:limit]
+        return [(int(recipe_ids[rows[i]]), float(similarity[i])) for i in top]
+
+    def similar_to_recipe(self, recipe_id: int, ingredient_ids, limit: int = 3) -> List[Tuple[int, float]]:
+        """查找与指定食谱相似的其他食谱（食谱不在索引中时按其食材计算嵌入）"""
+        row = self.row_index.get(recipe_id)
+        embedding = self.embeddings[row] if row is not None else self.embed_ingredients(ingredient_ids)
+        return self.query(embedding, limit=limit, exclude_ids=(recipe_id,))
+
+
+# ------------ 进程内缓存：随食谱特征矩阵增量同步 ------------
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_similarity_index() -> RecipeSimilarityIndex:
+    """获取当前的相似食谱索引（需要应用上下文）"""
+    global _index
+
+    features = get_recipe_features()
+    index = _index
+    if index is not None and index.features is features:
+        return index
+
+    with _index_lock:
+        if _index is None or not _index.sync(features):
+            _index = RecipeSimilarityIndex(features)
+        return _index
@@ -0,0 +1,199 @@
+"""
+食谱相似度离线计算服务
+为每个可推荐食谱预计算 Top-K 相似食谱并写入 recipe_similarities 表。
+增量运行时只重新计算：上次运行后修改过的食谱、相似列表中含有已变化/已下架食谱的食谱，
+以及与变化食谱的相似度足以进入其 Top-K 的食谱。
+没有任何相似食谱的食谱写入一条指向自身、rank 为 0 的标记行，记录计算时间，增量运行时不会被当作新食谱。
+在线读取只需一次按 (recipe_id, rank) 索引的查询
+"""
+
+from datetime import datetime
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.models.recipe_model import Recipe
+from app.models.recipe_similarity_model import RecipeSimilarity
+from app.utils.recipe_feature_matrix import get_recipe_features, recommendable_condition
+from app.utils.recipe_similarity_index import RecipeSimilarityIndex
+
+
+class RecipeSimilarityService:
+    """食谱相似度服务类（refresh 只写入当前会话，不负责提交）"""
+
+    DEFAULT_TOP_K = 10
+    CHUNK_SIZE = 512          # 每批计算的食谱数（控制相似度矩阵的内存占用）
+    DELETE_BATCH_SIZE = 500   # 每条 DELETE 语句的ID数量（低于 SQLite 变量上限）
+    MARKER_RANK = 0           # 无相似食谱时标记行的排名
+
+    @staticmethod
+    def get_neighbours(recipe_id: int, limit: int = 3) -> List[Tuple[int, float]]:
+        """读取预计算的相似食谱，返回 [(食谱ID, 相似度), ...]"""
+        rows = db.session.query(
+            RecipeSimilarity.similar_recipe_id, RecipeSimilarity.similarity
+        ).filter(
+            RecipeSimilarity.recipe_id == recipe_id,
+            RecipeSimilarity.rank > RecipeSimilarityService.MARKER_RANK
+        ).order_by(RecipeSimilarity.rank).limit(limit).all()
+        return [(row.similar_recipe_id, row.similarity) for row in rows]
+
+    @staticmethod
+    def refresh(full: bool = False, top_k: int = DEFAULT_TOP_K) -> Dict[str, int]:
+        """
+        重新计算相似食谱表
+        full=True 时重新计算全部食谱；返回本次运行的统计信息
+        """
+        started_at = datetime.utcnow()
+        # 离线任务使用按当前特征矩阵完整构建的索引（行号与特征矩阵一致）
+        features = get_recipe_features()
+        index = RecipeSimilarityIndex(features)
+        recipe_ids = features.recipe_ids.tolist()
+        max_neighbours = min(top_k, max(len(recipe_ids) - 1, 0))
+
+        existing = RecipeSimilarityService._load_existing()
+        removed = set(existing) - set(features.row_index)
+
+        if full:
+            recompute = set(recipe_ids)
+        else:
+            changed = RecipeSimilarityService._find_changed(existing)
+            recompute = changed | RecipeSimilarityService._find_affected(
+                index, existing, changed, removed, max_neighbours
+            )
+
+        # 重新计算 Top-K
+        rows = sorted(features.row_index[recipe_id] for recipe_id in recompute)
+        records = []
+        for start in range(0, len(rows), RecipeSimilarityService.CHUNK_SIZE):
+            chunk = np.array(rows[start:start + RecipeSimilarityService.CHUNK_SIZE], dtype=np.intp)
+            records.extend(RecipeSimilarityService._top_k_records(index, chunk, max_neighbours, started_at))
+
+        # 没有相似食谱的食谱写入标记行
+        with_neighbours = {record['recipe_id'] for record in records}
+        records.extend({
+            'recipe_id': recipe_id,
+            'similar_recipe_id': recipe_id,
+            'rank': RecipeSimilarityService.MARKER_RANK,
+            'similarity': 0.0,
+            'computed_at': started_at
+        } for recipe_id in sorted(recompute - with_neighbours))
+
+        # 替换受影响食谱的相似列表
+        stale_ids = sorted(recompute | removed)
+        for start in range(0, len(stale_ids), RecipeSimilarityService.DELETE_BATCH_SIZE):
+            batch = stale_ids[start:start + RecipeSimilarityService.DELETE_BATCH_SIZE]
+            RecipeSimilarity.query.filter(
+                RecipeSimilarity.recipe_id.in_(batch)
+            ).delete(synchronize_session=False)
+        if records:
+            db.session.execute(insert(RecipeSimilarity), records)
+
+        return {
+            'recipes': len(recipe_ids),
+            'recomputed': len(recompute),
+            'removed': len(removed),
+            'rows_written': len(records)
+        }
+
+    # ------------ 内部方法 ------------
+
+    @staticmethod
+    def _load_existing() -> Dict[int, Dict]:
+        """
+        读取已有的相似列表：{食谱ID: {'neighbours': [(ID, 相似度)...], 'computed_at': 时间}}
+        只有标记行的食谱 neighbours 为空
+        """
+        existing = {}
+        rows = db.session.query(
+            RecipeSimilarity.recipe_id,
+            RecipeSimilarity.similar_recipe_id,
+            RecipeSimilarity.rank,
+            RecipeSimilarity.similarity,
+            RecipeSimilarity.computed_at
+        ).order_by(RecipeSimilarity.recipe_id, RecipeSimilarity.rank).all()
+
+        for row in rows:
+            entry = existing.setdefault(row.recipe_id, {'neighbours': [], 'computed_at': row.computed_at})
+            if row.rank != RecipeSimilarityService.MARKER_RANK:
+                entry['neighbours'].append((row.similar_recipe_id, row.similarity))
+            if row.computed_at and (entry['computed_at'] is None or row.computed_at < entry['computed_at']):
+                entry['computed_at'] = row.computed_at
+        return existing
+
+    @staticmethod
+    def _find_changed(existing: Dict[int, Dict]) -> Set[int]:
+        """上次计算后新增或修改过的可推荐食谱"""
+        changed = set()
+        rows = db.session.query(Recipe.id, Recipe.updated_at).filter(recommendable_condition()).all()
+        for row in rows:
+            entry = existing.get(row.id)
+            if entry is None or entry['computed_at'] is None or \
+                    (row.updated_at is not None and row.updated_at > entry['computed_at']):
+                changed.add(row.id)
+        return changed
+
+    @staticmethod
+    def _find_affected(index: RecipeSimilarityIndex, existing: Dict[int, Dict], changed: Set[int],
+                    removed: Set[int], max_neighbours: int) -> Set[int]:
+        """相似列表受 changed / removed 影响的其他食谱"""
+        features = index.features
+        touched = changed | removed
+        affected = set()
+
+        # 1. 相似列表中含有已变化或已下架的食谱
+        for recipe_id, entry in existing.items():
+            if recipe_id in features.row_index and any(other in touched for other, _ in entry['neighbours']):
+                affected.add(recipe_id)
+
+        if not changed:
+            return affected
+
+        # 2. 与变化食谱的相似度达到了当前 Top-K 的门槛（或列表未满）
+        changed_rows = np.array([features.row_index[recipe_id] for recipe_id in changed], dtype=np.intp)
+        thresholds = np.full(len(features), np.inf)
+        for recipe_id, entry in existing.items():
+            row = features.row_index.get(recipe_id)
+            if row is None:
+                continue
+            neighbours = entry['neighbours']
+            thresholds[row] = neighbours[-1][1] if len(neighbours) >= max_neighbours else 0.0
+
+        for start in range(0, len(features), RecipeSimilarityService.CHUNK_SIZE):
+            chunk = slice(start, start + RecipeSimilarityService.CHUNK_SIZE)
+            best = (index.embeddings[chunk] @ index.embeddings[changed_rows].T).max(axis=1)
+            rows = np.flatnonzero((best > 0) & (best >= thresholds[chunk])) + start
+            affected.update(features.recipe_ids[rows].tolist())
+
+        return affected - changed
+
+    @staticmethod
+    def _top_k_records(index: RecipeSimilarityIndex, rows: np.ndarray,
+                    top_k: int, computed_at: datetime) -> List[Dict]:
+        """计算一批食谱的 Top-K 相似食谱（只保留相似度大于0的），返回待插入的记录"""
+        if top_k <= 0:
+            return []
+
+        similarity = index.embeddings[rows] @ index.embeddings.T
+        similarity[np.arange(len(rows)), rows] = -np.inf     # 排除自身
+
+        candidates = np.argpartition(-similarity, top_k - 1, axis=1)[:, :top_k]
+        records = []
+        recipe_ids = index.features.recipe_ids
+        for position, row in enumerate(rows):
+            scores = similarity[position, candidates[position]]
+            order = np.argsort(-scores, kind='stable')
+            rank = 0
+            for column, score in zip(candidates[position][order].tolist(), scores[order].tolist()):
+                if score <= 0:
+                    break
+                rank += 1
+                records.append({
+                    'recipe_id': int(recipe_ids[row]),
+                    'similar_recipe_id': int(recipe_ids[column]),
+                    'rank': rank,
+                    'similarity': float(score),
+                    'computed_at': computed_at
+                })
+        return records
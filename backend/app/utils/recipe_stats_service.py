@@ -0,0 +1,110 @@
+"""
+食谱社区统计服务
+点赞、收藏、使用等事件发生时，在同一事务内原子地更新食谱的计数和热度评分；
+定时任务负责重新计算热度中的时间衰减部分
+"""
+
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.extensions import db
+from app.utils.recommendation_cache import mark_recommendations_changed
+from app.models.recipe_model import (
+    Recipe,
+    HOT_SCORE_LIKE_WEIGHT,
+    HOT_SCORE_FAVORITE_WEIGHT,
+    HOT_SCORE_USAGE_WEIGHT,
+    HOT_SCORE_FRESHNESS_WEIGHT,
+    HOT_SCORE_DECAY_DAYS
+)
+
+
+class RecipeStatsService:
+    """食谱社区统计服务类（只写入当前会话，不负责提交）"""
+
+    @staticmethod
+    def _apply(recipe_id: int, values: dict) -> int:
+        """
+        执行原子的 UPDATE ... SET col = col + delta（社区计数影响推荐评分，提交后清空推荐缓存）
+        计数不是食谱内容，保留 updated_at 不触发 onupdate，避免相似度、特征矩阵把食谱当作已编辑
+        """
+        mark_recommendations_changed(db.session)
+        return db.session.query(Recipe).filter(Recipe.id == recipe_id).update(
+            {**values, Recipe.updated_at: Recipe.updated_at}, synchronize_session=False
+        )
+
+    @staticmethod
+    def record_like(recipe_id: int, delta: int = 1) -> int:
+        """点赞(+1)/取消点赞(-1)，与点赞记录的插入/删除在同一事务中调用"""
+        return RecipeStatsService._apply(recipe_id, {
+            Recipe.likes_count: Recipe.likes_count + delta,
+            Recipe.hot_score: Recipe.hot_score + HOT_SCORE_LIKE_WEIGHT * delta
+        })
+
+    @staticmethod
+    def get_likes_count(recipe_id: int) -> int:
+        """读取食谱的点赞数（主键查询，不做 COUNT）"""
+        return db.session.query(Recipe.likes_count).filter(Recipe.id == recipe_id).scalar() or 0
+
+    @staticmethod
+    def record_favorite(recipe_id: int, delta: int = 1) -> int:
+        """收藏(+1)/取消收藏(-1)，与收藏记录的插入/删除在同一事务中调用"""
+        return RecipeStatsService._apply(recipe_id, {
+            Recipe.favorites_count: Recipe.favorites_count + delta,
+            Recipe.hot_score: Recipe.hot_score + HOT_SCORE_FAVORITE_WEIGHT * delta
+        })
+
+    @staticmethod
+    def get_favorites_count(recipe_id: int) -> int:
+        """读取食谱的收藏数（主键查询，不做 COUNT）"""
+        return db.session.query(Recipe.favorites_count).filter(Recipe.id == recipe_id).scalar() or 0
+
+    @staticmethod
+    def record_usage(recipe_id: int) -> int:
+        """食谱被使用（复制）一次"""
+        return RecipeStatsService._apply(recipe_id, {
+            Recipe.usage_count: Recipe.usage_count + 1,
+            Recipe.hot_score: Recipe.hot_score + HOT_SCORE_USAGE_WEIGHT
+        })
+
+    @staticmethod
+    def reconcile_favorites_count() -> int:
+        """
+        根据 recipe_favorites 表重建所有食谱的收藏数（修复计数漂移）
+        返回收藏数被修正的食谱数量；调用方负责提交
+        """
+        mark_recommendations_changed(db.session)
+        result = db.session.execute(text("""
+            UPDATE recipes SET favorites_count = (
+                SELECT COUNT(*) FROM recipe_favorites f WHERE f.recipe_id = recipes.id
+            )
+            WHERE favorites_count IS NOT (
+                SELECT COUNT(*) FROM recipe_favorites f WHERE f.recipe_id = recipes.id
+            )
+        """))
+        return result.rowcount
+
+    @staticmethod
+    def refresh_hot_scores(now: datetime = None) -> int:
+        """
+        按完整公式重新计算所有食谱的热度评分（刷新时间衰减，同时修正增量误差）
+        使用维护的计数列，收藏数漂移由 reconcile_favorites_count 修复；返回更新的行数，调用方负责提交
+        """
+        now = now or datetime.utcnow()
+        result = db.session.execute(text("""
+            UPDATE recipes SET hot_score =
+                COALESCE(likes_count, 0) * :like_weight
+                + COALESCE(favorites_count, 0) * :favorite_weight
+                + COALESCE(usage_count, 0) * :usage_weight
+                + COALESCE(MAX(0, 1 - CAST(julianday(:now) - julianday(created_at) AS INTEGER) / :decay_days), 0)
+                  * :freshness_weight
+        """), {
+            'like_weight': HOT_SCORE_LIKE_WEIGHT,
+            'favorite_weight': HOT_SCORE_FAVORITE_WEIGHT,
+            'usage_weight': HOT_SCORE_USAGE_WEIGHT,
+            'freshness_weight': HOT_SCORE_FRESHNESS_WEIGHT,
+            'decay_days': float(HOT_SCORE_DECAY_DAYS),
+            'now': now.strftime('%Y-%m-%d %H:%M:%S')
+        })
+        return result.rowcount
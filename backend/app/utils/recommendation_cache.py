@@ -0,0 +1,131 @@
+"""
+食谱推荐结果缓存（LRU + TTL）
+键为规范化的请求签名：排序后的食材ID、宠物画像（物种、年龄段、过敏食材、特殊需求）、返回数量和食材目录版本。
+食谱发布/编辑、点赞、收藏、使用等影响评分的事件提交后整体失效；
+其他进程产生的变化在 TTL 到期后生效
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+def _normalize_ids(ids: Iterable) -> Tuple[int, ...]:
+    """去重、排序并转换为整数（忽略无法转换的值）"""
+    normalized = set()
+    for value in ids or ():
+        try:
+            normalized.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return tuple(sorted(normalized))
+
+
+class RecommendationCache:
+    """推荐结果缓存"""
+
+    def __init__(self, max_size: int = 256, ttl: float = 120):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries = OrderedDict()      # 键 -> (写入时间, 结果)
+        self._lock = threading.Lock()
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(ingredient_ids, pet_profile, allergen_ids, limit, catalog_version) -> Tuple:
+        """生成规范化的请求签名（allergen_ids 为宠物过敏食材与请求排除食材的并集）"""
+        return (
+            _normalize_ids(ingredient_ids),
+            pet_profile.signature if pet_profile is not None else None,
+            _normalize_ids(allergen_ids),
+            limit,
+            catalog_version
+        )
+
+    @property
+    def generation(self) -> int:
+        """当前缓存代数，失效时递增"""
+        return self._generation
+
+    def get(self, key):
+        """读取缓存（返回副本），未命中或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, generation: int):
+        """
+        写入缓存
+        generation 为开始计算时的缓存代数，计算期间发生过失效则丢弃结果
+        """
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic(), copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """清空缓存"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        """命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+# 进程内共享的推荐缓存
+recommendation_cache = RecommendationCache()
+
+
+# ------------ 影响评分的写入提交后失效 ------------
+
+def mark_recommendations_changed(session):
+    """标记本次事务改变了推荐评分（点赞、收藏、使用计数等），提交后清空缓存"""
+    session.info['recommendations_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('recommendations_changed', False):
+        recommendation_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('recommendations_changed', None)
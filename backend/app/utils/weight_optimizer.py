@@ -0,0 +1,304 @@
+"""
+食材重量优化
+在营养矩阵上求解一个小型二次规划：以营养方案的分类比例为起点，找到最接近它、
+同时满足方案营养目标（蛋白质、脂肪、碳水百分比和钙磷比）的食材重量占比，
+再按宠物每日所需热量（或指定的总重量）换算为克数。
+
+营养目标都是占比的齐次线性约束，与总重量无关，因此先在单纯形（占比之和为1）上求解：
+    min ½‖x - x0‖²   s.t.  Gx ≥ 0,  Σx = 1,  x ≥ 0
+对偶问题只有约束个数（≤7）个乘子，用投影牛顿法迭代：每步只需解一个不超过 7×7 的线性方程组
+和几次单纯形投影，线搜索的回溯次数和迭代次数都有上限。
+乘子设有上限：目标互相冲突时乘子会达到上限，此时按优先级放弃钙磷比、碳水、脂肪等目标后重新求解，
+并在可行性报告中说明；重新求解与之前的求解共用同一个迭代次数上限
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.nutrient_matrix import NUTRIENT_INDEX, get_nutrient_matrix
+from app.utils.nutrition_ratio_config import NutritionPlan, NutritionRatioService
+
+MAX_ITERATIONS = 30         # 牛顿迭代次数上限（一次优化内所有求解合计）
+MAX_BACKTRACKS = 30         # 线搜索步长减半次数上限
+TOLERANCE = 1e-10           # 投影梯度收敛阈值
+MAX_MULTIPLIER = 100.0      # 乘子上限（约束冲突时等价于 L1 罚函数）
+UNCOVERED_SHARE = 0.05      # 方案分类比例未覆盖的食材（如乳制品、补充剂）的初始占比
+PERCENT_MARGIN = 0.1        # 求解时百分比目标向内收紧的幅度（百分点），保证近似解仍满足原目标
+RATIO_MARGIN = 0.01         # 求解时钙磷比目标向内收紧的相对幅度
+
+# 目标冲突时放弃的顺序（优先级从低到高）
+DROP_ORDER = ('ca_p_ratio', 'carbohydrate', 'fat', 'protein')
+
+
+def project_to_simplex(vector: np.ndarray) -> np.ndarray:
+    """欧氏投影到单纯形 {x ≥ 0, Σx = 1}"""
+    ordered = np.sort(vector)[::-1]
+    cumulative = np.cumsum(ordered) - 1.0
+    index = np.arange(1, len(vector) + 1)
+    positive = ordered - cumulative / index > 0
+    rho = index[positive][-1]
+    theta = cumulative[positive][-1] / rho
+    return np.maximum(vector - theta, 0.0)
+
+
+@dataclass(frozen=True)
+class WeightSolution:
+    """重量优化结果"""
+    ingredient_ids: Tuple[int, ...]
+    shares: np.ndarray              # 各食材的重量占比
+    total_weight: float             # 总重量（克）
+    calories: float                 # 总热量（大卡）
+    feasible: bool                  # 是否满足全部营养目标
+    converged: bool                 # 是否在迭代上限内收敛
+    iterations: int
+    report: Dict                    # 可行性报告
+
+    @property
+    def weights(self) -> Dict[int, float]:
+        """{食材ID: 重量(g)}"""
+        return {
+            ingredient_id: float(share * self.total_weight)
+            for ingredient_id, share in zip(self.ingredient_ids, self.shares)
+        }
+
+
+class WeightOptimizer:
+    """食材重量优化器"""
+
+    @staticmethod
+    def _prior_shares(plan: NutritionPlan, ingredient_dict: Dict, ingredient_ids: List[int]) -> np.ndarray:
+        """初始占比：按方案分类比例平均分配，未覆盖的分类给一个小的默认占比"""
+        category_weights = NutritionRatioService.calculate_ingredient_weights(plan, 1.0, ingredient_dict)
+        prior = np.array([category_weights.get(ing_id, 0.0) or UNCOVERED_SHARE for ing_id in ingredient_ids])
+        return prior / prior.sum()
+
+    @staticmethod
+    def _constraint_rows(plan: NutritionPlan, nutrients: Dict[str, np.ndarray]) -> List[Tuple[str, np.ndarray]]:
+        """营养目标 -> 齐次线性约束 g·x ≥ 0（目标已向内收紧）"""
+        targets = plan.nutrition_targets
+        protein = nutrients['protein']
+        fat = nutrients['fat']
+        carbohydrate = nutrients['carbohydrate']
+
+        rows = [
+            ('protein_min', protein - (targets.protein_min + PERCENT_MARGIN)),
+            ('protein_max', (targets.protein_max - PERCENT_MARGIN) - protein),
+            ('fat_min', fat - (targets.fat_min + PERCENT_MARGIN)),
+            ('fat_max', (targets.fat_max - PERCENT_MARGIN) - fat),
+            ('carbohydrate_max', (targets.carb_max - PERCENT_MARGIN) - carbohydrate),
+        ]
+
+        # 食材都没有磷数据时无法约束钙磷比
+        calcium, phosphorus = nutrients['calcium'], nutrients['phosphorus']
+        if phosphorus.any():
+            rows.append(('ca_p_ratio_min',
+                        calcium - targets.calcium_phosphorus_ratio_min * (1 + RATIO_MARGIN) * phosphorus))
+            rows.append(('ca_p_ratio_max',
+                        targets.calcium_phosphorus_ratio_max * (1 - RATIO_MARGIN) * phosphorus - calcium))
+        return rows
+
+    @staticmethod
+    def _newton_direction(constraints: np.ndarray, shares: np.ndarray, gradient: np.ndarray,
+                        multipliers: np.ndarray, binding: np.ndarray) -> np.ndarray:
+        """
+        自由乘子上的牛顿方向：在当前支撑集上 dx/dλ = J·Gᵀ（J 为单纯形投影的雅可比，去掉均值），
+        对偶 Hessian 为 -G·J·Gᵀ；方向会把下界上的乘子推出可行域时，固定该乘子后重新求解
+        """
+        support = shares > 0
+        free = ~binding
+        direction = np.zeros(len(multipliers))
+        while free.any():
+            block = constraints[np.ix_(free, support)]
+            centered = block - block.mean(axis=1, keepdims=True)
+            hessian = centered @ centered.T
+            hessian[np.diag_indices_from(hessian)] += 1e-10 * (np.trace(hessian) + 1.0)
+
+            direction[:] = 0.0
+            direction[free] = np.linalg.solve(hessian, gradient[free])
+            leaving = free & (((multipliers <= 0.0) & (direction < 0)) |
+                            ((multipliers >= MAX_MULTIPLIER) & (direction > 0)))
+            if not leaving.any():
+                break
+            free &= ~leaving
+        return direction
+
+    @staticmethod
+    def _line_search(evaluate, multipliers: np.ndarray, value: float, gradient: np.ndarray,
+                    direction: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray, float]]:
+        """沿投影路径回溯线搜索（Armijo），找不到上升点时返回 None"""
+        # 近奇异的 Hessian 会给出极长的牛顿方向，从移动量不超过乘子取值范围的步长开始
+        step = min(1.0, MAX_MULTIPLIER / max(np.abs(direction).max(), 1e-300))
+        for _ in range(MAX_BACKTRACKS):
+            candidate = np.clip(multipliers + step * direction, 0.0, MAX_MULTIPLIER)
+            moved = candidate - multipliers
+            if np.abs(moved).max() <= TOLERANCE:
+                return None
+            candidate_shares, candidate_value = evaluate(candidate)
+            if candidate_value >= value + 1e-4 * (gradient @ moved):
+                return candidate, candidate_shares, candidate_value
+            step *= 0.5
+        return None
+
+    @classmethod
+    def _solve(cls, prior: np.ndarray, constraints: np.ndarray,
+               max_iterations: int = MAX_ITERATIONS) -> Tuple[np.ndarray, np.ndarray, bool, int]:
+        """
+        对偶投影牛顿法，最多迭代 max_iterations 次，返回 (占比, 乘子, 是否收敛, 迭代次数)
+        对偶函数 φ(λ) = ½‖x-x0‖² - λᵀGx，x = Π(x0 + Gᵀλ)；在单纯形投影的支撑集上 x 是 λ 的线性函数，
+        φ 分段二次，牛顿方向通常几步内就找到最优的约束激活集
+        """
+        if not len(constraints):
+            return prior, np.zeros(0), True, 0
+
+        def evaluate(multipliers):
+            shares = project_to_simplex(prior + constraints.T @ multipliers)
+            value = 0.5 * np.sum((shares - prior) ** 2) - multipliers @ (constraints @ shares)
+            return shares, value
+
+        multipliers = np.zeros(len(constraints))
+        shares, value = evaluate(multipliers)
+        step_size = 1.0 / max(np.linalg.norm(constraints, 2) ** 2, 1e-12)
+
+        for iteration in range(1, max_iterations + 1):
+            gradient = -(constraints @ shares)    # 对偶上升方向
+            projected = np.clip(multipliers + gradient, 0.0, MAX_MULTIPLIER) - multipliers
+            if np.abs(projected).max() <= TOLERANCE:
+                return shares, multipliers, True, iteration
+
+            # 乘子已达上限且对应目标仍未满足：目标互相冲突，交给调用方放弃低优先级目标
+            if ((multipliers >= MAX_MULTIPLIER) & (gradient > 0)).any():
+                return shares, multipliers, False, iteration
+
+            # 处于边界且梯度指向外侧的乘子保持不动，其余乘子走牛顿步
+            binding = ((multipliers <= 0.0) & (gradient < 0)) | ((multipliers >= MAX_MULTIPLIER) & (gradient > 0))
+            direction = cls._newton_direction(constraints, shares, gradient, multipliers, binding)
+
+            # 沿投影路径回溯线搜索（Armijo）；牛顿方向不上升时改走投影梯度步
+            candidate = cls._line_search(evaluate, multipliers, value, gradient, direction)
+            if candidate is None:
+                candidate = cls._line_search(evaluate, multipliers, value, gradient, gradient * step_size)
+            if candidate is None:
+                return shares, multipliers, False, iteration
+            multipliers, shares, value = candidate
+
+        return shares, multipliers, False, max_iterations
+
+    @staticmethod
+    def _build_report(plan: NutritionPlan, nutrients: Dict[str, np.ndarray], shares: np.ndarray,
+                    unreachable: List[str], conflicting: List[str], calories: float,
+                    target_calories: Optional[float]) -> Dict:
+        """按原始目标检查结果"""
+        targets = plan.nutrition_targets
+        protein = float(nutrients['protein'] @ shares)
+        fat = float(nutrients['fat'] @ shares)
+        carbohydrate = float(nutrients['carbohydrate'] @ shares)
+        phosphorus = float(nutrients['phosphorus'] @ shares)
+        ca_p_ratio = float(nutrients['calcium'] @ shares) / phosphorus if phosphorus > 0 else None
+
+        def check(value, minimum=None, maximum=None):
+            satisfied = value is not None and \
+                (minimum is None or value >= minimum - 1e-6) and \
+                (maximum is None or value <= maximum + 1e-6)
+            return {
+                'value': round(value, 2) if value is not None else None,
+                'min': minimum,
+                'max': maximum,
+                'satisfied': satisfied
+            }
+
+        targets_report = {
+            'protein_percent': check(protein, targets.protein_min, targets.protein_max),
+            'fat_percent': check(fat, targets.fat_min, targets.fat_max),
+            'carbohydrate_percent': check(carbohydrate, None, targets.carb_max),
+            'calcium_phosphorus_ratio': check(ca_p_ratio, targets.calcium_phosphorus_ratio_min,
+                                            targets.calcium_phosphorus_ratio_max)
+        }
+        return {
+            'feasible': all(item['satisfied'] for item in targets_report.values()),
+            'targets': targets_report,
+            'unreachable': unreachable,     # 所选食材无论如何配比都无法达到的目标
+            'conflicting': conflicting,     # 与优先级更高的目标冲突而放弃的目标
+            'calories': {
+                'value': round(calories, 1),
+                'target': round(target_calories, 1) if target_calories is not None else None
+            }
+        }
+
+    @classmethod
+    def optimize(cls, plan: NutritionPlan, ingredient_dict: Dict, total_weight: float = None,
+                daily_calories: float = None) -> Optional[WeightSolution]:
+        """
+        计算满足营养方案目标的食材重量
+
+        Args:
+            plan: 营养方案
+            ingredient_dict: {ingredient_id: ingredient_obj} 已选择的食材
+            total_weight: 总食物重量(g)，未提供 daily_calories 时使用
+            daily_calories: 宠物每日所需热量(大卡)，提供时按热量确定总重量
+
+        Returns:
+            WeightSolution，没有可用食材时返回 None
+        """
+        matrix = get_nutrient_matrix()
+        ingredient_ids, rows = matrix.lookup(ingredient_dict.keys())
+        if not ingredient_ids:
+            return None
+
+        # 每100g的营养素，即按重量占比计算时的百分比
+        nutrients = {
+            name: matrix.matrix[rows, NUTRIENT_INDEX[name]]
+            for name in ('calories', 'protein', 'fat', 'carbohydrate', 'calcium', 'phosphorus')
+        }
+        prior = cls._prior_shares(plan, ingredient_dict, ingredient_ids)
+
+        # 任何配比都无法满足的目标（所有食材都在目标的同一侧）不参与求解，只在报告中说明
+        kept, unreachable = [], []
+        for name, row in cls._constraint_rows(plan, nutrients):
+            if row.max() < 0:
+                unreachable.append(name)
+            else:
+                norm = np.linalg.norm(row)
+                kept.append((name, row / norm if norm > 0 else row))
+
+        # 目标之间冲突时（乘子达到上限或不收敛），按优先级从低到高放弃一组目标后用剩余的迭代次数重新求解
+        conflicting = []
+        iterations = 0
+        while True:
+            constraints = np.array([row for _, row in kept]).reshape(len(kept), len(ingredient_ids))
+            shares, multipliers, converged, used = cls._solve(prior, constraints, MAX_ITERATIONS - iterations)
+            iterations += used
+            if converged and not (multipliers >= MAX_MULTIPLIER).any():
+                break
+            if iterations >= MAX_ITERATIONS:
+                break
+
+            saturated = {name for (name, _), value in zip(kept, multipliers) if value >= MAX_MULTIPLIER}
+            candidates = saturated or {name for (name, _), value in zip(kept, multipliers) if value > 0}
+            group = next((group for group in DROP_ORDER if any(name.startswith(group) for name in candidates)), None)
+            if group is None:
+                break
+            conflicting.extend(name for name, _ in kept if name.startswith(group))
+            kept = [(name, row) for name, row in kept if not name.startswith(group)]
+
+        # 按热量或指定总重量换算为克数
+        calories_per_gram = float(nutrients['calories'] @ shares) / 100.0
+        if daily_calories and calories_per_gram > 0:
+            total_weight = daily_calories / calories_per_gram
+        total_weight = float(total_weight or 0.0)
+        calories = calories_per_gram * total_weight
+
+        report = cls._build_report(plan, nutrients, shares, unreachable, conflicting, calories, daily_calories)
+        report.update({'converged': converged, 'iterations': iterations})
+
+        return WeightSolution(
+            ingredient_ids=tuple(ingredient_ids),
+            shares=shares,
+            total_weight=total_weight,
+            calories=calories,
+            feasible=report['feasible'],
+            converged=converged,
+            iterations=iterations,
+            report=report
+        )
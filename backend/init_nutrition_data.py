@@ -15,6 +15,7 @@ from app import create_app
 from app.extensions import db
 from app.models.ingredient_model import Ingredient, IngredientCategory
 from app.models.nutrition_requirements_model import NutritionRequirement, PetType, LifeStage, ActivityLevel
+from app.utils.ingredient_catalog import bump_catalog_version
 
 def init_basic_ingredients(force_reinit=False):
     """初始化基础食材数据"""
@@ -1361,6 +1362,8 @@ def init_basic_ingredients(force_reinit=False):
             added_count += 1
     
     db.session.commit()
+    # 通知食材目录缓存（及依赖它的营养矩阵等）失效
+    bump_catalog_version()
     if force_reinit:
         print(f"✅ 强制重新初始化完成：添加了 {added_count} 种食材")
     else:
@@ -14,6 +14,7 @@ from app.models.user_model import User
 from app.models.recipe_model import Recipe, RecipeStatus
 from app.models.ingredient_model import Ingredient, IngredientCategory
 from app.models.recipe_ingredient_model import RecipeIngredient
+from app.utils.recipe_stats_service import RecipeStatsService
 
 def create_system_user():
     """创建系统用户作为预设食谱的作者"""
@@ -326,6 +327,7 @@ def create_preset_recipes(system_user):
         # 添加食材到食谱中
         total_weight = 0                    # 总重量
         successfully_added_ingredients = 0  # 成功添加的食材数量
+        ingredient_weights = []             # (食材ID, 重量) 列表，用于计算营养
         
         for ingredient_data in recipe_data['ingredients']:
             ingredient = found_ingredients.get(ingredient_data['name'])
@@ -343,6 +345,7 @@ def create_preset_recipes(system_user):
             
             db.session.add(recipe_ingredient)
             total_weight += ingredient_data['weight']
+            ingredient_weights.append((ingredient.id, ingredient_data['weight']))
             successfully_added_ingredients += 1
         
         # 只有成功添加了食材才继续处理
@@ -352,7 +355,7 @@ def create_preset_recipes(system_user):
             continue
         
         # 计算营养成分
-        recipe.calculate_nutrition()  # 计算总营养成分
+        recipe.calculate_nutrition(ingredient_weights)  # 计算总营养成分
         recipe.check_suitability()    # 检查适用性
         
         # 设置初始统计数据（让食谱看起来有一定的社区互动）
@@ -366,6 +369,8 @@ def create_preset_recipes(system_user):
     
     # 提交数据库变更
     if created_count > 0:
+        db.session.flush()
+        RecipeStatsService.refresh_hot_scores()  # 根据初始统计数据计算热度评分
         db.session.commit()
         print(f"🎉 Successfully created {created_count} preset recipes!")
     else:
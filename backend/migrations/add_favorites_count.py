@@ -0,0 +1,47 @@
+# backend/migrations/add_favorites_count.py
+"""
+数据库迁移脚本：食谱收藏数缓存字段
+- 为recipes表添加 favorites_count 字段
+- 根据 recipe_favorites 表回填收藏数
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.insert(0, backend_dir)
+
+from app import create_app
+from app.extensions import db
+from app.utils.recipe_stats_service import RecipeStatsService
+from sqlalchemy import text
+
+def run_migration():
+    """运行迁移脚本"""
+    app = create_app()
+    
+    with app.app_context():
+        print("🚀 开始添加食谱收藏数字段...")
+        
+        try:
+            result = db.session.execute(text("PRAGMA table_info(recipes)"))
+            columns = [row[1] for row in result.fetchall()]
+            
+            if 'favorites_count' not in columns:
+                db.session.execute(text("ALTER TABLE recipes ADD COLUMN favorites_count INTEGER NOT NULL DEFAULT 0"))
+                print("✅ 添加 favorites_count 字段")
+            
+            updated = RecipeStatsService.reconcile_favorites_count()
+            db.session.commit()
+            
+            print(f"✅ 收藏数回填完成，共修正 {updated} 个食谱")
+            
+        except Exception as e:
+            print(f"❌ 迁移失败: {e}")
+            db.session.rollback()
+            raise
+
+if __name__ == '__main__':
+    run_migration()
@@ -0,0 +1,73 @@
+# backend/migrations/add_feed_pagination_indexes.py
+"""
+数据库迁移脚本：社区列表游标分页索引
+- 为recipes表添加 (created_at, id) 复合索引，供 newest/oldest 排序的键集分页使用
+- 将 likes_count 的 NULL 回填为 0 并禁止再写入 NULL，likes 排序直接按列排序
+- 为recipes表添加 (likes_count, created_at, id) 复合索引，供 likes 排序的键集分页使用
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.insert(0, backend_dir)
+
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+def run_migration():
+    """运行迁移脚本"""
+    app = create_app()
+    
+    with app.app_context():
+        print("🚀 开始添加游标分页索引...")
+        
+        try:
+            db.session.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_recipes_created_at_id ON recipes(created_at, id)
+            """))
+            
+            enforce_likes_count_not_null()
+            db.session.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_recipes_likes_created_at_id ON recipes(likes_count, created_at, id)
+            """))
+            db.session.commit()
+            
+            print("✅ 游标分页索引添加完成！")
+            
+        except Exception as e:
+            print(f"❌ 迁移失败: {e}")
+            db.session.rollback()
+            raise
+
+def enforce_likes_count_not_null():
+    """
+    回填 likes_count 的 NULL 值为 0
+    旧库由 add_community_features 以可空列 (DEFAULT 0) 添加该字段，SQLite 无法 ALTER 为 NOT NULL，
+    用触发器拒绝写入 NULL，效果等同 NOT NULL 约束；新建的表本身已是 NOT NULL DEFAULT 0
+    """
+    result = db.session.execute(text("UPDATE recipes SET likes_count = 0 WHERE likes_count IS NULL"))
+    print(f"   ✓ 回填 likes_count: {result.rowcount} 个食谱")
+    
+    columns = db.session.execute(text("PRAGMA table_info(recipes)")).fetchall()
+    if any(column[1] == 'likes_count' and column[3] for column in columns):
+        print("   ✓ likes_count 已是 NOT NULL")
+        return
+    
+    for event in ('INSERT', 'UPDATE OF likes_count'):
+        trigger_name = 'recipes_likes_count_not_null_' + event.split()[0].lower()
+        db.session.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {trigger_name}
+            BEFORE {event} ON recipes
+            WHEN NEW.likes_count IS NULL
+            BEGIN
+                SELECT RAISE(ABORT, 'NOT NULL constraint failed: recipes.likes_count');
+            END
+        """))
+    print("   ✓ likes_count 禁止写入 NULL")
+
+if __name__ == '__main__':
+    run_migration()
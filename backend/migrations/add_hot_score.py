@@ -0,0 +1,57 @@
+# backend/migrations/add_hot_score.py
+"""
+数据库迁移脚本：食谱热度评分
+- 为recipes表添加 hot_score 字段及索引，热门列表和趋势接口直接按索引排序
+- 按当前的点赞、收藏、使用数据回填热度评分（需要 favorites_count 字段，缺少时一并添加）
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.insert(0, backend_dir)
+
+from app import create_app
+from app.extensions import db
+from app.utils.recipe_stats_service import RecipeStatsService
+from sqlalchemy import text
+
+def run_migration():
+    """运行迁移脚本"""
+    app = create_app()
+    
+    with app.app_context():
+        print("🚀 开始添加食谱热度评分字段...")
+        
+        try:
+            result = db.session.execute(text("PRAGMA table_info(recipes)"))
+            columns = [row[1] for row in result.fetchall()]
+            
+            if 'hot_score' not in columns:
+                db.session.execute(text("ALTER TABLE recipes ADD COLUMN hot_score FLOAT NOT NULL DEFAULT 0"))
+                print("✅ 添加 hot_score 字段")
+            
+            # 热度评分按收藏数字段计算，尚未运行 add_favorites_count.py 时先添加并回填该字段
+            if 'favorites_count' not in columns:
+                db.session.execute(text("ALTER TABLE recipes ADD COLUMN favorites_count INTEGER NOT NULL DEFAULT 0"))
+                RecipeStatsService.reconcile_favorites_count()
+                print("✅ 添加 favorites_count 字段")
+            
+            db.session.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_recipes_hot_score ON recipes(hot_score)
+            """))
+            
+            updated = RecipeStatsService.refresh_hot_scores()
+            db.session.commit()
+            
+            print(f"✅ 热度评分回填完成，共 {updated} 个食谱")
+            
+        except Exception as e:
+            print(f"❌ 迁移失败: {e}")
+            db.session.rollback()
+            raise
+
+if __name__ == '__main__':
+    run_migration()
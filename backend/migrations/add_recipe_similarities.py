@@ -0,0 +1,59 @@
+# backend/migrations/add_recipe_similarities.py
+"""
+数据库迁移脚本：相似食谱表
+- 创建 recipe_similarities 表及 (recipe_id, rank) 索引
+- 首次全量计算相似食谱
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.insert(0, backend_dir)
+
+from app import create_app
+from app.extensions import db
+from app.utils.recipe_similarity_service import RecipeSimilarityService
+from sqlalchemy import text
+
+def run_migration():
+    """运行迁移脚本"""
+    app = create_app()
+    
+    with app.app_context():
+        print("🚀 开始创建相似食谱表...")
+        
+        try:
+            db.session.execute(text("""
+                CREATE TABLE IF NOT EXISTS recipe_similarities (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    recipe_id INTEGER NOT NULL,
+                    similar_recipe_id INTEGER NOT NULL,
+                    rank INTEGER NOT NULL,
+                    similarity FLOAT NOT NULL,
+                    computed_at DATETIME NOT NULL,
+                    FOREIGN KEY (recipe_id) REFERENCES recipes (id),
+                    FOREIGN KEY (similar_recipe_id) REFERENCES recipes (id),
+                    CONSTRAINT unique_recipe_similarity UNIQUE (recipe_id, similar_recipe_id)
+                )
+            """))
+            db.session.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_recipe_similarities_recipe_rank
+                ON recipe_similarities(recipe_id, rank)
+            """))
+            print("✅ recipe_similarities 表创建完成")
+            
+            stats = RecipeSimilarityService.refresh(full=True)
+            db.session.commit()
+            
+            print(f"✅ 相似食谱计算完成，共写入 {stats['rows_written']} 条记录")
+            
+        except Exception as e:
+            print(f"❌ 迁移失败: {e}")
+            db.session.rollback()
+            raise
+
+if __name__ == '__main__':
+    run_migration()
@@ -0,0 +1,32 @@
+"""
+宠物食谱网站 - 食谱收藏数校对脚本
+根据 recipe_favorites 表重建 recipes.favorites_count，修复计数漂移：
+    python reconcile_favorites_count.py
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from app import create_app
+from app.extensions import db
+from app.utils.recipe_stats_service import RecipeStatsService
+
+def main():
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            updated = RecipeStatsService.reconcile_favorites_count()
+            db.session.commit()
+            print(f"✅ 收藏数校对完成，共修正 {updated} 个食谱")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 收藏数校对失败: {e}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
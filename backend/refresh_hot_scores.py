@@ -0,0 +1,50 @@
+"""
+宠物食谱网站 - 食谱热度评分刷新任务
+重新计算所有食谱的热度评分（刷新新鲜度的时间衰减），可由 cron 定时调用，
+也可以使用 --interval 参数常驻运行：
+    python refresh_hot_scores.py                # 刷新一次
+    python refresh_hot_scores.py --interval 3600  # 每小时刷新一次
+"""
+
+import sys
+import os
+import time
+import argparse
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from app import create_app
+from app.extensions import db
+from app.utils.recipe_stats_service import RecipeStatsService
+
+def refresh_once(app):
+    """刷新一次热度评分"""
+    with app.app_context():
+        try:
+            started = time.perf_counter()
+            updated = RecipeStatsService.refresh_hot_scores()
+            db.session.commit()
+            elapsed = time.perf_counter() - started
+            print(f"✅ [{datetime.now():%Y-%m-%d %H:%M:%S}] 已刷新 {updated} 个食谱的热度评分 ({elapsed:.2f}s)")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 热度评分刷新失败: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description='刷新食谱热度评分')
+    parser.add_argument('--interval', type=int, default=0,
+                        help='刷新间隔（秒），为0时只刷新一次')
+    args = parser.parse_args()
+    
+    app = create_app()
+    refresh_once(app)
+    
+    while args.interval > 0:
+        time.sleep(args.interval)
+        refresh_once(app)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+宠物食谱网站 - 相似食谱离线计算任务
+为所有公开食谱计算 Top-K 相似食谱并写入 recipe_similarities 表，
+默认只处理上次运行后发生变化的食谱，可由 cron 定时调用：
+    python refresh_recipe_similarities.py               # 增量计算
+    python refresh_recipe_similarities.py --full        # 全量重新计算
+    python refresh_recipe_similarities.py --top-k 20    # 每个食谱保存20个相似食谱
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from app import create_app
+from app.extensions import db
+from app.utils.recipe_similarity_service import RecipeSimilarityService
+
+def main():
+    parser = argparse.ArgumentParser(description='计算相似食谱')
+    parser.add_argument('--full', action='store_true', help='全量重新计算所有食谱')
+    parser.add_argument('--top-k', type=int, default=RecipeSimilarityService.DEFAULT_TOP_K,
+                        help='每个食谱保存的相似食谱数量')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            started = time.perf_counter()
+            stats = RecipeSimilarityService.refresh(full=args.full, top_k=args.top_k)
+            db.session.commit()
+            elapsed = time.perf_counter() - started
+            print(f"✅ 相似食谱计算完成: 共 {stats['recipes']} 个公开食谱，"
+                f"重新计算 {stats['recomputed']} 个，清理 {stats['removed']} 个，"
+                f"写入 {stats['rows_written']} 条记录 ({elapsed:.2f}s)")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 相似食谱计算失败: {e}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+宠物食谱网站 - 食谱营养评分重新计算任务
+评分规则调整后，按ID顺序分批重新计算所有食谱的 nutrition_score 和 balance_score，
+每批提交后记录检查点，中断后再次运行会从检查点继续：
+    python rescore_recipes.py                     # 重新计算（有检查点时从检查点继续）
+    python rescore_recipes.py --restart           # 忽略检查点，从头重新计算
+    python rescore_recipes.py --chunk-size 10000  # 每批处理10000个食谱
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from app import create_app
+from app.extensions import db
+from app.utils.recipe_score_service import RecipeScoreService
+
+CHECKPOINT_FILE = 'rescore_recipes.checkpoint.json'
+
+def load_checkpoint(path):
+    """读取检查点中上次处理到的食谱ID，没有检查点时返回0"""
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding='utf-8') as f:
+        return int(json.load(f).get('last_id', 0))
+
+def save_checkpoint(path, last_id):
+    """原子写入检查点（先写临时文件再替换）"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'last_id': last_id}, f)
+    os.replace(temp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description='重新计算食谱营养评分')
+    parser.add_argument('--chunk-size', type=int, default=RecipeScoreService.DEFAULT_CHUNK_SIZE,
+                        help='每批处理的食谱数')
+    parser.add_argument('--restart', action='store_true', help='忽略检查点，从头重新计算')
+    parser.add_argument('--checkpoint', default=None,
+                        help=f'检查点文件路径（默认为 instance/{CHECKPOINT_FILE}）')
+    args = parser.parse_args()
+
+    app = create_app()
+    checkpoint_path = args.checkpoint or os.path.join(app.instance_path, CHECKPOINT_FILE)
+
+    with app.app_context():
+        last_id = 0 if args.restart else load_checkpoint(checkpoint_path)
+        remaining = RecipeScoreService.count_recipes(last_id)
+        if last_id:
+            print(f"从检查点继续: 食谱ID > {last_id}，剩余 {remaining} 个食谱")
+
+        started = time.perf_counter()
+        processed = updated = 0
+        try:
+            while True:
+                chunk_last_id, count, changed = RecipeScoreService.rescore_chunk(last_id, args.chunk_size)
+                if count == 0:
+                    break
+                db.session.commit()
+                save_checkpoint(checkpoint_path, chunk_last_id)
+                last_id = chunk_last_id
+
+                processed += count
+                updated += changed
+                elapsed = time.perf_counter() - started
+                print(f"  {processed}/{remaining} 个食谱，更新 {updated} 个，"
+                      f"{processed / elapsed if elapsed > 0 else 0:.0f} 个/秒 (ID ≤ {last_id})")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 评分重新计算失败: {e}（已保存检查点: 食谱ID ≤ {last_id}，再次运行将从此处继续）")
+            sys.exit(1)
+
+        # 全部完成后清除检查点，下次运行从头开始
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ 评分重新计算完成: 处理 {processed} 个食谱，更新 {updated} 个 "
+              f"({elapsed:.2f}s, {processed / elapsed if elapsed > 0 else 0:.0f} 个/秒)")
+
+if __name__ == '__main__':
+    main()
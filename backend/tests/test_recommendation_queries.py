@@ -0,0 +1,124 @@
+"""
+食谱推荐的查询次数测试
+推荐计算的 SQL 语句数应当固定，不随候选食谱数量增长
+"""
+
+import os
+import sys
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.extensions import db
+from app.models.ingredient_model import Ingredient, IngredientCategory
+from app.models.pet_model import Pet
+from app.models.recipe_ingredient_model import RecipeIngredient
+from app.models.recipe_model import Recipe, RecipeStatus
+from app.models.user_model import User
+from app.utils.ingredient_catalog import IngredientCatalog
+from app.utils.nutrient_matrix import invalidate_nutrient_matrix
+from app.utils.pet_nutrition_profile import invalidate_pet_profile
+from app.utils.recipe_feature_matrix import invalidate_recipe_features
+from app.utils.recipe_recommendation_service import RecipeRecommendationService
+from app.utils.recommendation_cache import recommendation_cache
+
+INGREDIENTS = (
+    ('Chicken breast', IngredientCategory.WHITE_MEAT, 23.0, 2.0, 0.0),
+    ('Beef', IngredientCategory.RED_MEAT, 26.0, 15.0, 0.0),
+    ('Salmon', IngredientCategory.FISH, 20.0, 13.0, 0.0),
+    ('Chicken liver', IngredientCategory.ORGANS, 17.0, 5.0, 1.0),
+    ('Carrot', IngredientCategory.VEGETABLES, 1.0, 0.2, 10.0),
+    ('Pumpkin', IngredientCategory.VEGETABLES, 1.0, 0.1, 7.0),
+)
+
+# 缓存预热后每次推荐的语句数：社区计数 1 条 + 入选食谱 1 条 + 入选食谱的食材 1 条
+EXPECTED_QUERIES = 3
+
+
+def _reset_caches():
+    """进程内缓存跨测试数据库共享，每个测试前后清空"""
+    IngredientCatalog.invalidate()
+    invalidate_nutrient_matrix()
+    invalidate_recipe_features()
+    invalidate_pet_profile()
+    recommendation_cache.invalidate()
+
+
+def _populate(recipe_count):
+    user = User(username='tester', password_hash='x')
+    db.session.add(user)
+    ingredients = [
+        Ingredient(name=name, category=category, calories=100.0, protein=protein, fat=fat, carbohydrate=carbohydrate)
+        for name, category, protein, fat, carbohydrate in INGREDIENTS
+    ]
+    db.session.add_all(ingredients)
+    db.session.flush()
+
+    pet = Pet(name='Rex', species='dog', weight=10.0, age=3, user_id=user.id)
+    db.session.add(pet)
+
+    for index in range(recipe_count):
+        chosen = [ingredients[(index + offset) % len(ingredients)] for offset in range(3)]
+        recipe = Recipe(name=f'Recipe {index}', user_id=user.id, is_public=True,
+                        status=RecipeStatus.PUBLISHED, likes_count=index % 7)
+        db.session.add(recipe)
+        db.session.flush()
+        recipe.calculate_nutrition([(ingredient.id, 100.0) for ingredient in chosen])
+        db.session.add_all([
+            RecipeIngredient(recipe_id=recipe.id, ingredient_id=ingredient.id, weight=100.0)
+            for ingredient in chosen
+        ])
+    db.session.commit()
+    return [ingredient.id for ingredient in ingredients[:2]], pet.id
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        _reset_caches()
+        yield app
+        db.session.remove()
+        _reset_caches()
+
+
+def _count_recommendation_queries(recipe_count, with_pet):
+    selected_ids, pet_id = _populate(recipe_count)
+    service = RecipeRecommendationService()
+    pet_id = pet_id if with_pet else None
+
+    # 第一次调用构建进程内缓存（食材目录、特征矩阵、宠物画像），之后只统计推荐计算本身
+    assert service.get_recommendations(selected_ids, pet_id=pet_id, limit=3)
+    recommendation_cache.invalidate()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        recommendations = service.get_recommendations(selected_ids, pet_id=pet_id, limit=3)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert recommendations
+    return len(statements)
+
+
+@pytest.mark.parametrize('with_pet', [False, True])
+def test_query_budget_is_fixed(app, with_pet):
+    counts = {}
+    for recipe_count in (5, 200):
+        db.drop_all()
+        db.create_all()
+        _reset_caches()
+        counts[recipe_count] = _count_recommendation_queries(recipe_count, with_pet)
+
+    # 候选食谱数量相差40倍，语句数相同
+    assert counts[5] == counts[200] == EXPECTED_QUERIES
@@ -490,6 +490,31 @@ class AllergenManager {
         }
     }
     
+    async checkRecipesSafety(recipeIds, petId = this.currentPetId) {
+        // 批量检查多个食谱对同一宠物的安全性，返回 {食谱ID: 安全检查结果}
+        if (!petId || !recipeIds || recipeIds.length === 0) {
+            return {};
+        }
+
+        try {
+            const response = await fetch(`/api/pet/${petId}/recipe-safety`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    recipe_ids: recipeIds
+                })
+            });
+
+            const data = await response.json();
+            return data.success ? data.results : {};
+        } catch (error) {
+            console.error('批量检查食谱安全性失败:', error);
+            return {};
+        }
+    }
+
     displaySafetyWarnings(safetyCheck) {
         const container = $('#recipe-safety-warnings');
         if (!container.length) return;
@@ -162,16 +162,23 @@ class CommunityUtils {
 
     /**
      * 获取社区食谱列表
+     * 传入 params.cursor（首页为 '' 或 null）时使用游标分页，
+     * 之后用返回的 pagination.next_cursor 加载下一页，适用于无限滚动
      */
     async getCommunityRecipes(params = {}) {
         const queryParams = new URLSearchParams({
-            page: params.page || 1,
             per_page: params.perPage || 12,
             sort: params.sort || 'hot',
             search: params.search || '',
             author: params.author || ''
         });
 
+        if (params.cursor !== undefined) {
+            queryParams.set('cursor', params.cursor || '');
+        } else {
+            queryParams.set('page', params.page || 1);
+        }
+
         try {
             return await this.apiRequest(`${this.apiBaseUrl}/recipes?${queryParams}`);
         } catch (error) {